@@ -0,0 +1,88 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from importlib import import_module
+from pathlib import Path
+
+
+# offline benchmarks of the suite, run in this order
+SUITE = ["inference", "app", "geomap"]
+# relative change of a metric reported as a regression, tail latencies move ~10% between runs
+THRESHOLD = 0.20
+# metrics where lower is better: times, sizes and cost ratios over plain prediction, everything else timed is
+# higher is better
+LOWER_IS_BETTER = ("_ms", "seconds", "_mb", "_kb", "bytes", "_overhead")
+
+
+def environment(root_path: Path) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root_path, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform()
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict, threshold: float = THRESHOLD) -> list:
+    # (metric, baseline, current, relative change, regression) for every metric of both runs
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        if not old[name]:
+            continue
+        change = (new[name] - old[name]) / abs(old[name])
+        lower_is_better = name.endswith(LOWER_IS_BETTER)
+        regression = change > threshold if lower_is_better else change < -threshold
+        if not name.endswith(("runs", "filters", "listings")):
+            rows.append((name, old[name], new[name], change, regression))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=SUITE, default=SUITE)
+    parser.add_argument("--output", type=Path, default=None, help="default reports/benchmarks/suite.json")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier suite.json to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    root_path = Path(__file__).parent.parent
+    output = args.output or root_path / "reports" / "benchmarks" / "suite.json"
+    output.parent.mkdir(exist_ok=True, parents=True)
+
+    suite = {"environment": environment(root_path), "results": {}}
+    for name in args.only:
+        print(f"running {name}")
+        suite["results"][name] = import_module(f"benchmarks.bench_{name}").run(root_path)
+
+    with open(output, "w") as f:
+        json.dump(suite, f, indent=4)
+    print(f"results saved to {output}")
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, suite, args.threshold)
+        for name, old, new, change, regression in rows:
+            print(f"{'REGRESSION ' if regression else '           '}{name:70} {old:14.4f} -> {new:14.4f} ({change:+.1%})")
+        # non zero exit so a regression can fail a job
+        sys.exit(1 if any(row[-1] for row in rows) else 0)
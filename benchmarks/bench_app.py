@@ -0,0 +1,106 @@
+import pandas as pd
+import json
+from pathlib import Path
+from src.comparables import Comparables
+from src.market_stats import MarketStats
+from src.schema import load_dtypes
+from benchmarks.timing import summarize_latency, time_calls, measure_load
+
+
+# property inputs sampled from the listings for the lookups
+SAMPLE_INPUTS = 200
+# repeats of every analytics filter
+FILTER_RUNS = 5
+
+
+def sample_inputs(df: pd.DataFrame, n: int) -> list:
+    columns = ['region', 'locality', 'propertytype', 'superbuiltupareasqft', 'bedrooms', 'bathrooms', 'totalfloornumber']
+    sample = df[columns].dropna().sample(min(n, len(df)), random_state=42)
+    return sample.to_dict(orient="records")
+
+
+def bench_lookups(root_path: Path, inputs: list) -> dict:
+    # market panel of the price predictor: market window, k nearest listings and their table
+    comparables, comparables_load = measure_load(lambda: Comparables.load(root_path / "data" / "app" / "comparables.joblib"))
+    market_stats, market_load = measure_load(lambda: MarketStats.load(root_path / "data" / "app" / "market_stats.joblib"))
+
+    def calls(lookup):
+        inputs_iter = iter(inputs * 2)
+        return time_calls(lambda: lookup(next(inputs_iter)), runs=len(inputs), warmup=3)
+
+    return {
+        "comparables_load": comparables_load,
+        "market_stats_load": market_load,
+        "market_window": summarize_latency(calls(lambda i: market_stats.query(
+            i['region'], i['propertytype'], i['bedrooms'], i['superbuiltupareasqft']))),
+        "nearest": summarize_latency(calls(lambda i: comparables.nearest(
+            i['region'], i['locality'], i['superbuiltupareasqft'], i['bedrooms'], i['bathrooms'],
+            i['totalfloornumber']))),
+        "similar_properties_table": summarize_latency(calls(lambda i: comparables.query(
+            i['region'], i['locality'], i['superbuiltupareasqft'], i['bedrooms'], i['bathrooms'],
+            i['totalfloornumber'])))
+    }
+
+
+def analytics_aggregations(df: pd.DataFrame, region: str, locality: str, propertytype: str) -> dict:
+    # the data work behind the analytics page for one filter, without drawing
+    if region != "overall":
+        df = df[df["region"] == region]
+    if locality != "overall":
+        df = df[df["locality"] == locality]
+    if propertytype != "overall":
+        df = df[df["propertytype"] == propertytype]
+
+    return {
+        "listings": len(df),
+        "avg_price": df["price"].mean(),
+        "avg_price_per_sqft": df["price_per_sqft"].mean(),
+        "floor_range": df["totalfloornumber"].quantile([0.25, 0.75]),
+        "bedrooms": df["bedrooms"].value_counts(),
+        "bhk_box": df[df["bedrooms"] <= 4].groupby("bedrooms", observed=True)["price"].describe(),
+        "furnished_box": df.groupby("furnished", observed=True)["price"].describe(),
+        "age_box": df.groupby("ageofcons", observed=True)["price"].describe(),
+        "price_per_sqft_by_type": df.groupby("propertytype", observed=True)["price_per_sqft"].mean()
+    }
+
+
+def bench_analytics(root_path: Path) -> dict:
+    dtypes = load_dtypes(root_path / "data" / "app" / "metadata.json")
+    df, load = measure_load(lambda: pd.read_csv(root_path / "data" / "raw" / "real_estate.csv", dtype=dtypes))
+
+    # overall, every region, and the largest locality of every region
+    filters = [("overall", "overall", "overall")]
+    filters += [(region, "overall", "overall") for region in df["region"].dropna().unique()]
+    sizes = df.groupby(["region", "locality"], observed=True).size().sort_values(ascending=False)
+    filters += [(region, locality, "overall") for region, locality in sizes.groupby(level=0, observed=True).head(1).index]
+
+    seconds = []
+    for f in filters:
+        seconds += time_calls(lambda: analytics_aggregations(df, *f), runs=FILTER_RUNS, warmup=1)
+
+    return {
+        "data_load": load,
+        "frame_mb": float(df.memory_usage(deep=True).sum() / 2 ** 20),
+        "filters": len(filters),
+        "aggregations": summarize_latency(seconds)
+    }
+
+
+def run(root_path: Path) -> dict:
+    df = pd.read_csv(root_path / "data" / "raw" / "real_estate.csv")
+    inputs = sample_inputs(df, SAMPLE_INPUTS)
+    return {
+        "lookups": bench_lookups(root_path, inputs),
+        "analytics": bench_analytics(root_path)
+    }
+
+
+if __name__ == "__main__":
+    root_path = Path(__file__).parent.parent
+    save_dir = root_path / "reports" / "benchmarks"
+    save_dir.mkdir(exist_ok=True, parents=True)
+
+    results = run(root_path)
+    with open(save_dir / "app.json", "w") as f:
+        json.dump(results, f, indent=4)
+    print(json.dumps(results, indent=4))
@@ -0,0 +1,81 @@
+import pandas as pd
+import io
+import joblib
+import json
+import time
+import yaml
+from pathlib import Path
+from sklearn.metrics import mean_absolute_error
+from src.schema import read_processed, target_column
+from src.modeling.train import build_model, find_best_iteration
+from benchmarks.timing import summarize_latency, time_calls
+
+
+# the tuned parameters, and the same without the minimum split gain that ends their boosting early
+PARAM_SETS = {"configured": {}, "no_min_split_gain": {"min_split_gain": 0.0}}
+# single row predictions timed, and batch predictions of the whole test set
+SINGLE_RUNS = 500
+BATCH_RUNS = 20
+
+
+def model_report(model, X_test: pd.DataFrame, y_test: pd.Series, train_seconds: float) -> dict:
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    single_row = X_test.iloc[[0]]
+
+    return {
+        "trees": model.regressor_.booster_.num_trees(),
+        "train_seconds": train_seconds,
+        "model_bytes": buffer.getbuffer().nbytes,
+        "single": summarize_latency(time_calls(lambda: model.predict(single_row), SINGLE_RUNS)),
+        "batch": summarize_latency(time_calls(lambda: model.predict(X_test), BATCH_RUNS)),
+        "test_mae": mean_absolute_error(y_test, model.predict(X_test))
+    }
+
+
+def run(root_path: Path) -> dict:
+    params = yaml.safe_load(open(root_path / "params.yaml"))
+    stopping_params = params['Train']['Early_Stopping']
+    train = read_processed(root_path / "data" / "processed" / "train_trans.csv")
+    test = read_processed(root_path / "data" / "processed" / "test_trans.csv")
+    X, y = train.drop(columns=[target_column]), train[target_column]
+    X_test, y_test = test.drop(columns=[target_column]), test[target_column]
+
+    results = {}
+    for name, overrides in PARAM_SETS.items():
+        lgbm_params = {**params['Train']['LightGBM'], **overrides, "verbose": -1}
+
+        # before: n_estimators rounds on all the train data
+        start = time.perf_counter()
+        fixed = build_model(lgbm_params).fit(X, y)
+        fixed_seconds = time.perf_counter() - start
+
+        # after: the rounds found on the validation split, then fitted on all the train data as the train stage does
+        start = time.perf_counter()
+        best_iteration, _ = find_best_iteration(lgbm_params, X, y, stopping_params)
+        stopped = build_model({**lgbm_params, "n_estimators": best_iteration}).fit(X, y)
+        stopped_seconds = time.perf_counter() - start
+
+        results[name] = {
+            "best_iteration": best_iteration,
+            "fixed": model_report(fixed, X_test, y_test, fixed_seconds),
+            "early_stopping": model_report(stopped, X_test, y_test, stopped_seconds)
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    root_path = Path(__file__).parent.parent
+    save_dir = root_path / "reports" / "benchmarks"
+    save_dir.mkdir(exist_ok=True, parents=True)
+
+    results = run(root_path)
+    with open(save_dir / "early_stopping.json", "w") as f:
+        json.dump(results, f, indent=4)
+
+    # side by side table
+    rows = ["trees", "train_seconds", "model_bytes", "single.median_ms", "single.p95_ms", "batch.median_ms", "test_mae"]
+    table = pd.DataFrame({(name, model): {row: pd.json_normalize(result[model]).iloc[0][row] for row in rows}
+                          for name, result in results.items() for model in ["fixed", "early_stopping"]})
+    print(table.to_string(float_format=lambda value: f"{value:.6g}"))
@@ -0,0 +1,106 @@
+import pandas as pd
+import numpy as np
+import plotly.express as px
+import json
+import time
+from pathlib import Path
+from src.geo_layers import GeoLayers, OVERALL
+
+
+# filters timed in every view
+SAMPLE_LOCALITIES = 25
+
+
+def filter_frame(df: pd.DataFrame, region: str, locality: str, propertytype: str) -> pd.DataFrame:
+    # same cascade as the analytics sidebar
+    if region != OVERALL:
+        df = df[df["region"] == region]
+    if locality != OVERALL:
+        df = df[df["locality"] == locality]
+    if propertytype != OVERALL:
+        df = df[df["propertytype"] == propertytype]
+    return df
+
+
+def raw_map(df: pd.DataFrame, region: str, locality: str, propertytype: str):
+    # the map as drawn before the precomputed layers
+    filtered_df = filter_frame(df, region, locality, propertytype)
+    if filtered_df["locality"].nunique() == 1:
+        return px.scatter_mapbox(filtered_df, lat="latitude", lon="longitude", color="price_per_sqft",
+                                 size="superbuiltupareasqft", hover_name="locality",
+                                 hover_data=["price", "bedrooms"], mapbox_style="open-street-map", zoom=13)
+
+    group_df = (
+        filtered_df
+        .groupby("locality", as_index=False)
+        .agg({"price_per_sqft": "mean", "superbuiltupareasqft": "mean", "latitude": "mean", "longitude": "mean"})
+    )
+    return px.scatter_mapbox(group_df, lat="latitude", lon="longitude", color="price_per_sqft",
+                             size="superbuiltupareasqft", hover_name="locality",
+                             mapbox_style="open-street-map", zoom=10)
+
+
+def layered_map(geo_layers: GeoLayers, region: str, locality: str, propertytype: str, precision: int):
+    if locality != OVERALL:
+        layer_df = geo_layers.cell_layer(region, locality, propertytype, precision)
+        return px.scatter_mapbox(layer_df, lat="latitude", lon="longitude", color="price_per_sqft",
+                                 size="superbuiltupareasqft", hover_name="cell",
+                                 hover_data=["price", "listings"], mapbox_style="open-street-map", zoom=13)
+
+    group_df = geo_layers.locality_layer(region, propertytype)
+    return px.scatter_mapbox(group_df, lat="latitude", lon="longitude", color="price_per_sqft",
+                             size="superbuiltupareasqft", hover_name="locality",
+                             mapbox_style="open-street-map", zoom=10)
+
+
+def measure(build) -> dict:
+    # render time covers building the figure and serializing what is sent to the browser
+    start = time.perf_counter()
+    payload = build().to_json()
+    return {"seconds": time.perf_counter() - start, "payload_bytes": len(payload)}
+
+
+def summarize(runs: list) -> dict:
+    seconds = np.array([run["seconds"] for run in runs])
+    payload = np.array([run["payload_bytes"] for run in runs])
+    return {
+        "filters": len(runs),
+        "median_ms": float(np.median(seconds) * 1e3),
+        "p95_ms": float(np.percentile(seconds, 95) * 1e3),
+        "median_payload_kb": float(np.median(payload) / 1024),
+        "max_payload_kb": float(payload.max() / 1024)
+    }
+
+
+def run(root_path: Path) -> dict:
+    df = pd.read_csv(root_path / "data" / "raw" / "real_estate.csv")
+    geo_layers = GeoLayers.load(root_path / "data" / "app" / "geo_layers.parquet")
+    precision = geo_layers.precisions[-1]
+
+    # aggregated views: every region x property type filter
+    aggregated = [(region, OVERALL, propertytype)
+                  for region in [OVERALL] + sorted(df["region"].unique())
+                  for propertytype in [OVERALL] + sorted(df["propertytype"].unique())]
+
+    # single locality views: the largest localities of every region
+    sizes = df.groupby(["region", "locality"]).size().sort_values(ascending=False)
+    single = [(region, locality, OVERALL) for region, locality in sizes.index[:SAMPLE_LOCALITIES]]
+
+    results = {}
+    for view, filters in [("aggregated", aggregated), ("single_locality", single)]:
+        results[view] = {
+            "raw": summarize([measure(lambda: raw_map(df, *f)) for f in filters]),
+            "precomputed": summarize([measure(lambda: layered_map(geo_layers, *f, precision)) for f in filters])
+        }
+    return results
+
+
+if __name__ == "__main__":
+    root_path = Path(__file__).parent.parent
+    save_dir = root_path / "reports" / "benchmarks"
+    save_dir.mkdir(exist_ok=True, parents=True)
+
+    results = run(root_path)
+    with open(save_dir / "geomap.json", "w") as f:
+        json.dump(results, f, indent=4)
+    print(json.dumps(results, indent=4))
@@ -0,0 +1,133 @@
+import pandas as pd
+import numpy as np
+import joblib
+import json
+import time
+from pathlib import Path
+from src.bundle import ModelBundle
+from src.explain import Explainer, PredictionMemo
+from src.sensitivity import SensitivityCurves, area_values
+from src.schema import feature_columns
+from benchmarks.timing import summarize_latency, time_calls, measure_load
+
+
+# rows predicted one at a time, as the app does
+SINGLE_ROWS = 200
+# batch sizes timed for throughput, test rows are resampled past the test set size
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+# repeats of every batch size
+BATCH_RUNS = 20
+# area points of the what-if grids, each crossed with every bedroom count
+SWEEP_POINTS = [50, 200, 1000]
+
+
+def load_joblib_artifacts(models_dir: Path) -> tuple:
+    # the separate preprocessor and model files, for comparison with the bundle load
+    return joblib.load(models_dir / "preprocesser.joblib"), joblib.load(models_dir / "model.joblib")
+
+
+def run(root_path: Path) -> dict:
+    # the bundle the app serves, it applies the schema to the raw inputs itself
+    pipeline, load = measure_load(lambda: ModelBundle.load(root_path / "models" / "model.bundle"))
+    # loads once the libraries are imported, the bundle against the separate joblib files
+    warm_load = {
+        "bundle": measure_load(lambda: ModelBundle.load(root_path / "models" / "model.bundle"))[1],
+        "joblib": measure_load(lambda: load_joblib_artifacts(root_path / "models"))[1]
+    }
+
+    X = pd.read_csv(root_path / "data" / "interim" / "test.csv", usecols=feature_columns)[feature_columns]
+
+    # single row latency over different rows, the first calls warm up
+    rows = [X.iloc[[row]] for row in range(min(SINGLE_ROWS, len(X)))]
+    rows_iter = iter(rows * 2)
+    single = time_calls(lambda: pipeline.predict(next(rows_iter)), runs=len(rows), warmup=3)
+
+    throughput = {}
+    for batch_size in BATCH_SIZES:
+        batch = X.iloc[:batch_size] if batch_size <= len(X) else X.sample(batch_size, replace=True, random_state=42)
+        seconds = time_calls(lambda: pipeline.predict(batch), runs=BATCH_RUNS, warmup=1)
+        throughput[str(batch_size)] = {
+            **summarize_latency(seconds),
+            "rows_per_second": batch_size / (sum(seconds) / len(seconds))
+        }
+
+    # explanations of the same rows, the memo answers repeated inputs without the booster
+    explainer = Explainer(pipeline)
+    rows_iter = iter(rows * 2)
+    explain_single = time_calls(lambda: explainer.explain(next(rows_iter)), runs=len(rows), warmup=3)
+    memo = PredictionMemo(pipeline)
+    memo.lookup(X.iloc[:len(rows)])
+    rows_iter = iter(rows * 2)
+    memo_hit = time_calls(lambda: memo.lookup(next(rows_iter)), runs=len(rows), warmup=3)
+    batch = X.iloc[:1000] if len(X) >= 1000 else X.sample(1000, replace=True, random_state=42)
+    explain_batch = time_calls(lambda: explainer.explain(batch), runs=BATCH_RUNS, warmup=1)
+
+    # intervals of the same rows, the quantile boosters share the preprocessing pass of the prediction
+    rows_iter = iter(rows * 2)
+    interval_single = time_calls(lambda: pipeline.predict_interval(next(rows_iter)), runs=len(rows), warmup=3)
+    interval_batch = time_calls(lambda: pipeline.predict_interval(batch), runs=BATCH_RUNS, warmup=1)
+    predict_batch = time_calls(lambda: pipeline.predict(batch), runs=BATCH_RUNS, warmup=1)
+
+    # what-if grids around one listing, scored in one batch, then answered from the curve cache
+    base = X.iloc[0].to_dict()
+    bounds = pipeline.metadata["bounds"]
+    bedrooms = list(range(1, int(bounds["bedrooms"]["max"]) + 1))
+    sensitivity = {}
+    for points in SWEEP_POINTS:
+        sweeps = {"superbuiltupareasqft": area_values(base["superbuiltupareasqft"], bounds["superbuiltupareasqft"], points),
+                  "bedrooms": bedrooms}
+        curves = SensitivityCurves(pipeline, max_entries=0)
+        seconds = time_calls(lambda: curves.sweep(base, sweeps), runs=BATCH_RUNS, warmup=1)
+        cached = SensitivityCurves(pipeline)
+        cached.sweep(base, sweeps)
+        sensitivity[str(points)] = {
+            "grid_rows": len(sweeps["superbuiltupareasqft"]) * len(bedrooms),
+            "scored": summarize_latency(seconds),
+            "cached": summarize_latency(time_calls(lambda: cached.sweep(base, sweeps), runs=BATCH_RUNS, warmup=1))
+        }
+
+    # first prediction after load pays for any lazy setup
+    fresh = ModelBundle.load(root_path / "models" / "model.bundle")
+    start = time.perf_counter()
+    fresh.predict(rows[0])
+    first_seconds = time.perf_counter() - start
+
+    return {
+        "load": load,
+        "warm_load": warm_load,
+        "first_prediction_ms": first_seconds * 1e3,
+        "single_row": summarize_latency(single),
+        "batch": throughput,
+        "explain": {
+            "single_row": summarize_latency(explain_single),
+            "memo_hit": summarize_latency(memo_hit),
+            "batch_1000": {
+                **summarize_latency(explain_batch),
+                "rows_per_second": len(batch) / (sum(explain_batch) / len(explain_batch))
+            },
+            # explained over plain single row prediction, median to median
+            "single_row_overhead": float(np.median(explain_single) / np.median(single))
+        },
+        "intervals": {
+            "single_row": summarize_latency(interval_single),
+            "batch_1000": {
+                **summarize_latency(interval_batch),
+                "rows_per_second": len(batch) / (sum(interval_batch) / len(interval_batch))
+            },
+            # with intervals over plain prediction, median to median
+            "single_row_overhead": float(np.median(interval_single) / np.median(single)),
+            "batch_1000_overhead": float(np.median(interval_batch) / np.median(predict_batch))
+        },
+        "sensitivity": sensitivity
+    }
+
+
+if __name__ == "__main__":
+    root_path = Path(__file__).parent.parent
+    save_dir = root_path / "reports" / "benchmarks"
+    save_dir.mkdir(exist_ok=True, parents=True)
+
+    results = run(root_path)
+    with open(save_dir / "inference.json", "w") as f:
+        json.dump(results, f, indent=4)
+    print(json.dumps(results, indent=4))
@@ -0,0 +1,89 @@
+import pandas as pd
+import numpy as np
+import json
+import time
+import tracemalloc
+import yaml
+from pathlib import Path
+from lightgbm import LGBMRegressor
+from sklearn import set_config
+from sklearn.model_selection import train_test_split
+from src.data_preprocessing import build_preprocessor
+from src.schema import load_dtypes, compact_frame, feature_columns, target_column
+
+
+set_config(transform_output='pandas')
+
+
+def measure(step) -> dict:
+    # wall time and peak of the python/numpy allocations made by the step
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = step()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frames = result if isinstance(result, tuple) else (result,)
+    frame_bytes = sum(int(frame.memory_usage(deep=True).sum()) for frame in frames if isinstance(frame, pd.DataFrame))
+    return {"seconds": seconds, "peak_mb": peak / 2 ** 20, "frame_mb": frame_bytes / 2 ** 20}
+
+
+def run(root_path: Path) -> dict:
+    params = yaml.safe_load(open(root_path / "params.yaml"))
+    preparation = params['Data_Preparation']
+    preprocessing = params['Data_Preprocessing']
+    raw_path = root_path / "data" / "raw" / "real_estate.csv"
+    columns = feature_columns + [target_column]
+
+    results = {}
+    for mode, dtypes, ohe_dtype, compact in [("object_float64", None, np.float64, False),
+                                             ("schema", load_dtypes(root_path / "data" / "app" / "metadata.json"), np.uint8, True)]:
+        stages = {}
+        state = {}
+
+        def prepare():
+            df = pd.read_csv(raw_path, usecols=columns, dtype=dtypes)[columns].drop_duplicates()
+            state['train'], state['test'] = train_test_split(df, test_size=preparation['test_size'],
+                                                             random_state=preparation['random_state'])
+            return state['train'], state['test']
+
+        def preprocess():
+            X, y = state['train'].drop(columns=[target_column]), state['train'][target_column]
+            preprocessor = build_preprocessor(preprocessing['smoothing'], preprocessing['min_samples_leaf'], ohe_dtype=ohe_dtype)
+            X_trans = preprocessor.fit(X, y).transform(X)
+            X_test = preprocessor.transform(state['test'].drop(columns=[target_column]))
+            state['X'], state['X_test'] = (compact_frame(X_trans), compact_frame(X_test)) if compact else (X_trans, X_test)
+            state['y'] = np.log1p(y)
+            return state['X'], state['X_test']
+
+        def train():
+            state['model'] = LGBMRegressor(**params['Train']['LightGBM'], verbose=-1).fit(state['X'], state['y'])
+            return state['X']
+
+        def evaluate():
+            return pd.DataFrame({"pred": np.expm1(state['model'].predict(state['X_test']))})
+
+        def app():
+            return pd.read_csv(raw_path, dtype=dtypes)
+
+        for name, step in [("data_preparation", prepare), ("data_preprocessing", preprocess),
+                           ("train", train), ("evaluation", evaluate), ("app_load", app)]:
+            stages[name] = measure(step)
+        results[mode] = stages
+
+    return results
+
+
+if __name__ == "__main__":
+    root_path = Path(__file__).parent.parent
+    save_dir = root_path / "reports" / "benchmarks"
+    save_dir.mkdir(exist_ok=True, parents=True)
+
+    results = run(root_path)
+    with open(save_dir / "schema_memory.json", "w") as f:
+        json.dump(results, f, indent=4)
+
+    # side by side table
+    table = pd.concat({mode: pd.DataFrame(stages).T for mode, stages in results.items()}, axis=1)
+    print(table.round(3).to_string())
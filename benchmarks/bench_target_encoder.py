@@ -0,0 +1,103 @@
+import pandas as pd
+import numpy as np
+import category_encoders as ce
+import json
+import pickle
+import time
+import yaml
+from pathlib import Path
+from lightgbm import LGBMRegressor
+from src.schema import load_dtypes, target_column
+from src.target_encoder import TargetEncoder
+from src.data_preprocessing import target_encode
+
+
+# copies of the interim train data the encoders are timed on
+SCALES = [1, 10, 100]
+# rows of the single row transforms, as the app predicts
+SINGLE_ROWS = 200
+# folds of the out of fold encoding timed
+FOLDS = 5
+
+
+def scaled(train: pd.DataFrame, scale: int, seed: int = 0) -> pd.DataFrame:
+    # the train data repeated with the target jittered, so the group statistics differ between copies
+    data = pd.concat([train] * scale, ignore_index=True)
+    noise = np.random.default_rng(seed).lognormal(0, 0.1, len(data)).astype(np.float32)
+    data[target_column] = data[target_column] * noise
+    return data
+
+
+def time_encoder(encoder, X: pd.DataFrame, y: pd.Series, X_test: pd.DataFrame) -> tuple:
+    start = time.perf_counter()
+    encoder.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoded = encoder.transform(X_test)
+    transform_seconds = time.perf_counter() - start
+
+    single = []
+    for row in range(SINGLE_ROWS):
+        start = time.perf_counter()
+        encoder.transform(X_test.iloc[[row]])
+        single.append(time.perf_counter() - start)
+
+    return encoded, {
+        "fit_seconds": fit_seconds,
+        "transform_seconds": transform_seconds,
+        "single_row_ms_median": float(np.median(single) * 1e3),
+        "pickle_bytes": len(pickle.dumps(encoder))
+    }
+
+
+def run(root_path: Path) -> dict:
+    params = yaml.safe_load(open(root_path / "params.yaml"))
+    preprocessing = params['Data_Preprocessing']
+    dtypes = load_dtypes(root_path / "data" / "app" / "metadata.json")
+    train = pd.read_csv(root_path / "data" / "interim" / "train.csv", dtype=dtypes)
+    test = pd.read_csv(root_path / "data" / "interim" / "test.csv", dtype=dtypes)
+    X_test = test.drop(columns=[target_column])
+    settings = {"cols": target_encode, "smoothing": preprocessing['smoothing'],
+                "min_samples_leaf": preprocessing['min_samples_leaf']}
+
+    results = {}
+    for scale in SCALES:
+        data = scaled(train, scale)
+        X, y = data.drop(columns=[target_column]), data[target_column]
+        reference, category_encoders = time_encoder(ce.TargetEncoder(**settings), X, y, X_test)
+        encoded, numpy = time_encoder(TargetEncoder(**settings), X, y, X_test)
+        start = time.perf_counter()
+        TargetEncoder(**settings, folds=FOLDS, random_state=0).fit_transform(X, y)
+        numpy["out_of_fold_fit_transform_seconds"] = time.perf_counter() - start
+
+        # a model fitted on the reference encodings predicts the test rows from either encoder's output
+        model = LGBMRegressor(**params['Train']['LightGBM'], verbose=-1).fit(
+            ce.TargetEncoder(**settings).fit_transform(X, y), y)
+        results[f"x{scale}"] = {
+            "rows": len(data),
+            "category_encoders": category_encoders,
+            "numpy": numpy,
+            "max_encoding_difference": float((reference[target_encode] - encoded[target_encode]).abs().max().max()),
+            "max_prediction_difference": float(np.abs(model.predict(reference) - model.predict(encoded)).max())
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    root_path = Path(__file__).parent.parent
+    save_dir = root_path / "reports" / "benchmarks"
+    save_dir.mkdir(exist_ok=True, parents=True)
+
+    results = run(root_path)
+    with open(save_dir / "target_encoder.json", "w") as f:
+        json.dump(results, f, indent=4)
+
+    # side by side table
+    table = pd.DataFrame({scale: {f"{encoder}.{name}": value for encoder in ["category_encoders", "numpy"]
+                                  for name, value in result[encoder].items()}
+                          | {name: result[name] for name in ["rows", "max_encoding_difference",
+                                                             "max_prediction_difference"]}
+                          for scale, result in results.items()})
+    print(table.to_string(float_format=lambda value: f"{value:.6g}"))
@@ -0,0 +1,118 @@
+import pandas as pd
+import numpy as np
+import lightgbm as lgb
+import json
+import tempfile
+import time
+import yaml
+from pathlib import Path
+from sklearn.model_selection import cross_val_score
+from src.schema import read_processed, target_column
+from src.modeling.train import build_model
+from src.modeling.dataset import build_dataset, load_dataset, cross_validate, CV_FOLDS
+
+
+# copies of the processed train data the training is timed on
+SCALES = [1, 10]
+# tuning trials, each cross validated
+TRIALS = 5
+# constructions timed for the cost of one, the first converts the DataFrame cold
+CONSTRUCT_RUNS = 5
+
+
+def scaled(train: pd.DataFrame, scale: int, seed: int = 0) -> pd.DataFrame:
+    # the train data repeated with the target jittered, so the copies are not identical rows
+    data = pd.concat([train] * scale, ignore_index=True)
+    noise = np.random.default_rng(seed).lognormal(0, 0.1, len(data)).astype(np.float32)
+    data[target_column] = data[target_column] * noise
+    return data
+
+
+def trial_params(lgbm_params: dict, trials: int, seed: int = 0) -> list:
+    # random search around the tuned parameters, as a tuning loop would sample them
+    rng = np.random.default_rng(seed)
+    return [{**lgbm_params,
+             "learning_rate": float(rng.uniform(0.05, 0.4)),
+             "num_leaves": int(rng.integers(15, 64)),
+             "min_child_samples": int(rng.integers(5, 50)),
+             "reg_lambda": float(rng.uniform(0, 100))} for _ in range(trials)]
+
+
+def timed(call) -> tuple:
+    start = time.perf_counter()
+    result = call()
+    return result, time.perf_counter() - start
+
+
+def run(root_path: Path) -> dict:
+    params = yaml.safe_load(open(root_path / "params.yaml"))
+    lgbm_params = params['Train']['LightGBM']
+    train = read_processed(root_path / "data" / "processed" / "train_trans.csv")
+    trials = trial_params(lgbm_params, TRIALS)
+
+    results = {}
+    for scale in SCALES:
+        data = scaled(train, scale)
+        X, y = data.drop(columns=[target_column]), data[target_column]
+
+        # before: every fit bins the DataFrame again, as cross_val_score in the evaluation stage does
+        construct = lambda: lgb.Dataset(X, label=np.log1p(y), params={"verbosity": -1}).construct()
+        construct_seconds = np.median([timed(construct)[1] for _ in range(CONSTRUCT_RUNS)])
+        before_cv, before_cv_seconds = timed(lambda: -cross_val_score(build_model(lgbm_params), X, y, cv=CV_FOLDS,
+                                                                      scoring="neg_mean_absolute_error", n_jobs=-1))
+        _, before_tuning_seconds = timed(lambda: [cross_val_score(build_model(trial), X, y, cv=CV_FOLDS,
+                                                                  scoring="neg_mean_absolute_error", n_jobs=-1)
+                                                  for trial in trials])
+        before_constructions = CV_FOLDS * (1 + TRIALS)
+
+        # after: binned once, saved and loaded as the train_dataset stage and the evaluation stage do, the
+        # folds of the cross validation and of every trial are subsets of it
+        dataset, build_seconds = timed(lambda: build_dataset(X, y))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dataset_path = Path(tmp_dir) / "train.bin"
+            _, save_seconds = timed(lambda: dataset.save_binary(str(dataset_path)))
+            dataset, load_seconds = timed(lambda: load_dataset(dataset_path))
+            binary_bytes = dataset_path.stat().st_size
+        after_cv, after_cv_seconds = timed(lambda: cross_validate(dataset, lgbm_params))
+        _, after_tuning_seconds = timed(lambda: [cross_validate(dataset, trial) for trial in trials])
+
+        results[f"x{scale}"] = {
+            "rows": len(data),
+            "before": {
+                "constructions": before_constructions,
+                # median construction time times the constructions made
+                "construct_seconds": float(construct_seconds * before_constructions),
+                "cv_seconds": before_cv_seconds,
+                "tuning_seconds": before_tuning_seconds,
+                "total_seconds": before_cv_seconds + before_tuning_seconds,
+                "cv_mae": float(before_cv.mean())
+            },
+            "after": {
+                "constructions": 1,
+                "construct_seconds": build_seconds,
+                "save_binary_seconds": save_seconds,
+                "load_binary_seconds": load_seconds,
+                "binary_bytes": binary_bytes,
+                "cv_seconds": after_cv_seconds,
+                "tuning_seconds": after_tuning_seconds,
+                "total_seconds": build_seconds + save_seconds + load_seconds + after_cv_seconds + after_tuning_seconds,
+                "cv_mae": float(after_cv.mean())
+            }
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    root_path = Path(__file__).parent.parent
+    save_dir = root_path / "reports" / "benchmarks"
+    save_dir.mkdir(exist_ok=True, parents=True)
+
+    results = run(root_path)
+    with open(save_dir / "training.json", "w") as f:
+        json.dump(results, f, indent=4)
+
+    # side by side table
+    table = pd.concat({scale: pd.DataFrame({mode: result[mode] for mode in ["before", "after"]})
+                       for scale, result in results.items()}, axis=1)
+    print(table.to_string(float_format=lambda value: f"{value:.6g}"))
@@ -0,0 +1,54 @@
+import numpy as np
+import os
+import time
+import tracemalloc
+
+
+def summarize_latency(seconds: list) -> dict:
+    seconds = np.asarray(seconds)
+    return {
+        "runs": len(seconds),
+        "mean_ms": float(seconds.mean() * 1e3),
+        "median_ms": float(np.median(seconds) * 1e3),
+        "p95_ms": float(np.percentile(seconds, 95) * 1e3),
+        "p99_ms": float(np.percentile(seconds, 99) * 1e3)
+    }
+
+
+def time_calls(call, runs: int, warmup: int = 3) -> list:
+    for _ in range(warmup):
+        call()
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def current_rss_mb() -> float:
+    # resident set size right now, linux only
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def measure_load(load) -> tuple:
+    # load time, python allocations and rss growth of loading an artifact
+    rss_before = current_rss_mb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = load()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = current_rss_mb()
+
+    return loaded, {
+        "seconds": seconds,
+        "traced_peak_mb": peak / 2 ** 20,
+        "rss_growth_mb": None if rss_before is None else rss_after - rss_before
+    }
@@ -30,27 +30,55 @@ fi
 echo "✓ AWS CLI found at: $AWS_BIN"
 "$AWS_BIN" --version
 
-# Build cron line with full path and its own logging
-CRON_JOB="*/10 * * * * $AWS_BIN s3 sync /var/mlops/audit s3://mlops-audit-backups/audit >> /home/ubuntu/s3_sync.log 2>&1"
+# Find docker, the monitoring and compaction jobs run inside the app container
+DOCKER_BIN="$(command -v docker || true)"
+if [ -z "$DOCKER_BIN" ]; then
+  echo "ERROR: docker not found in PATH"
+  exit 1
+fi
+
+# Installs a cron line, replacing any earlier line with the same marker
+install_cron_job() {
+    local marker="$1"
+    local job="$2"
 
-# Load existing crontab (do not let failure kill script)
-crontab -l 2>/dev/null > /tmp/current_cron || touch /tmp/current_cron
+    # Load existing crontab (do not let failure kill script)
+    crontab -l 2>/dev/null > /tmp/current_cron || touch /tmp/current_cron
 
-# Append job if missing
-if ! grep -Fq "s3 sync /var/mlops/audit s3://mlops-audit-backups/audit" /tmp/current_cron; then
-    echo "$CRON_JOB" >> /tmp/current_cron
-    if crontab /tmp/current_cron; then
-        echo "✓ Cron job added successfully"
+    if grep -Fxq "$job" /tmp/current_cron; then
+        echo "✓ Cron job already exists: $marker"
     else
-        echo "ERROR: failed to install crontab for ubuntu"
-        rm -f /tmp/current_cron
-        exit 1
+        grep -Fv "$marker" /tmp/current_cron > /tmp/new_cron || true
+        echo "$job" >> /tmp/new_cron
+        if crontab /tmp/new_cron; then
+            echo "✓ Cron job installed: $marker"
+        else
+            echo "ERROR: failed to install crontab for ubuntu"
+            rm -f /tmp/current_cron /tmp/new_cron
+            exit 1
+        fi
     fi
-else
-    echo "✓ Cron job already exists"
-fi
 
-rm -f /tmp/current_cron
+    rm -f /tmp/current_cron /tmp/new_cron
+}
+
+# Compacted partitions never change once written, so the sync only uploads new
+# partitions and the small active segment. Files being written and locks are skipped
+install_cron_job "s3 sync /var/mlops/audit s3://mlops-audit-backups/audit" \
+    "*/10 * * * * $AWS_BIN s3 sync /var/mlops/audit s3://mlops-audit-backups/audit --exclude \"*.tmp\" --exclude \"*.lock\" >> /home/ubuntu/s3_sync.log 2>&1"
+
+# ============================================
+# 3. SETUP CRON JOBS FOR DRIFT MONITORING AND COMPACTION
+# ============================================
+# Both run from the audit directory, so their state, reports and logs are synced
+# to S3 with the audit log. The monitor reads the records appended since its last run
+install_cron_job "python -m src.drift_monitor >>" \
+    "5 * * * * $DOCKER_BIN exec -w /app/audit real-estate python -m src.drift_monitor >> /home/ubuntu/drift_monitor.log 2>&1"
+
+# After midnight the closed days move into date partitions under history/. The
+# monitor runs first so no record leaves the log before it is monitored
+install_cron_job "python -m src.audit_compaction" \
+    "15 0 * * * $DOCKER_BIN exec -w /app/audit real-estate sh -c \"python -m src.drift_monitor && python -m src.audit_compaction\" >> /home/ubuntu/audit_compaction.log 2>&1"
 
 # Verify cron job was added
 echo "Current crontab for ubuntu:"
@@ -3,6 +3,10 @@ import pandas as pd
 import plotly.express as px
 import seaborn as sns
 import matplotlib.pyplot as plt
+import json
+from pathlib import Path
+from src.geo_layers import GeoLayers
+from src.schema import load_dtypes
 
 
 class AnalysisApp:
@@ -16,6 +20,8 @@ class AnalysisApp:
         st.title("📊 Real Estate Analytics Dashboard")
 
         self.df = self.load_data()
+        self.metadata = self.load_metadata()
+        self.geo_layers = self.load_geo_layers()
         self.filtered_df, self.selected_propertytype = self.sidebar_filters(self.df)
         self.show_kpi_cards(self.filtered_df, self.selected_propertytype)
         self.map_plot()
@@ -31,7 +37,20 @@ class AnalysisApp:
     @staticmethod
     @st.cache_data
     def load_data():
-        return pd.read_csv("data/raw/real_estate.csv")
+        return pd.read_csv("data/raw/real_estate.csv", dtype=load_dtypes(Path("data/app/metadata.json")))
+
+    @staticmethod
+    @st.cache_resource
+    def load_metadata():
+        # filter options precomputed by the pipeline
+        with open("data/app/metadata.json", "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    @st.cache_resource
+    def load_geo_layers():
+        # map layers precomputed by the pipeline
+        return GeoLayers.load(Path("data/app/geo_layers.parquet"))
 
     # -------------------- SIDEBAR FILTERS --------------------
     
@@ -41,21 +60,23 @@ class AnalysisApp:
             st.header("🔎 Filters")
 
             # Region filter
-            regions = ["overall"] + sorted(df["region"].unique().tolist())
+            regions = ["overall"] + self.metadata["options"]["region"]
             selected_region = st.selectbox("Region", regions)
+            self.selected_region = selected_region
 
             if selected_region != "overall":
                 df = df[df["region"] == selected_region]
 
             # Locality filter
-            localities = ["overall"] + sorted(df["locality"].unique().tolist())
+            localities = ["overall"] + self.metadata["localities"][selected_region]
             selected_locality = st.selectbox("Locality", localities)
+            self.selected_locality = selected_locality
 
             if selected_locality != "overall":
                 df = df[df["locality"] == selected_locality]
 
             # Property type filter
-            property_types = ["overall"] + sorted(df["propertytype"].unique().tolist())
+            property_types = ["overall"] + self.metadata["propertytypes"][selected_region][selected_locality]
             selected_propertytype = st.selectbox("Property Type", property_types)
 
             if selected_propertytype != "overall":
@@ -120,34 +141,48 @@ class AnalysisApp:
     def map_plot(self):
         st.header("📍 Price per Sqft Geomap")
 
-        # Case 1: Single locality selected → show ALL points
-        if self.filtered_df["locality"].nunique() == 1:
+        # Case 1: Single locality selected → show binned points
+        if self.selected_locality != "overall":
+
+            precision = st.select_slider(
+                "Map detail",
+                options=self.geo_layers.precisions,
+                value=self.geo_layers.precisions[-1]
+            )
+            layer_df = self.geo_layers.cell_layer(
+                self.selected_region,
+                self.selected_locality,
+                self.selected_propertytype,
+                precision
+            )
+
+            if layer_df.empty:
+                st.info("No locations available for selected filters.")
+                return
 
             fig = px.scatter_mapbox(
-                self.filtered_df,
+                layer_df,
                 lat="latitude",
                 lon="longitude",
                 color="price_per_sqft",
                 size="superbuiltupareasqft",
-                hover_name="locality",
-                hover_data=["price", "bedrooms"],
+                hover_name="cell",
+                hover_data=["price", "listings"],
                 mapbox_style="open-street-map",
                 zoom=13
             )
 
         # Case 2: Multiple localities → show aggregated points
         else:
-            group_df = (
-                self.filtered_df
-                .groupby("locality", as_index=False)
-                .agg({
-                    "price_per_sqft": "mean",
-                    "superbuiltupareasqft": "mean",
-                    "latitude": "mean",
-                    "longitude": "mean"
-                })
+            group_df = self.geo_layers.locality_layer(
+                self.selected_region,
+                self.selected_propertytype
             )
 
+            if group_df.empty:
+                st.info("No locations available for selected filters.")
+                return
+
             fig = px.scatter_mapbox(
                 group_df,
                 lat="latitude",
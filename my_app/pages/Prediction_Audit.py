@@ -0,0 +1,161 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from datetime import datetime, time
+from pathlib import Path
+from src.audit import AuditHistory, PRICE_EDGES
+
+PREDICTION_LOG_PATH = "audit/predictions.csv"
+
+# periods the prediction volume can be counted per
+PERIODS = {"Hour": "h", "Day": "D", "Week": "W"}
+# latest predictions listed, read from the last day of the range
+LATEST_ROWS = 200
+
+
+# ---------------------------
+# Page Configuration
+# ---------------------------
+st.set_page_config(
+    page_title="Prediction Audit",
+    page_icon="🧾",
+    layout="wide"
+)
+
+
+@st.cache_resource
+def load_history():
+    # compacted history and active audit log, kept between reruns so only new files and records are read
+    return AuditHistory(Path(PREDICTION_LOG_PATH))
+
+
+def median_price(buckets: pd.Series) -> float:
+    # median from the price bucket counts, the geometric middle of the bucket holding it
+    counts = buckets.sort_index()
+    bucket = counts.index[np.searchsorted(counts.cumsum().to_numpy(), counts.sum() / 2)]
+    return float(np.sqrt(PRICE_EDGES[bucket] * PRICE_EDGES[bucket + 1]))
+
+
+history = load_history()
+# prediction count and price sum per hour, region, property type and price bucket
+aggregates = history.refresh()
+
+# ---------------------------
+# Header
+# ---------------------------
+st.title("🧾 Prediction Audit")
+st.caption("What the deployed model has been predicting, from the prediction audit log")
+
+st.divider()
+
+if aggregates.empty:
+    st.info("No predictions have been logged yet.")
+    st.stop()
+
+# ---------------------------
+# Sidebar Filters
+# ---------------------------
+first_day, last_day = aggregates["hour"].min().date(), aggregates["hour"].max().date()
+with st.sidebar:
+    st.header("🔎 Filters")
+
+    date_range = st.date_input("Date range", value=(first_day, last_day), min_value=first_day, max_value=last_day)
+    regions = st.multiselect("Region", sorted(aggregates["region"].unique()))
+    propertytypes = st.multiselect("Property Type", sorted(aggregates["propertytype"].unique()))
+    period = st.radio("Volume per", list(PERIODS), index=1, horizontal=True)
+
+# the range is a single day while its end is being picked
+start = pd.Timestamp(date_range[0])
+end = pd.Timestamp(datetime.combine(date_range[-1], time.max))
+
+selected = aggregates[aggregates["hour"].between(start, end)]
+if regions:
+    selected = selected[selected["region"].isin(regions)]
+if propertytypes:
+    selected = selected[selected["propertytype"].isin(propertytypes)]
+
+if selected.empty:
+    st.warning("No predictions match the filters.")
+    st.stop()
+
+# ---------------------------
+# KPIs
+# ---------------------------
+predictions = int(selected["count"].sum())
+price_buckets = selected.groupby("price_bucket")["count"].sum()
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Predictions", f"{predictions:,}")
+col2.metric("Average Predicted Price", f"₹ {selected['price_sum'].sum() / predictions:,.2f} crores")
+col3.metric("Median Predicted Price", f"₹ {median_price(price_buckets):,.2f} crores")
+col4.metric("Regions", selected["region"].nunique())
+
+# ---------------------------
+# Volume
+# ---------------------------
+st.subheader("📈 Prediction Volume")
+
+volume = selected.groupby(pd.Grouper(key="hour", freq=PERIODS[period]))["count"].sum().reset_index()
+fig = px.bar(volume, x="hour", y="count", labels={"hour": "", "count": "Predictions"})
+fig.update_layout(template="plotly_white", bargap=0.1)
+st.plotly_chart(fig, use_container_width=True)
+
+# ---------------------------
+# Input Mix
+# ---------------------------
+st.subheader("🏘 Input Mix")
+
+col1, col2 = st.columns(2)
+mix = selected.groupby(["region", "propertytype"], observed=True)["count"].sum().reset_index()
+fig = px.bar(mix, x="region", y="count", color="propertytype",
+             labels={"region": "Region", "count": "Predictions", "propertytype": "Property Type"},
+             title="Predictions by region and property type")
+fig.update_layout(template="plotly_white", xaxis={"categoryorder": "total descending"})
+col1.plotly_chart(fig, use_container_width=True)
+
+types = mix.groupby("propertytype")["count"].sum().reset_index()
+fig = px.pie(types, names="propertytype", values="count", title="Property type share", hole=0.4)
+col2.plotly_chart(fig, use_container_width=True)
+
+# ---------------------------
+# Predicted Price Distribution
+# ---------------------------
+st.subheader("💰 Predicted Price Distribution")
+
+lower, upper = PRICE_EDGES[price_buckets.index], PRICE_EDGES[price_buckets.index + 1]
+fig = go.Figure(
+    go.Bar(
+        x=np.sqrt(lower * upper),
+        y=price_buckets.values,
+        width=upper - lower,
+        customdata=np.column_stack([lower, upper]),
+        hovertemplate="₹ %{customdata[0]:.2f} – %{customdata[1]:.2f} crores: %{y} predictions<extra></extra>"
+    )
+)
+fig.update_layout(
+    xaxis_type="log",
+    xaxis_title="Predicted price (crores, log scale)",
+    yaxis_title="Predictions",
+    bargap=0.05,
+    template="plotly_white"
+)
+st.plotly_chart(fig, use_container_width=True)
+
+# ---------------------------
+# Latest Predictions
+# ---------------------------
+# raw records of the last day of the range, only the history files overlapping it are read
+latest = history.read(max(start, end.normalize()), end)
+if regions:
+    latest = latest[latest["region"].isin(regions)]
+if propertytypes:
+    latest = latest[latest["propertytype"].isin(propertytypes)]
+
+with st.expander(f"🧾 Latest predictions on {end.date()}"):
+    st.dataframe(
+        latest.tail(LATEST_ROWS).iloc[::-1],
+        use_container_width=True,
+        hide_index=True
+    )
@@ -1,14 +1,20 @@
 import streamlit as st
 import pandas as pd
-import joblib
 from pathlib import Path
-import plotly.express as px
-import mlflow
-import dagshub
+import numpy as np
+import plotly.graph_objects as go
 import json
 from mlflow import MlflowClient
-from sklearn.pipeline import Pipeline
 from sklearn import set_config
+from src.comparables import Comparables
+from src.market_stats import MarketStats
+from src.config import init_tracking
+from src.bundle import load_registered_bundle
+from src.explain import PredictionMemo, price_effects
+from src.sensitivity import SensitivityCurves, area_values, AREA_POINTS, PREDICTION_COLUMN
+from src.audit import append_records
+from src.data_preprocessing import used_inputs
+from src.schema import feature_columns
 
 set_config(transform_output="pandas")
 
@@ -27,39 +33,29 @@ def save_prediction_to_csv(input_df, prediction):
     # add timestamp
     record["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # create folder if not exists
-    Path("audit").mkdir(exist_ok=True)
-
-    # append to CSV
-    record.to_csv(
-        PREDICTION_LOG_PATH,
-        mode="a",
-        header=not Path(PREDICTION_LOG_PATH).exists(),
-        index=False
-    )
-
-
-
-
-def init_mlflow_once():
-    if "mlflow_initialized" not in st.session_state:
-        dagshub.init(
-            repo_owner="sourav664",
-            repo_name="real-estate-hybrid-app",
-            mlflow=True
-        )
-        mlflow.set_tracking_uri(
-            "https://dagshub.com/sourav664/real-estate-hybrid-app.mlflow"
-        )
-        st.session_state.mlflow_initialized = True
-
-
-init_mlflow_once()
+    # append to CSV, in the fixed column order and without a header the drift monitor reads it with,
+    # under the lock the compaction takes to swap in the active segment
+    append_records(PREDICTION_LOG_PATH, record)
 
 
 
 
 
+# names of the model inputs in the explanation
+INPUT_LABELS = {
+    "propertytype": "Property type",
+    "region": "Region",
+    "locality": "Locality",
+    "bedrooms": "Bedrooms",
+    "bathrooms": "Bathrooms",
+    "balconies": "Balconies",
+    "superbuiltupareasqft": "Super built-up area",
+    "transactiontype": "Transaction type",
+    "ageofcons": "Age of construction",
+    "furnished": "Furnishing",
+    "additionalRooms": "Additional room",
+    "totalfloornumber": "Total floors"
+}
 
 FLOOR_LIMITS = {
     "multistorey apartment": 60,
@@ -69,32 +65,92 @@ FLOOR_LIMITS = {
     "penthouse": 60
 }
 
-df = pd.read_csv(Path("data/raw/real_estate.csv"))
-
-def get_similar_properties(
-    df,
-    region,
-    propertytype,
-    bedrooms,
-    superbuiltupareasqft
-):
-    similar = df[
-        (df["region"] == region) &
-        (df["propertytype"] == propertytype) &
-        (df["bedrooms"] == bedrooms)
-    ]
+@st.cache_resource
+def load_bundle():
+    # preprocessor, booster, target transform and option metadata of the production model, in one file
+    # logged with its run, connecting to the tracking store on the first load only
+    init_tracking()
+    with open("run_information.json", "r") as f:
+        model_name = json.load(f)["model_name"]
 
-    # Area tolerance ±20%
-    lower_area = superbuiltupareasqft * 0.8
-    upper_area = superbuiltupareasqft * 1.2
+    return load_registered_bundle(model_name, stage="Production")
 
-    similar = similar[
-        (similar["superbuiltupareasqft"] >= lower_area) &
-        (similar["superbuiltupareasqft"] <= upper_area)
-    ]
 
-    return similar
+@st.cache_resource
+def load_memo():
+    # predictions with the contribution of every input, each new input explained in one booster pass
+    return PredictionMemo(load_bundle())
+
 
+@st.cache_resource
+def load_sensitivity():
+    # what-if price curves, each grid of variants scored in one batch and kept per base input
+    return SensitivityCurves(load_bundle())
+
+
+@st.cache_resource
+def load_comparables():
+    # k-nearest listings index built by the pipeline
+    return Comparables.load(Path("data/app/comparables.joblib"))
+
+
+@st.cache_resource
+def load_market_stats():
+    # per-segment price sketches built by the pipeline
+    return MarketStats.load(Path("data/app/market_stats.joblib"))
+
+
+bundle = load_bundle()
+memo = load_memo()
+sensitivity = load_sensitivity()
+# option lists, region -> localities and numeric bounds the model was trained with
+metadata = bundle.metadata
+market_stats = load_market_stats()
+comparables = load_comparables()
+options = metadata["options"]
+bounds = metadata["bounds"]
+# inputs the model has a column of, the preprocessor of a feature selected bundle does not encode the others
+model_inputs = used_inputs(feature_columns, list(bundle.preprocessor.get_feature_names_out()))
+
+# inputs the what-if curves can be compared across, with the values each curve is drawn for
+SWEEP_SERIES = {name: values for name, values in {
+    "bedrooms": list(range(1, int(bounds["bedrooms"]["max"]) + 1)),
+    "bathrooms": list(range(1, int(bounds["bathrooms"]["max"]) + 1)),
+    "furnished": options["furnished"],
+    "ageofcons": options["ageofcons"],
+    "transactiontype": options["transactiontype"]
+}.items() if name in model_inputs}
+
+
+@st.fragment
+def sensitivity_panel(base: dict):
+    # reruns on its own when the sweep is changed, the rest of the page is left as it is
+    st.subheader("🔀 What if?")
+
+    col1, col2 = st.columns(2)
+    series = col1.selectbox("Compare across", list(SWEEP_SERIES), format_func=INPUT_LABELS.get)
+    points = col2.slider("Area points", 20, 1000, AREA_POINTS, step=10)
+
+    area = "superbuiltupareasqft"
+    curves = sensitivity.sweep(base, {
+        area: area_values(base[area], bounds[area], points),
+        series: SWEEP_SERIES[series]
+    })
+
+    fig = go.Figure([
+        go.Scatter(x=curve[area], y=curve[PREDICTION_COLUMN], mode="lines", name=str(value))
+        for value, curve in curves.groupby(series, sort=False)
+    ])
+    fig.add_vline(x=base[area], line_dash="dash", annotation_text="Your property", annotation_position="top")
+    fig.update_layout(
+        title=f"Estimated price by area and {INPUT_LABELS[series].lower()}",
+        xaxis_title="Super built-up area (sqft)",
+        yaxis_title="Estimated price (crores)",
+        legend_title=INPUT_LABELS[series],
+        template="plotly_white"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{len(curves):,} variants of your property, scored in one batch")
 
 # ---------------------------
 # Page Configuration
@@ -105,37 +161,9 @@ st.set_page_config(
     layout="wide"
 )
 
-# ---------------------------
-# Load Model
-# ---------------------------
-
-@st.cache_resource
-def load_pipeline():
-    # load preprocessor
-    preprocessor = joblib.load("models/preprocesser.joblib")
-
-    # load MLflow model
-    with open("run_information.json", "r") as f:
-        model_name = json.load(f)["model_name"]
-
-    model = mlflow.sklearn.load_model(
-        f"models:/{model_name}/Production"
-    )
-
-    # build pipeline
-    pipeline = Pipeline([
-        ("preprocess", preprocessor),
-        ("regressor", model)
-    ])
-
-    return pipeline
-
-
-model_pipe = load_pipeline()
-
-
 @st.cache_resource
 def get_model_r2_score():
+    init_tracking()
     client = MlflowClient()
 
     with open("run_information.json", "r") as f:
@@ -191,12 +219,12 @@ with st.sidebar:
 
     transactiontype = st.radio(
         "Transaction Type",
-        sorted(df["transactiontype"].unique().tolist())
+        options["transactiontype"]
     )
 
     furnished = st.radio(
         "Furnishing Status",
-        sorted(df["furnished"].unique().tolist())
+        options["furnished"]
     )
 
     st.divider()
@@ -204,11 +232,11 @@ with st.sidebar:
     # -------- Property Configuration --------
     st.subheader("📐 Property Configuration")
 
-    bedrooms = st.slider("Bedrooms", 1, int(df["bedrooms"].max()), 2)
-    bathrooms = st.slider("Bathrooms", 1, int(df["bathrooms"].max()), 2)
-    balconies = st.slider("Balconies", 0, int(df["balconies"].max()), 1)
+    bedrooms = st.slider("Bedrooms", 1, int(bounds["bedrooms"]["max"]), 2)
+    bathrooms = st.slider("Bathrooms", 1, int(bounds["bathrooms"]["max"]), 2)
+    balconies = st.slider("Balconies", 0, int(bounds["balconies"]["max"]), 1)
 
-    additional_room = st.selectbox("Additional Room", sorted(df['additionalRooms'].unique().tolist()))
+    additional_room = st.selectbox("Additional Room", options["additionalRooms"])
     st.write("0: No, 1: Yes")
  
 
@@ -219,9 +247,9 @@ with st.sidebar:
 
     region = st.selectbox(
         "Region",
-        df['region'].unique().tolist()
+        options["region"]
     )
-    locality_data = df[df['region'] == region]['locality'].unique().tolist()
+    locality_data = metadata["localities"][region]
     locality = st.selectbox(
         "Locality",
         locality_data
@@ -257,7 +285,7 @@ with st.sidebar:
 
     ageofcons = st.selectbox(
         "Age of Construction",
-        sorted(df['ageofcons'].unique().tolist())
+        options["ageofcons"]
     )
 
     predict_btn = st.button("🔍 Predict Price", use_container_width=True)
@@ -283,8 +311,11 @@ if predict_btn:
         "totalfloornumber": totalfloornumber
           }])
         
-        # input_df = preprocessor.transform(input_data)
-        prediction = model_pipe.predict(input_data)[0]
+        # the bundle applies the column order and dtypes the model was trained on,
+        # the memo returns the prediction with its explanation and interval
+        predictions, contributions, intervals = memo.lookup(input_data)
+        prediction = predictions[0]
+        lower, upper = intervals[0]
         save_prediction_to_csv(input_data, prediction)
         
 
@@ -295,6 +326,8 @@ if predict_btn:
         label="📈 Estimated Property Price",
         value=f"₹ {prediction:,.2f} crores",
     )
+    if bundle.quantiles:
+        st.caption(f"{bundle.coverage:.0%} prediction interval: ₹ {lower:,.2f} – {upper:,.2f} crores")
 
     st.divider()
 
@@ -302,14 +335,38 @@ if predict_btn:
     # Explanation Section
     # ---------------------------
     st.subheader("🧠 Why this price?")
-    st.write("""
-    The estimated price is mainly influenced by:
-    - **Region**
-    - **Locality** (local market demand)
-    - **SuperBuilt-up area**
-    - **Number of bedrooms**
-    - **Property type**
-    """)
+
+    # effect of every input the model uses against the average listing it was trained on, largest first
+    effects = price_effects(contributions.iloc[0][model_inputs], bundle.target_transform).rename(index=INPUT_LABELS)
+    effects = effects.reindex(effects.abs().sort_values().index)
+    unit = "%" if bundle.target_transform == "log1p" else " crores"
+
+    top = effects.iloc[::-1].head(3)
+    st.write("The estimate is mainly driven by: " + ", ".join(
+        f"**{label}** ({effect:+.1f}{unit})" for label, effect in top.items()))
+
+    fig = go.Figure(
+        go.Bar(
+            x=effects.values,
+            y=effects.index,
+            orientation="h",
+            marker_color=["#2ca02c" if effect >= 0 else "#d62728" for effect in effects.values]
+        )
+    )
+    fig.update_layout(
+        title="Effect of each input on the estimated price",
+        xaxis_title=f"Effect on price ({unit.strip()})",
+        height=420,
+        margin=dict(l=10, r=10, t=50, b=10)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.divider()
+
+    # ---------------------------
+    # Sensitivity Section
+    # ---------------------------
+    sensitivity_panel(input_data.iloc[0].to_dict())
 
     st.divider()
 
@@ -318,28 +375,40 @@ if predict_btn:
     # ---------------------------
     st.subheader("📊 Market Insights")
     st.info("Price distribution and comparison charts will appear here.")
-    similar_properties = get_similar_properties(
-                                                df=df,
-                                                region=region,
-                                                propertytype=propertytype,
-                                                bedrooms=bedrooms,
-                                                superbuiltupareasqft=superbuiltupareasqft
-                                            )
-    
-    if similar_properties.empty:
+    market = market_stats.query(
+                                region=region,
+                                propertytype=propertytype,
+                                bedrooms=bedrooms,
+                                superbuiltupareasqft=superbuiltupareasqft
+                            )
+
+    # nearest comparable listings in the region
+    distances, rows = comparables.nearest(
+                                          region=region,
+                                          locality=locality,
+                                          superbuiltupareasqft=superbuiltupareasqft,
+                                          bedrooms=bedrooms,
+                                          bathrooms=bathrooms,
+                                          totalfloornumber=totalfloornumber
+                                      )
+
+    # no listing of the segment within ±20% of the area
+    if market is None:
         st.warning("Not enough similar properties found for market comparison.")
         st.stop()
-        
-        
+
+
 
     # -------- Price Distribution --------
     
+    hist_edges = market["hist_edges"]
 
-    fig = px.histogram(
-    similar_properties,
-    x="price",
-    nbins=30,
-    title="Price Distribution of Similar Properties"
+    fig = go.Figure(
+        go.Bar(
+            x=(hist_edges[:-1] + hist_edges[1:]) / 2,
+            y=market["hist_counts"],
+            width=np.diff(hist_edges)
+        )
     )
 
     # Add vertical line for predicted price
@@ -351,17 +420,8 @@ if predict_btn:
         annotation_position="top"
     )
 
-    fig.update_layout(
-        xaxis_title="Price",
-        yaxis_title="Number of Properties",
-        bargap=0.05,
-        template="plotly_white"
-    )
-
-    st.plotly_chart(fig, use_container_width=True)
-
     # -------- Market Average --------
-    market_avg = similar_properties["price"].mean()
+    market_avg = market["mean"]
 
     fig.add_vline(
         x=market_avg,
@@ -370,6 +430,17 @@ if predict_btn:
         annotation_text="Market Average",
         annotation_position="top"
     )
+
+    fig.update_layout(
+        title="Price Distribution of Similar Properties",
+        xaxis_title="Price",
+        yaxis_title="Number of Properties",
+        bargap=0.05,
+        template="plotly_white"
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
+
     diff = prediction - market_avg
     TOLERANCE = 0.01  # 0.01 crore ≈ 1 lakh
 
@@ -394,9 +465,18 @@ if predict_btn:
 
     col1, col2, col3 = st.columns(3)
 
-    col1.metric("Median Price", f"₹ {similar_properties['price'].median():,.2f} crores")
-    col2.metric("Min Price", f"₹ {similar_properties['price'].min():,.2f} crores")
-    col3.metric("Max Price", f"₹ {similar_properties['price'].max():,.2f} crores")
+    col1.metric("Median Price", f"₹ {market['median']:,.2f} crores")
+    col2.metric("Min Price", f"₹ {market['min']:,.2f} crores")
+    col3.metric("Max Price", f"₹ {market['max']:,.2f} crores")
+
+    # -------- Comparable Properties --------
+    if len(rows) > 0:
+        with st.expander(f"🏘 {len(rows)} most comparable properties in {region}"):
+            st.dataframe(
+                comparables.listings(region, rows, distances),
+                use_container_width=True,
+                hide_index=True
+            )
 
 
 
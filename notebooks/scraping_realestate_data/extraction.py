@@ -1,21 +1,47 @@
 import os
 import json
-import pandas as pd
-from multiprocessing import Pool, Manager
-import itertools
+import csv
+import re
+import argparse
+import bisect
+import hashlib
+import math
+import pickle
+import resource
+import tempfile
 import time
+import warnings
+from multiprocessing import Pool
 from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# orjson is optional, the standard json module is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Set directories relative to the script's location
 BASE_DIR = Path(__file__).resolve().parent
-INPUT_DIRECTORY = BASE_DIR / 'Data/propertyDetailsgurgaon'
 OUTPUT_DIRECTORY = BASE_DIR / 'Data'
+# every city is scraped into Data/propertyDetails<city>
+INPUT_PREFIX = 'propertyDetails'
 
-# List of all JSON files
-file_names = [
-    os.path.join(INPUT_DIRECTORY, property)
-    for property in os.listdir(INPUT_DIRECTORY) if property.endswith('.json')
-]
+# digits of a number that may not fit in 64 bits
+LONG_NUMBER = re.compile(rb"\d{19}")
+
+# files sent to a worker at a time
+CHUNK_SIZE = 250
+# rows held in memory before they are written out
+BATCH_ROWS = 5000
+
+# dataset partitioned by city (city=<city>/part-N.parquet), each partition keeps the manifest of its files
+DATASET_DIRECTORY = OUTPUT_DIRECTORY / 'rawExtractedPropertyDetails'
+MANIFEST_NAME = '_manifest.csv'
+MANIFEST_COLUMNS = ["file", "size", "mtime_ns", "sha1", "part", "row"]
 
 
 COLUMNS = [
@@ -54,68 +80,436 @@ COLUMNS = [
     "shortAddress"
 ]
 
-# Function to process a single JSON file
+# the dataset holds every column as text, the value as str() writes it
+SCHEMA = pa.schema([(column, pa.string()) for column in COLUMNS])
+
+# a value of every dtype pandas gives a column of a one row frame, the csv columns get the dtype pandas.concat
+# of the per-file frames of the original extraction promoted them to
+DTYPE_MARKERS = {"none": None, "bool": True, "int64": 0, "uint64": 2 ** 63, "bigint": 2 ** 64,
+                 "float64": 0.5, "nan": math.nan, "object": ""}
+
+
+def list_files(input_directory):
+    # List of all JSON files, in directory order like the original extraction
+    return [
+        os.path.join(input_directory, property)
+        for property in os.listdir(input_directory) if property.endswith('.json')
+    ]
+
+
+def loads(content: bytes):
+    # orjson turns integers beyond 64 bits into floats, files with a number that long are left to json
+    if orjson is not None and LONG_NUMBER.search(content) is None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # NaN and Infinity are only accepted by json
+            pass
+    return json.loads(content.decode('utf-8'))
+
+
+# Function to process a single JSON file into a row tuple
 def process_file(file_path):
     try:
-        temp = {column: [] for column in COLUMNS}
-        
-        with open(file_path, 'r', encoding='utf-8') as json_file:
-            data = json.load(json_file).get('propertyDetailInfoBeanData')
-        
-        if data is not None:
-            try:
-                for column in COLUMNS:
-                    temp[column].append(data.get('propertyDetail').get('detailBean').get(column))
-            except Exception as e:
-                print(f"Error processing column {column} with file_path {file_path}: {e}")
-        else:
+        with open(file_path, 'rb') as json_file:
+            return parse_content(file_path, json_file.read())
+
+    except Exception as e:
+        print(f"\n\nError processing file {file_path}: {e}\n\n")
+        return None
+
+
+def parse_content(file_path, content):
+    try:
+        data = loads(content).get('propertyDetailInfoBeanData')
+
+        if data is None:
             print(f"\n\nNo data found in {file_path}\n\n")
             return None
-        
-        # print(f"Processing done for {file_path}")
 
-        # Convert to DataFrame and return
-        return pd.DataFrame(temp)
+        try:
+            detail = data.get('propertyDetail').get('detailBean')
+            return tuple(detail.get(column) for column in COLUMNS)
+        except Exception as e:
+            print(f"Error processing file_path {file_path}: {e}")
+            return None
 
     except Exception as e:
         print(f"\n\nError processing file {file_path}: {e}\n\n")
         return None
 
-# Function to process files in batches
-def process_batch(batch_files):
-    batch_results = []
-    for file_path in batch_files:
-        # print(f"Processing file {file_path}")
-        result = process_file(file_path)
-        if result is not None:
-            batch_results.append(result)
-    print(f"Batch processing done for {len(batch_results)} files")
-    return batch_results
-
-# Function to process files using multiprocessing
-def process_files_in_batches(file_names, batch_size=1000, num_workers=4):
-    # Split files into batches
-    # print('splitting files into batches')
-    batches = [file_names[i:i + batch_size] for i in range(0, len(file_names), batch_size)]
-    # print(f"Total batches: {len(batches)}")
-
-    with Manager() as manager:  # noqa: F841
-        print('manager created')
+
+# Function to process a chunk of files, the index keeps the output in file order
+def process_chunk(indexed_chunk):
+    index, chunk_files = indexed_chunk
+    rows = []
+    for file_path in chunk_files:
+        row = process_file(file_path)
+        if row is not None:
+            rows.append(row)
+    return index, rows
+
+
+def value_dtype(value):
+    # key of DTYPE_MARKERS for the dtype of a one row frame holding the value
+    if value is None:
+        return "none"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int64" if -2 ** 63 <= value < 2 ** 63 else "uint64" if 0 <= value < 2 ** 64 else "bigint"
+    if isinstance(value, float):
+        return "nan" if math.isnan(value) else "float64"
+    return "object"
+
+
+def python_type(value):
+    # the python type a value of the concatenated frame stands for, None for values kept as they are
+    if isinstance(value, (bool, np.bool_)):
+        return bool
+    if isinstance(value, (int, np.integer)):
+        return int
+    if isinstance(value, (float, np.floating)):
+        return float
+    return None
+
+
+def column_types(seen):
+    # dtype of every column over the whole run and the type its values of every dtype are cast to, from the
+    # frames of the dtypes each column holds concatenated in the order they first appear in, like the frames
+    # of the files. An object column can still hold values cast to float
+    types = {}
+    with warnings.catch_warnings():
+        # the promotion of all missing entries is deprecated, the extraction keeps the one of this pandas
+        warnings.simplefilter("ignore", FutureWarning)
+        for column, dtypes in zip(COLUMNS, seen):
+            values = pd.concat([pd.DataFrame({column: [DTYPE_MARKERS[dtype]]}) for dtype in dtypes],
+                               ignore_index=True)[column]
+            casts = {dtype: python_type(value) for dtype, value in zip(dtypes, values) if dtype not in ("none", "nan")}
+            types[column] = (values.dtype, casts)
+    return types
+
+
+def write_batch(f, rows, types, header=False):
+    # the rows as pandas writes them in the promoted dtypes, the numbers of a float column get their decimals
+    columns = {column: [] for column in COLUMNS}
+    for column, values in zip(COLUMNS, zip(*rows)):
+        casts = types[column][1]
+        columns[column] = [value if casts.get(kind) is None else casts[kind](value)
+                           for value, kind in zip(values, map(value_dtype, values))]
+    frame = pd.DataFrame(columns, dtype=object)
+    frame = frame.astype({column: dtype for column, (dtype, _) in types.items() if dtype != object})
+    frame.to_csv(f, header=header, index=False)
+
+
+def peak_memory_mb():
+    # ru_maxrss is in kilobytes on linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, workers / 1024
+
+
+# Function to process a chunk of a city's files with their content hash, for the dataset
+def process_city_chunk(task):
+    city, index, chunk_files = task
+    records = []
+    for file_path in chunk_files:
+        try:
+            with open(file_path, 'rb') as json_file:
+                content = json_file.read()
+        except OSError as e:
+            # left out of the manifest, retried on the next run
+            print(f"\n\nError reading file {file_path}: {e}\n\n")
+            continue
+        records.append((file_path, hashlib.sha1(content).hexdigest(), parse_content(file_path, content)))
+    return city, index, records
+
+
+# Function to stream files through the pool into the output in bounded batches
+def process_files_in_batches(file_names, output_path, chunk_size=CHUNK_SIZE, batch_rows=BATCH_ROWS, num_workers=4):
+    chunks = [file_names[i:i + chunk_size] for i in range(0, len(file_names), chunk_size)]
+    start = time.perf_counter()
+
+    # the dtypes are only known once every file is read, the batches wait in a spool file until then
+    seen = [{} for _ in COLUMNS]
+    batches = []
+    with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(output_path))) as spool:
+        def spool_batch(batch):
+            for dtypes, values in zip(seen, zip(*batch)):
+                dtypes.update(dict.fromkeys(map(value_dtype, values)))
+            pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+            batches.append(len(batch))
+
+        # chunks finish out of order, hold the early ones until their turn
+        pending = {}
+        next_index = 0
+        batch = []
         with Pool(processes=num_workers) as pool:
-            print('pool created')
-            results = pool.map(process_batch, batches)
-        print('pool processing completed')
-        # Flatten the results and concatenate
-        all_results = list(itertools.chain.from_iterable(results))
-        print('all results collected')
-        return pd.concat(all_results, ignore_index=True) if all_results else pd.DataFrame()
+            for index, rows in pool.imap_unordered(process_chunk, enumerate(chunks)):
+                pending[index] = rows
+                while next_index in pending:
+                    batch.extend(pending.pop(next_index))
+                    next_index += 1
+                if len(batch) >= batch_rows:
+                    spool_batch(batch)
+                    batch = []
+        if batch:
+            spool_batch(batch)
+
+        spool.seek(0)
+        types = column_types(seen) if batches else {}
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            write_batch(f, [], types, header=True)
+            for _ in batches:
+                write_batch(f, pickle.load(spool), types)
+    total_rows = sum(batches)
+
+    seconds = time.perf_counter() - start
+    own_mb, workers_mb = peak_memory_mb()
+    return {
+        "files": len(file_names),
+        "rows": total_rows,
+        "seconds": seconds,
+        "files_per_second": len(file_names) / seconds if seconds else 0.0,
+        "peak_memory_mb": own_mb,
+        "peak_worker_memory_mb": workers_mb
+    }
+
+
+def city_directories(output_directory, cities=None):
+    # every Data/propertyDetails<city> directory, or only the requested cities
+    found = {name[len(INPUT_PREFIX):]: os.path.join(output_directory, name)
+             for name in sorted(os.listdir(output_directory))
+             if name.startswith(INPUT_PREFIX) and os.path.isdir(os.path.join(output_directory, name))}
+    if cities is None:
+        return found
+    missing = [city for city in cities if city not in found]
+    if missing:
+        raise FileNotFoundError(f"No {INPUT_PREFIX}<city> directory for {missing} in {output_directory}")
+    return {city: found[city] for city in cities}
+
+
+def load_manifest(manifest_path):
+    # file name -> entry of the last extraction, part and row are empty for files without a row
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', newline='', encoding='utf-8') as f:
+        return {entry["file"]: entry for entry in csv.DictReader(f)}
+
+
+def save_manifest(manifest, manifest_path):
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    with tempfile.NamedTemporaryFile('w', newline='', encoding='utf-8', dir=directory, delete=False) as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_COLUMNS, lineterminator=os.linesep)
+        writer.writeheader()
+        writer.writerows(manifest[name] for name in sorted(manifest))
+    os.replace(f.name, manifest_path)
+
+
+def scan_changes(input_directory, manifest):
+    # only the stat is compared here, unchanged files are never opened, files of the manifest that are
+    # gone from the directory are removed
+    changed = []
+    stats = {}
+    total = 0
+    with os.scandir(input_directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            total += 1
+            stat = entry.stat()
+            stats[entry.name] = (str(stat.st_size), str(stat.st_mtime_ns))
+            known = manifest.get(entry.name)
+            if known is None or (known["size"], known["mtime_ns"]) != stats[entry.name]:
+                changed.append(entry.path)
+    removed = sorted(name for name in manifest if name not in stats)
+    return changed, removed, stats, total
+
+
+def part_names(partition_directory):
+    return sorted(name for name in os.listdir(partition_directory)
+                  if name.startswith('part-') and name.endswith('.parquet'))
+
+
+def next_part_name(partition_directory):
+    # parts are numbered in the order they were written
+    numbers = [int(name[len('part-'):-len('.parquet')]) for name in part_names(partition_directory)]
+    return f"part-{max(numbers, default=-1) + 1:05d}.parquet"
+
+
+def batch_table(rows):
+    # columnar batch: every value as text, missing values as nulls
+    columns = zip(*rows)
+    return pa.table([pa.array([None if value is None else str(value) for value in column], pa.string())
+                     for column in columns], schema=SCHEMA)
+
+
+def drop_rows(part_path, rows):
+    # rewrite a part without the rows of files that were extracted again
+    table = pq.read_table(part_path)
+    keep = [position for position in range(table.num_rows) if position not in rows]
+    directory = os.path.dirname(os.path.abspath(part_path))
+    with tempfile.NamedTemporaryFile(dir=directory, suffix='.parquet', delete=False) as f:
+        pq.write_table(table.take(keep), f.name, compression='zstd')
+    os.replace(f.name, part_path)
+
+
+class PartitionWriter:
+    """
+    New rows of one city appended as a part of its partition, with the manifest kept in step.
+    """
+
+    def __init__(self, partition_directory, rebuild=False, batch_rows=BATCH_ROWS):
+        os.makedirs(partition_directory, exist_ok=True)
+        self.directory = partition_directory
+        self.manifest_path = os.path.join(partition_directory, MANIFEST_NAME)
+        if rebuild:
+            # full pass: drop the previous parts and manifest of the city
+            for name in part_names(partition_directory):
+                os.remove(os.path.join(partition_directory, name))
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+        self.manifest = load_manifest(self.manifest_path)
+        self.part_name = next_part_name(partition_directory)
+        self.batch_rows = batch_rows
+        self.writer = None
+        self.batch = []
+        self.rows = 0
+        self.superseded = {}
+
+    def add(self, records, stats):
+        for file_path, digest, row in records:
+            name = os.path.basename(file_path)
+            known = self.manifest.get(name)
+            entry = {"file": name, "size": stats[name][0], "mtime_ns": stats[name][1],
+                     "sha1": digest, "part": "", "row": ""}
+            if known is not None and known["sha1"] == digest:
+                # touched but identical, keep its row where it is
+                self.manifest[name] = {**known, "size": entry["size"], "mtime_ns": entry["mtime_ns"]}
+                continue
+            if known is not None and known["part"]:
+                self.superseded.setdefault(known["part"], set()).add(int(known["row"]))
+            if row is not None:
+                entry.update(part=self.part_name, row=str(self.rows + len(self.batch)))
+                self.batch.append(row)
+            self.manifest[name] = entry
+        if len(self.batch) >= self.batch_rows:
+            self.flush()
+
+    def remove(self, names):
+        # files deleted from the input, their rows are dropped on close like the rows of changed files
+        for name in names:
+            known = self.manifest.pop(name)
+            if known["part"]:
+                self.superseded.setdefault(known["part"], set()).add(int(known["row"]))
+
+    def flush(self):
+        if not self.batch:
+            return
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(os.path.join(self.directory, self.part_name), SCHEMA, compression='zstd')
+        # every bounded batch is one row group of the part
+        self.writer.write_table(batch_table(self.batch))
+        self.rows += len(self.batch)
+        self.batch = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+        # remove the old rows of changed files and shift the rows after them
+        for old_part, rows in self.superseded.items():
+            drop_rows(os.path.join(self.directory, old_part), rows)
+            removed = sorted(rows)
+            for entry in self.manifest.values():
+                if entry["part"] == old_part:
+                    entry["row"] = str(int(entry["row"]) - bisect.bisect_left(removed, int(entry["row"])))
+
+        save_manifest(self.manifest, self.manifest_path)
+        return {"rows": self.rows, "replaced_rows": sum(len(rows) for rows in self.superseded.values()),
+                "part": self.part_name if self.rows else None}
+
+
+# Function to extract several cities through one pool into the city partitions of the dataset
+def process_cities(city_inputs, dataset_directory, incremental=True, chunk_size=CHUNK_SIZE,
+                   batch_rows=BATCH_ROWS, num_workers=4):
+    start = time.perf_counter()
+
+    writers = {}
+    scans = {}
+    tasks = []
+    for city, input_directory in city_inputs.items():
+        writers[city] = PartitionWriter(os.path.join(dataset_directory, f"city={city}"),
+                                        rebuild=not incremental, batch_rows=batch_rows)
+        file_paths, removed, stats, total_files = scan_changes(input_directory, writers[city].manifest)
+        writers[city].remove(removed)
+        scans[city] = {"stats": stats, "files": total_files, "changed_files": len(file_paths),
+                       "removed_files": len(removed)}
+        tasks.extend((city, index, file_paths[i:i + chunk_size])
+                     for index, i in enumerate(range(0, len(file_paths), chunk_size)))
+
+    # chunks of all cities share the pool, each city is written in its own file order
+    pending = {city: {} for city in city_inputs}
+    next_index = dict.fromkeys(city_inputs, 0)
+    if tasks:
+        with Pool(processes=num_workers) as pool:
+            for city, index, records in pool.imap_unordered(process_city_chunk, tasks):
+                pending[city][index] = records
+                while next_index[city] in pending[city]:
+                    writers[city].add(pending[city].pop(next_index[city]), scans[city]["stats"])
+                    next_index[city] += 1
+
+    cities = {}
+    for city, writer in writers.items():
+        cities[city] = {"files": scans[city]["files"], "changed_files": scans[city]["changed_files"],
+                        "removed_files": scans[city]["removed_files"], **writer.close()}
+
+    seconds = time.perf_counter() - start
+    changed_files = sum(city["changed_files"] for city in cities.values())
+    own_mb, workers_mb = peak_memory_mb()
+    return {
+        "cities": cities,
+        "files": sum(city["files"] for city in cities.values()),
+        "changed_files": changed_files,
+        "rows": sum(city["rows"] for city in cities.values()),
+        "seconds": seconds,
+        "files_per_second": changed_files / seconds if seconds else 0.0,
+        "peak_memory_mb": own_mb,
+        "peak_worker_memory_mb": workers_mb
+    }
+
 
 if __name__ == '__main__':
-    start = time.time()
-    # Adjust batch size and number of workers as needed
-    df = process_files_in_batches(file_names, batch_size=1000, num_workers=4)
-
-    # Save the DataFrame to a CSV or other format
-    output_path = os.path.join(OUTPUT_DIRECTORY, 'gurgaonRawExtractedPropertyDetails.csv')
-    df.to_csv(output_path, index=False)
-    print(f"Data processing complete. Output saved to {output_path}!, took time: {time.time() - start}")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract the scraped property details of every city")
+    parser.add_argument("--cities", nargs="+", default=None,
+                        help="cities to extract, default every Data/propertyDetails<city> directory")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only extract new or changed files and append them to the city partitions")
+    parser.add_argument("--csv", action="store_true",
+                        help="write a single <city>RawExtractedPropertyDetails.csv per city instead of the dataset")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    city_inputs = city_directories(OUTPUT_DIRECTORY, args.cities)
+
+    if args.csv:
+        for city, input_directory in city_inputs.items():
+            output_path = os.path.join(OUTPUT_DIRECTORY, f'{city}RawExtractedPropertyDetails.csv')
+
+            # Adjust chunk size, batch size and number of workers as needed
+            stats = process_files_in_batches(list_files(input_directory), output_path, chunk_size=CHUNK_SIZE,
+                                             batch_rows=BATCH_ROWS, num_workers=args.workers)
+            print(f"Data processing complete. Output saved to {output_path}!")
+    else:
+        stats = process_cities(city_inputs, DATASET_DIRECTORY, incremental=args.incremental, chunk_size=CHUNK_SIZE,
+                               batch_rows=BATCH_ROWS, num_workers=args.workers)
+        for city, city_stats in stats["cities"].items():
+            print(f"city={city}: {city_stats['changed_files']} of {city_stats['files']} files new or changed, "
+                  f"{city_stats['removed_files']} removed, "
+                  f"{city_stats['rows']} rows written to {city_stats['part'] or 'no new part'} and "
+                  f"{city_stats['replaced_rows']} old rows replaced or removed")
+        print(f"Dataset saved to {DATASET_DIRECTORY}")
+
+    print(f"took {stats['seconds']:.1f}s ({stats['files_per_second']:.0f} files/sec), "
+          f"peak memory {stats['peak_memory_mb']:.0f} MB (workers {stats['peak_worker_memory_mb']:.0f} MB)")
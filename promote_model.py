@@ -1,39 +1,39 @@
 
-import mlflow
 from mlflow import MlflowClient
-import dagshub
 import json
+from src.config import init_tracking
 
-# initialize dagshub
-dagshub.init(repo_owner='sourav664', repo_name='real-estate-hybrid-app', mlflow=True)
-
-
-# set the mlflow tracking server
-mlflow.set_tracking_uri("https://dagshub.com/sourav664/real-estate-hybrid-app.mlflow")
 
 def load_model_information(file_path):
     with open(file_path) as f:
         run_info = json.load(f)
-        
+
     return run_info
 
-#get model name
-model_name = load_model_information("run_information.json")["model_name"]
-stage = "Staging"
 
-# get the latest version of model in staging area
-client = MlflowClient()
+def promote_model(model_name, stage="Staging", promotion_stage="Production", client=None):
+    # move the latest version of the stage to the promotion stage, archiving the versions there
+    client = client or MlflowClient()
+
+    # get the latest verison of model in staging area
+    latest_versions = client.get_latest_versions(name=model_name, stages=[stage])
+    latest_model_version_staging  = latest_versions[0].version
+
+    client.transition_model_version_stage(
+        name=model_name,
+        version=latest_model_version_staging,
+        stage=promotion_stage,
+        archive_existing_versions=True
+    )
+    return latest_model_version_staging
+
 
-# get the latest verison of model in staging area
-latest_versions = client.get_latest_versions(name=model_name, stages=[stage])
-latest_model_version_staging  = latest_versions[0].version
+if __name__ == "__main__":
+    # connect to the tracking store of src/config.py
+    init_tracking()
 
-# promotion stage
-promotion_stage = "Production"
+    #get model name
+    model_name = load_model_information("run_information.json")["model_name"]
 
-client.transition_model_version_stage(
-    name=model_name,
-    version=latest_model_version_staging,
-    stage=promotion_stage,
-    archive_existing_versions=True
-)
\ No newline at end of file
+    # promote the latest staging model to production
+    promote_model(model_name, stage="Staging", promotion_stage="Production")
@@ -1 +0,0 @@
-from real_estate_hybrid_app import config  # noqa: F401
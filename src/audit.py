@@ -0,0 +1,185 @@
+import pandas as pd
+import numpy as np
+import pyarrow.dataset as ds
+import io
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from src.schema import audit_columns, numeric_dtypes
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory locks on windows, appends there are not coordinated with the compaction
+    fcntl = None
+
+# compacted audit records under the audit directory, one partition per day
+HISTORY_DIR = "history"
+# files of the history with their row count and timestamp range, skipped by parquet dataset readers
+MANIFEST = "_manifest.json"
+# aggregates of every history file, under the same relative path
+AGGREGATES_DIR = "_aggregates"
+
+# predicted price buckets of the aggregates in crores, log spaced, prices outside fall in the end buckets
+PRICE_EDGES = np.geomspace(0.01, 100, 81)
+# records are aggregated per hour, segment and price bucket
+aggregate_keys = ['hour', 'region', 'propertytype', 'price_bucket']
+
+
+def lock_path(audit_path: Path) -> Path:
+    audit_path = Path(audit_path)
+    return audit_path.with_name(audit_path.name + ".lock")
+
+
+@contextmanager
+def audit_lock(audit_path: Path):
+    # exclusive lock taken by the app to append and by the compaction to swap in the active segment
+    if fcntl is None:
+        yield
+        return
+
+    with open(lock_path(audit_path), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def append_records(audit_path: Path, records: pd.DataFrame) -> None:
+    # audit columns in their fixed order, without a header
+    Path(audit_path).parent.mkdir(exist_ok=True, parents=True)
+    with audit_lock(audit_path):
+        records[audit_columns].to_csv(audit_path, mode="a", header=False, index=False)
+
+
+def typed_records(data: bytes) -> pd.DataFrame:
+    # audit lines as typed columns: strings, nullable integers, float32 and timestamps, ordered by time
+    if data.strip():
+        records = pd.read_csv(io.BytesIO(data), header=None, names=audit_columns, dtype=str)
+    else:
+        records = pd.DataFrame({column: pd.Series(dtype=str) for column in audit_columns})
+    # header rows written by older app versions
+    records = records[records["timestamp"] != "timestamp"]
+    for column in audit_columns:
+        if column == "timestamp":
+            records[column] = pd.to_datetime(records[column], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+        elif column in numeric_dtypes:
+            dtype = np.dtype(numeric_dtypes[column])
+            numbers = pd.to_numeric(records[column], errors="coerce")
+            records[column] = numbers.astype(dtype if dtype.kind == "f" else pd.api.types.pandas_dtype(dtype.name.capitalize()))
+        else:
+            records[column] = records[column].astype("string")
+    return records.sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+def aggregate(records: pd.DataFrame) -> pd.DataFrame:
+    # prediction count and price sum per hour, region, property type and price bucket
+    buckets = np.searchsorted(PRICE_EDGES, records["predicted_price"].to_numpy(dtype=float), side="right") - 1
+    keys = pd.DataFrame({
+        "hour": records["timestamp"].dt.floor("h"),
+        "region": records["region"].fillna("unknown"),
+        "propertytype": records["propertytype"].fillna("unknown"),
+        "price_bucket": np.clip(buckets, 0, len(PRICE_EDGES) - 2).astype(np.int16),
+        "price": records["predicted_price"].astype(float)
+    })
+    return (keys.groupby(aggregate_keys, observed=True, dropna=True)["price"]
+            .agg(count="count", price_sum="sum").reset_index())
+
+
+def read_manifest(history_dir: Path) -> dict:
+    manifest_path = history_dir / MANIFEST
+    if not manifest_path.exists():
+        return {"files": {}}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+class AuditHistory:
+    """
+    Prediction audit history: the compacted parquet files and the active segment of the audit log.
+    Aggregates of a compacted file are read once, the active segment is read from where the last
+    refresh stopped. One instance is shared by the app sessions, refreshes run one at a time.
+    """
+
+    def __init__(self, audit_path: Path):
+        self.audit_path = Path(audit_path)
+        self.history_dir = self.audit_path.parent / HISTORY_DIR
+        self.manifest = {"files": {}}
+        self.file_aggregates = {}
+        self.history = aggregate(typed_records(b""))
+        self.active = self.history
+        self.active_offset = 0
+        self.active_first_line = b""
+        self.lock = threading.Lock()
+
+    def refresh(self) -> pd.DataFrame:
+        # aggregates of every record, only new history files and newly appended records are read
+        with self.lock:
+            self.manifest = read_manifest(self.history_dir)
+            files = self.manifest["files"]
+            if set(files) != set(self.file_aggregates):
+                self.file_aggregates = {path: self.file_aggregates.get(path) for path in files}
+                for path, aggregates in self.file_aggregates.items():
+                    if aggregates is None:
+                        self.file_aggregates[path] = self.read_file_aggregates(path)
+                self.history = pd.concat([self.history.iloc[:0], *self.file_aggregates.values()], ignore_index=True)
+
+            self.refresh_active()
+            return pd.concat([self.history, self.active], ignore_index=True)
+
+    def read_file_aggregates(self, path: str) -> pd.DataFrame:
+        # written by the compaction, computed from the file for history compacted before aggregates existed
+        aggregates_path = self.history_dir / AGGREGATES_DIR / path
+        if aggregates_path.exists():
+            return pd.read_parquet(aggregates_path)
+        return aggregate(pd.read_parquet(self.history_dir / path,
+                                         columns=["timestamp", "region", "propertytype", "predicted_price"]))
+
+    def refresh_active(self) -> None:
+        if not self.audit_path.exists():
+            self.active, self.active_offset, self.active_first_line = self.history.iloc[:0], 0, b""
+            return
+
+        with open(self.audit_path, "rb") as f:
+            first_line = f.readline()
+            size = f.seek(0, os.SEEK_END)
+            # the compaction swapped in a new active segment
+            if size < self.active_offset or not first_line.startswith(self.active_first_line):
+                self.active, self.active_offset = self.history.iloc[:0], 0
+            f.seek(self.active_offset)
+            data = f.read()
+
+        end = data.rfind(b"\n") + 1
+        if end:
+            self.active = pd.concat([self.active, aggregate(typed_records(data[:end]))], ignore_index=True)
+            self.active_offset += end
+        self.active_first_line = first_line if first_line.endswith(b"\n") else b""
+
+    def files_between(self, start: pd.Timestamp, end: pd.Timestamp) -> list:
+        # history files whose timestamp range overlaps [start, end], by the manifest stats
+        return [self.history_dir / path for path, entry in self.manifest["files"].items()
+                if entry["min_timestamp"] is not None
+                and pd.Timestamp(entry["min_timestamp"]) <= end and pd.Timestamp(entry["max_timestamp"]) >= start]
+
+    def read(self, start: pd.Timestamp, end: pd.Timestamp, columns: list = None) -> pd.DataFrame:
+        # records in [start, end]: files outside the range are skipped, the timestamp filter is pushed down
+        # to the row group statistics of the files read
+        columns = columns or audit_columns
+        frames = []
+        files = self.files_between(start, end)
+        if files:
+            dataset = ds.dataset([str(path) for path in files], format="parquet")
+            in_range = (ds.field("timestamp") >= start.to_pydatetime()) & (ds.field("timestamp") <= end.to_pydatetime())
+            frames.append(dataset.to_table(columns=columns, filter=in_range).to_pandas())
+
+        if self.audit_path.exists():
+            with open(self.audit_path, "rb") as f:
+                data = f.read()
+            active = typed_records(data[:data.rfind(b"\n") + 1])
+            frames.append(active.loc[active["timestamp"].between(start, end), columns])
+
+        records = pd.concat(frames, ignore_index=True) if frames else typed_records(b"")[columns]
+        return records.sort_values("timestamp", ignore_index=True)
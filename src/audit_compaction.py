@@ -0,0 +1,153 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from src.audit import audit_lock, typed_records, aggregate, read_manifest, HISTORY_DIR, MANIFEST, AGGREGATES_DIR
+
+# codec of the compacted files, strings are dictionary encoded as well
+COMPRESSION = "zstd"
+# partition of records whose timestamp does not parse
+UNKNOWN_DATE = "unknown"
+# timestamp ending an audit line, as the app writes it
+TIMESTAMP = re.compile(rb",(\d{4}-\d{2}-\d{2}) \d{2}:\d{2}:\d{2}\s*$")
+
+
+# create logger
+logger = logging.getLogger("audit_compaction")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('audit_compaction.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def record_date(line: bytes) -> str:
+    # date of a record from its timestamp, the last field of the line
+    match = TIMESTAMP.search(line)
+    return match.group(1).decode() if match else UNKNOWN_DATE
+
+
+def split_closed(lines: list, today: str) -> tuple:
+    # records of the days before today grouped by day, and today's records kept as they are
+    closed, active = defaultdict(list), []
+    for line in lines:
+        date = record_date(line)
+        if date != UNKNOWN_DATE and date >= today:
+            active.append(line)
+        else:
+            closed[date].append(line)
+    return closed, active
+
+
+def write_table(df, save_path: Path) -> None:
+    # written next to the target and moved into place, readers and the backup never see a partial file
+    save_path.parent.mkdir(exist_ok=True, parents=True)
+    temp_path = save_path.with_name(save_path.name + ".tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), temp_path,
+                   compression=COMPRESSION, write_statistics=True)
+    os.replace(temp_path, save_path)
+
+
+def write_partition(lines: list, date: str, history_dir: Path) -> dict:
+    # one compressed file of a day's records and one of their aggregates, named after their content so a
+    # rerun overwrites them
+    data = b"".join(lines)
+    records = typed_records(data)
+    relative_path = Path(f"date={date}") / f"part-{hashlib.sha256(data).hexdigest()[:16]}.parquet"
+
+    save_path = history_dir / relative_path
+    write_table(records, save_path)
+    write_table(aggregate(records), history_dir / AGGREGATES_DIR / relative_path)
+
+    timestamps = records["timestamp"].dropna()
+    return {
+        "path": relative_path.as_posix(),
+        "rows": len(records),
+        "bytes": save_path.stat().st_size,
+        "min_timestamp": timestamps.min().isoformat() if len(timestamps) else None,
+        "max_timestamp": timestamps.max().isoformat() if len(timestamps) else None
+    }
+
+
+def save_manifest(manifest: dict, history_dir: Path) -> None:
+    manifest_path = history_dir / MANIFEST
+    temp_path = manifest_path.with_name(MANIFEST + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, manifest_path)
+
+
+def compact(audit_path: Path, history_dir: Path, today: str = None) -> dict:
+    # moves the records of closed days from the audit log into the history, the log keeps today's records
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    if not audit_path.exists():
+        return {"compacted_rows": 0, "active_rows": 0, "files": []}
+
+    # snapshot of the complete records, the app keeps appending while the history is written
+    with audit_lock(audit_path):
+        data = audit_path.read_bytes()
+    end = data.rfind(b"\n") + 1
+    closed, active = split_closed(data[:end].splitlines(keepends=True), today)
+    if not closed:
+        return {"compacted_rows": 0, "active_rows": len(active), "files": []}
+
+    history_dir.mkdir(exist_ok=True, parents=True)
+    manifest = read_manifest(history_dir)
+    entries = [write_partition(lines, date, history_dir) for date, lines in sorted(closed.items())]
+    manifest["files"].update({entry["path"]: entry for entry in entries})
+    save_manifest(manifest, history_dir)
+
+    # today's records and everything appended since the snapshot become the new log
+    with audit_lock(audit_path):
+        with open(audit_path, "rb") as f:
+            f.seek(end)
+            appended = f.read()
+        temp_path = audit_path.with_name(audit_path.name + ".tmp")
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(active) + appended)
+        os.replace(temp_path, audit_path)
+
+    return {
+        "compacted_rows": sum(entry["rows"] for entry in entries),
+        "active_rows": len(active),
+        "files": [entry["path"] for entry in entries]
+    }
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Compact the closed days of the prediction audit log into parquet")
+    parser.add_argument("--audit", type=Path, default=root_path / "audit" / "predictions.csv",
+                        help="prediction audit log, appended to by the app")
+    parser.add_argument("--history", type=Path, default=None,
+                        help="directory of the date partitions, history/ next to the audit log by default")
+    args = parser.parse_args()
+
+    history_dir = args.history or args.audit.parent / HISTORY_DIR
+    summary = compact(args.audit, history_dir)
+    logger.info(f"{summary['compacted_rows']} records compacted into {len(summary['files'])} files, "
+                f"{summary['active_rows']} left in the active segment")
@@ -0,0 +1,129 @@
+import pandas as pd
+import json
+import logging
+from pathlib import Path
+
+
+# columns shown as option lists in the app sidebars
+option_columns = ['propertytype', 'region', 'transactiontype', 'furnished', 'ageofcons', 'additionalRooms']
+# columns whose min/max bound the sidebar sliders
+bound_columns = ['bedrooms', 'bathrooms', 'balconies', 'superbuiltupareasqft', 'totalfloornumber']
+
+OVERALL = "overall"
+
+
+# create logger
+logger = logging.getLogger("build_metadata")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('build_metadata.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def load_data(data_path: Path) -> pd.DataFrame:
+    try:
+        df = pd.read_csv(data_path, usecols=option_columns + bound_columns + ['locality'])
+
+    except FileNotFoundError:
+        logger.error("The file to load does not exist")
+        raise
+
+    return df
+
+
+def sorted_unique(values: pd.Series) -> list:
+    # plain python values so the lists are json serializable
+    return sorted(values.dropna().unique().tolist())
+
+
+def build_options(df: pd.DataFrame) -> dict:
+    return {column: sorted_unique(df[column]) for column in option_columns}
+
+
+def build_bounds(df: pd.DataFrame) -> dict:
+    bounds = {}
+    for column in bound_columns:
+        bounds[column] = {
+            "min": df[column].min().item(),
+            "max": df[column].max().item()
+        }
+    return bounds
+
+
+def build_localities(df: pd.DataFrame) -> dict:
+    # region -> localities, plus every locality under "overall"
+    localities = {OVERALL: sorted_unique(df['locality'])}
+    for region, group in df.groupby('region'):
+        localities[region] = sorted_unique(group['locality'])
+    return localities
+
+
+def build_propertytypes(df: pd.DataFrame) -> dict:
+    # region -> locality -> property types, "overall" at either level
+    # mirrors the cascade of the analytics sidebar filters
+    propertytypes = {OVERALL: {OVERALL: sorted_unique(df['propertytype'])}}
+
+    for locality, group in df.groupby('locality'):
+        propertytypes[OVERALL][locality] = sorted_unique(group['propertytype'])
+
+    for region, region_group in df.groupby('region'):
+        propertytypes[region] = {OVERALL: sorted_unique(region_group['propertytype'])}
+        for locality, group in region_group.groupby('locality'):
+            propertytypes[region][locality] = sorted_unique(group['propertytype'])
+
+    return propertytypes
+
+
+def build_metadata(df: pd.DataFrame) -> dict:
+    metadata = {
+        "options": build_options(df),
+        "bounds": build_bounds(df),
+        "localities": build_localities(df),
+        "propertytypes": build_propertytypes(df)
+    }
+    return metadata
+
+
+def save_metadata(metadata: dict, save_path: Path) -> None:
+    with open(save_path, "w") as f:
+        json.dump(metadata, f, indent=4)
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent
+    # data load path
+    data_path = root_path / "data" / "raw" / "real_estate.csv"
+    # save directory for app artifacts
+    save_data_dir = root_path / "data" / "app"
+
+    # make dir if not present
+    save_data_dir.mkdir(exist_ok=True, parents=True)
+
+    # load the data
+    df = load_data(data_path)
+    logger.info("Data loaded Successfully")
+
+    # build the lookup tables
+    metadata = build_metadata(df)
+    logger.info("Metadata built")
+
+    # save the metadata
+    save_metadata(metadata, save_data_dir / "metadata.json")
+    logger.info("Metadata saved to location")
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+from datetime import datetime, timezone
+from importlib.metadata import version
+from pathlib import Path
+from src.schema import feature_columns, build_dtypes, metadata_categories, apply_schema
+
+
+# bundle written by the train stage, the evaluation stage logs it with the run
+BUNDLE_PATH = Path(__file__).parent.parent / "models" / "model.bundle"
+# artifact path of the bundle in an mlflow run
+BUNDLE_ARTIFACT = "model.bundle"
+
+# file layout: magic, format version and header length, the json header, then the sections it indexes
+MAGIC = b"REBUNDLE"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sIQ")
+
+# target transforms by name: forward and inverse function
+TARGET_TRANSFORMS = {
+    "identity": (None, None),
+    "log1p": (np.log1p, np.expm1)
+}
+# libraries the pickled preprocessor and the booster depend on
+LIBRARIES = ["scikit-learn", "scipy", "lightgbm", "pandas", "numpy"]
+
+
+class BundleError(ValueError):
+    pass
+
+
+def target_transform_name(model) -> str:
+    # name of the target transform of a fitted TransformedTargetRegressor
+    transformer = model.transformer_
+    for name, (func, inverse_func) in TARGET_TRANSFORMS.items():
+        if transformer.func is func and transformer.inverse_func is inverse_func:
+            return name
+    raise BundleError(f"Target transform {transformer.func} has no entry in TARGET_TRANSFORMS")
+
+
+def checksum(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def quantile_section(alpha: float) -> str:
+    return f"quantile_{alpha:g}"
+
+
+class ModelBundle:
+    """
+    Fitted preprocessor, LightGBM booster and target transform with the feature schema and the option
+    metadata they were trained on, stored as one checksummed file. Quantile boosters of the price, keyed
+    by their alpha, bound the prediction intervals.
+    """
+
+    def __init__(self, preprocessor, booster: lgb.Booster, target_transform: str, metadata: dict, header: dict = None,
+                 quantiles: dict = None):
+        if target_transform not in TARGET_TRANSFORMS:
+            raise BundleError(f"Unknown target transform {target_transform}")
+        if quantiles and len(quantiles) != 2:
+            raise BundleError(f"Intervals need a lower and an upper quantile booster, got alphas {sorted(quantiles)}")
+        self.preprocessor = preprocessor
+        self.booster = booster
+        self.quantiles = dict(sorted((quantiles or {}).items()))
+        self.target_transform = target_transform
+        self.metadata = metadata
+        self.header = header or {}
+        self.dtypes = build_dtypes(metadata_categories(metadata))
+        # predictions come back in the price scale
+        self.inverse_func = TARGET_TRANSFORMS[target_transform][1]
+
+    @classmethod
+    def from_model(cls, preprocessor, model, metadata: dict, quantile_models: list = None):
+        # bundle of a fitted preprocessor and TransformedTargetRegressor around an LGBMRegressor, with the
+        # quantile regressors fitted on the same target transform
+        preprocessor.set_output(transform="pandas")
+        quantiles = {}
+        for quantile_model in quantile_models or []:
+            if target_transform_name(quantile_model) != target_transform_name(model):
+                raise BundleError("Quantile models must share the target transform of the point model")
+            quantiles[quantile_model.regressor_.get_params()["alpha"]] = quantile_model.regressor_.booster_
+        return cls(preprocessor, model.regressor_.booster_, target_transform_name(model), metadata,
+                   quantiles=quantiles)
+
+    @property
+    def bundle_id(self) -> str:
+        # digest over the checksums of all sections, identifies the fitted model
+        return self.header.get("bundle_id")
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        # model matrix of raw inputs, in the column order and dtypes the model was trained on
+        return self.preprocessor.transform(apply_schema(X[feature_columns], self.dtypes))
+
+    def predict_transformed(self, X_trans: pd.DataFrame, booster: lgb.Booster = None) -> np.ndarray:
+        # predictions of the point booster, or of the booster given, in the price scale
+        predictions = (self.booster if booster is None else booster).predict(X_trans)
+        return predictions if self.inverse_func is None else self.inverse_func(predictions)
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.predict_transformed(self.transform(X))
+
+    @property
+    def coverage(self) -> float:
+        # share of prices the intervals are fitted to hold, None without quantile boosters
+        return max(self.quantiles) - min(self.quantiles) if self.quantiles else None
+
+    def interval_transformed(self, X_trans: pd.DataFrame, predictions: np.ndarray) -> tuple:
+        # lower and upper bound of every prediction, widened to hold the prediction where the quantiles cross it
+        lower, upper = (self.predict_transformed(X_trans, booster) for booster in self.quantiles.values())
+        return np.minimum(lower, predictions), np.maximum(upper, predictions)
+
+    def predict_interval(self, X: pd.DataFrame) -> tuple:
+        # predictions with their lower and upper bounds, all boosters share one preprocessing pass
+        if not self.quantiles:
+            raise BundleError("The bundle has no quantile boosters to bound the predictions with")
+        X_trans = self.transform(X)
+        predictions = self.predict_transformed(X_trans)
+        return (predictions, *self.interval_transformed(X_trans, predictions))
+
+    def save(self, save_path: Path = BUNDLE_PATH) -> Path:
+        save_path = Path(save_path)
+        sections = {
+            "preprocessor": pickle.dumps(self.preprocessor, protocol=pickle.HIGHEST_PROTOCOL),
+            "booster": self.booster.model_to_string().encode("utf-8"),
+            **{quantile_section(alpha): booster.model_to_string().encode("utf-8")
+               for alpha, booster in self.quantiles.items()}
+        }
+
+        index, offset = {}, 0
+        for name, data in sections.items():
+            index[name] = {"offset": offset, "length": len(data), "sha256": checksum(data)}
+            offset += len(data)
+
+        header = json.dumps({
+            "format_version": FORMAT_VERSION,
+            "bundle_id": checksum("".join(section["sha256"] for section in index.values()).encode()),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "target_transform": self.target_transform,
+            "quantiles": list(self.quantiles),
+            "feature_columns": feature_columns,
+            "metadata": self.metadata,
+            "libraries": {library: version(library) for library in LIBRARIES},
+            "sections": index
+        }).encode("utf-8")
+
+        # written next to the target and moved into place, readers never see a partial bundle
+        save_path.parent.mkdir(exist_ok=True, parents=True)
+        temp_path = save_path.with_name(save_path.name + ".tmp")
+        with open(temp_path, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            for data in sections.values():
+                f.write(data)
+        os.replace(temp_path, save_path)
+
+        self.header = json.loads(header)
+        return save_path
+
+    @classmethod
+    def load(cls, load_path: Path = BUNDLE_PATH, verify: bool = True):
+        # one memory map of the file, the sections are checked and deserialized straight from it
+        with open(load_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < PREAMBLE.size:
+                raise BundleError(f"{load_path} is not a model bundle")
+            magic, format_version, header_length = PREAMBLE.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise BundleError(f"{load_path} is not a model bundle")
+            if format_version != FORMAT_VERSION:
+                raise BundleError(f"{load_path} has bundle format {format_version}, expected {FORMAT_VERSION}")
+
+            start = PREAMBLE.size + header_length
+            header = json.loads(mm[PREAMBLE.size:start])
+            if header["feature_columns"] != feature_columns:
+                raise BundleError(f"{load_path} was trained on {header['feature_columns']}, expected {feature_columns}")
+
+            view = memoryview(mm)
+            try:
+                sections = {}
+                for name, section in header["sections"].items():
+                    data = view[start + section["offset"]:start + section["offset"] + section["length"]]
+                    if len(data) != section["length"] or (verify and checksum(data) != section["sha256"]):
+                        raise BundleError(f"Section {name} of {load_path} is truncated or corrupted")
+                    sections[name] = data
+
+                preprocessor = pickle.loads(sections["preprocessor"])
+                booster = lgb.Booster(model_str=str(sections["booster"], "utf-8"))
+                quantiles = {alpha: lgb.Booster(model_str=str(sections[quantile_section(alpha)], "utf-8"))
+                             for alpha in header.get("quantiles", [])}
+            finally:
+                sections = None
+                data = None
+                view.release()
+
+        return cls(preprocessor, booster, header["target_transform"], header["metadata"], header, quantiles)
+
+
+def load_registered_bundle(model_name: str, stage: str, client=None) -> ModelBundle:
+    # the bundle logged with the run of the latest model version in the stage
+    import mlflow
+    from mlflow import MlflowClient
+
+    client = client or MlflowClient()
+    latest_versions = client.get_latest_versions(name=model_name, stages=[stage])
+    if not latest_versions:
+        raise BundleError(f"No version of {model_name} in {stage}")
+
+    bundle_path = mlflow.artifacts.download_artifacts(run_id=latest_versions[0].run_id, artifact_path=BUNDLE_ARTIFACT)
+    return ModelBundle.load(bundle_path)
@@ -0,0 +1,166 @@
+import pandas as pd
+import numpy as np
+import joblib
+import logging
+import yaml
+from pathlib import Path
+from sklearn.neighbors import KDTree
+
+
+# features the listings are compared on
+feature_columns = ['superbuiltupareasqft', 'bedrooms', 'bathrooms', 'totalfloornumber', 'latitude', 'longitude']
+# columns shown for every comparable listing
+display_columns = ['locality', 'propertytype', 'bedrooms', 'bathrooms', 'superbuiltupareasqft', 'totalfloornumber', 'price']
+
+
+# create logger
+logger = logging.getLogger("comparables")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on first record since the app imports this module
+file_handler = logging.FileHandler('comparables.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def load_data(data_path: Path) -> pd.DataFrame:
+    try:
+        df = pd.read_csv(data_path, usecols=['region'] + list(dict.fromkeys(display_columns + feature_columns)))
+
+    except FileNotFoundError:
+        logger.error("The file to load does not exist")
+        raise
+
+    return df
+
+
+def read_params(file_path: Path) -> dict:
+    with open(file_path, "r") as yaml_file:
+        params_file = yaml.safe_load(yaml_file)
+
+    return params_file
+
+
+def build_comparables(df: pd.DataFrame, k: int, leaf_size: int) -> dict:
+    df = df.dropna(subset=['region', 'locality'] + feature_columns).reset_index(drop=True)
+
+    # z-score every feature so no single unit dominates the distance
+    mean = df[feature_columns].mean().to_numpy()
+    std = df[feature_columns].std().replace(0, 1).to_numpy()
+
+    # centroid of every locality, used as the coordinates of a query
+    centroids = df.groupby(['region', 'locality'])[['latitude', 'longitude']].mean()
+
+    regions = {}
+    for region, group in df.groupby('region'):
+        features = (group[feature_columns].to_numpy(dtype=float) - mean) / std
+        regions[region] = {
+            "tree": KDTree(features, leaf_size=leaf_size),
+            "prices": group['price'].to_numpy(dtype=float),
+            "listings": group[display_columns].reset_index(drop=True)
+        }
+
+    return {
+        "regions": regions,
+        "mean": mean,
+        "std": std,
+        "centroids": {key: value for key, value in zip(centroids.index, centroids.to_numpy())},
+        "k": k
+    }
+
+
+def save_comparables(comparables: dict, save_path: Path) -> None:
+    joblib.dump(value=comparables, filename=save_path, compress=3)
+
+
+class Comparables:
+    """
+    Nearest listings to a property within its region.
+    """
+
+    def __init__(self, comparables: dict):
+        self.regions = comparables["regions"]
+        self.mean = comparables["mean"]
+        self.std = comparables["std"]
+        self.centroids = comparables["centroids"]
+        self.k = comparables["k"]
+
+    @classmethod
+    def load(cls, load_path: Path):
+        return cls(joblib.load(load_path))
+
+    def nearest(self, region, locality, superbuiltupareasqft, bedrooms, bathrooms,
+                totalfloornumber, k: int = None) -> tuple:
+        # distances and row positions of the k nearest listings of the region
+        index = self.regions.get(region)
+        centroid = self.centroids.get((region, locality))
+        if index is None or centroid is None:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+
+        point = np.array([superbuiltupareasqft, bedrooms, bathrooms, totalfloornumber, *centroid], dtype=float)
+        point = (point - self.mean) / self.std
+
+        k = min(k or self.k, len(index["prices"]))
+        distance, rows = index["tree"].query(point.reshape(1, -1), k=k)
+        return distance[0], rows[0]
+
+    def prices(self, region, rows: np.ndarray) -> np.ndarray:
+        if len(rows) == 0:
+            return np.empty(0)
+        return self.regions[region]["prices"][rows]
+
+    def query(self, region, locality, superbuiltupareasqft, bedrooms, bathrooms,
+              totalfloornumber, k: int = None) -> pd.DataFrame:
+        distance, rows = self.nearest(region, locality, superbuiltupareasqft, bedrooms,
+                                      bathrooms, totalfloornumber, k=k)
+        return self.listings(region, rows, distance)
+
+    def listings(self, region, rows: np.ndarray, distance: np.ndarray) -> pd.DataFrame:
+        # display rows of listings already found by nearest, without searching the tree again
+        if len(rows) == 0:
+            return pd.DataFrame(columns=display_columns + ['distance'])
+
+        nearest = self.regions[region]["listings"].iloc[rows].reset_index(drop=True)
+        return nearest.assign(distance=distance)
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent
+    # data load path
+    data_path = root_path / "data" / "raw" / "real_estate.csv"
+    # save directory for app artifacts
+    save_data_dir = root_path / "data" / "app"
+
+    # make dir if not present
+    save_data_dir.mkdir(exist_ok=True, parents=True)
+
+    # read the parameters
+    parameters = read_params(root_path / "params.yaml")['Comparables']
+    logger.info("Parameters read Successfully")
+
+    # load the data
+    df = load_data(data_path)
+    logger.info("Data loaded Successfully")
+
+    # build one tree per region
+    comparables = build_comparables(df, k=parameters['k'], leaf_size=parameters['leaf_size'])
+    logger.info(f"Comparables index built for {len(comparables['regions'])} regions")
+
+    # save the index
+    save_comparables(comparables, save_data_dir / "comparables.joblib")
+    logger.info("Comparables index saved to location")
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -21,6 +22,60 @@ MODELS_DIR = PROJ_ROOT / "models"
 REPORTS_DIR = PROJ_ROOT / "reports"
 FIGURES_DIR = REPORTS_DIR / "figures"
 
+# Experiment tracking, read from the environment when tracking is first used
+#   TRACKING_BACKEND     dagshub (default) or local
+#   MLFLOW_TRACKING_URI  overrides the store of either backend, e.g. file:///tmp/mlruns
+#   DAGSHUB_REPO_OWNER, DAGSHUB_REPO_NAME  the dagshub repository of the remote backend
+TRACKING_BACKENDS = ("dagshub", "local")
+DEFAULT_DAGSHUB_REPO_OWNER = "sourav664"
+DEFAULT_DAGSHUB_REPO_NAME = "real-estate-hybrid-app"
+LOCAL_TRACKING_URI = f"sqlite:///{(PROJ_ROOT / 'mlflow.db').as_posix()}"
+
+_tracking_uri = None
+
+
+def tracking_backend() -> str:
+    backend = os.getenv("TRACKING_BACKEND", "dagshub").lower()
+    if backend not in TRACKING_BACKENDS:
+        raise ValueError(f"Unknown TRACKING_BACKEND {backend!r}, expected one of {TRACKING_BACKENDS}")
+    return backend
+
+
+def dagshub_repo() -> tuple:
+    return (os.getenv("DAGSHUB_REPO_OWNER", DEFAULT_DAGSHUB_REPO_OWNER),
+            os.getenv("DAGSHUB_REPO_NAME", DEFAULT_DAGSHUB_REPO_NAME))
+
+
+def tracking_uri() -> str:
+    uri = os.getenv("MLFLOW_TRACKING_URI")
+    if uri:
+        return uri
+    if tracking_backend() == "local":
+        return LOCAL_TRACKING_URI
+    owner, name = dagshub_repo()
+    return f"https://dagshub.com/{owner}/{name}.mlflow"
+
+
+def init_tracking(experiment: str = None) -> str:
+    """Point mlflow at the configured store on first use, later calls only set the experiment."""
+    global _tracking_uri
+    import mlflow
+
+    if _tracking_uri is None:
+        uri = tracking_uri()
+        if tracking_backend() == "dagshub" and uri.startswith("https://dagshub.com/"):
+            # authenticates against dagshub, the only step that needs the network
+            import dagshub
+            owner, name = dagshub_repo()
+            dagshub.init(repo_owner=owner, repo_name=name, mlflow=True)
+        mlflow.set_tracking_uri(uri)
+        _tracking_uri = uri
+        logger.info(f"MLflow tracking at {uri}")
+
+    if experiment is not None:
+        mlflow.set_experiment(experiment)
+    return _tracking_uri
+
 # If tqdm is installed, configure loguru with tqdm.write
 # https://github.com/Delgan/loguru/issues/135
 try:
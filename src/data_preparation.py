@@ -1,8 +1,11 @@
 import pandas as pd
+import pyarrow.dataset as ds
 from sklearn.model_selection import train_test_split
 import yaml
 import logging
 from pathlib import Path
+from src.schema import load_dtypes, apply_schema, feature_columns, target_column
+from src.instrumentation import StageProfiler
 
 
 
@@ -16,8 +19,8 @@ logger.setLevel(logging.DEBUG)
 handler = logging.StreamHandler()
 handler.setLevel(logging.DEBUG)
 
-# file handler
-file_handler = logging.FileHandler('data_preparation.log')
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('data_preparation.log', delay=True)
 file_handler.setLevel(logging.DEBUG)
 
 
@@ -33,22 +36,23 @@ logger.addHandler(file_handler)
 
 
 
-def load_data(data_path: Path, columns: list=['propertytype',
-                                              'region',
-                                              'locality',
-                                              'bedrooms',
-                                              'bathrooms',
-                                              'balconies',
-                                              'superbuiltupareasqft',
-                                              'transactiontype',
-                                              'ageofcons',
-                                              'furnished',
-                                              'additionalRooms',
-                                              'totalfloornumber',
-                                              'price',]) -> pd.DataFrame:
+def load_data(data_path: Path, columns: list=feature_columns + [target_column], dtypes: dict=None,
+              cities: list=None) -> pd.DataFrame:
     try:
-        df = pd.read_csv(data_path, usecols=columns)
-        df.drop_duplicates(inplace=True)
+        if data_path.is_dir():
+            # hive partitioned dataset (city=<city>/part-N.parquet), only the partitions of the cities are read
+            dataset = ds.dataset(data_path, format="parquet", partitioning="hive")
+            city_filter = ds.field("city").isin(cities) if cities else None
+            df = dataset.to_table(columns=columns, filter=city_filter).to_pandas()
+            df = apply_schema(df, dtypes) if dtypes else df
+        else:
+            df = pd.read_csv(data_path, usecols=columns, dtype=dtypes)
+            if cities:
+                # the region of a cleaned listing is its city
+                df = df[df['region'].isin(cities)]
+
+        # keep the columns in the order the preprocessor is fitted on
+        df = df[columns].drop_duplicates()
 
         
     except FileNotFoundError:
@@ -79,11 +83,12 @@ if __name__ == "__main__":
     # root path
     
     root_path = Path(__file__).parent.parent
-    # data load path
-    data_path = root_path / "data" / "raw" / "real_estate.csv"
     # save data directory
     save_data_dir = root_path / "data" / "interim" 
     
+    # time and memory of every step
+    profiler = StageProfiler("data_preparation", logger)
+    
     # make dir if not present
     save_data_dir.mkdir(exist_ok=True, parents=True)
     
@@ -99,19 +104,28 @@ if __name__ == "__main__":
     # parameters file
     params_file_path = root_path / "params.yaml"
     
-    # load the data
-    df = load_data(data_path)
-    logger.info("Data loaded Successfully")
+    # compact dtypes with the category order fixed by the metadata
+    dtypes = load_dtypes(root_path / "data" / "app" / "metadata.json")
     
     # read the parameters
     parameters = read_params(params_file_path)['Data_Preparation']
     test_size = parameters['test_size']
     random_state = parameters['random_state']
+    # data load path, the cleaned csv or a city partitioned dataset, and the cities to train on, all when empty
+    data_path = root_path / parameters['data_path']
+    cities = parameters['cities'] or None
     logger.info("Parameters read Successfully")
     
+    # load the data
+    with profiler.step("load_data") as step:
+        df = load_data(data_path, dtypes=dtypes, cities=cities)
+        step.rows = len(df)
+    logger.info("Data loaded Successfully")
+    
     
     # split into train and test data
-    train_data, test_data = split_data(df, test_size=test_size, random_state=random_state)
+    with profiler.step("split_data", rows=len(df)):
+        train_data, test_data = split_data(df, test_size=test_size, random_state=random_state)
     logger.info("Dataset splited into train and test data")
     
     
@@ -121,5 +135,9 @@ if __name__ == "__main__":
     filename_list = [train_filename, test_filename]
     
     for filename, path, data in zip(filename_list, data_paths, data_subsets):
-        save_data(data=data, save_path = path)
-        logger.info(f"{filename.replace(".csv","")} data saved to location")
\ No newline at end of file
+        with profiler.step(f"save_{filename.replace(".csv","")}", rows=len(data)):
+            save_data(data=data, save_path = path)
+        logger.info(f"{filename.replace(".csv","")} data saved to location")
+    
+    # save the stage metrics
+    profiler.save()
\ No newline at end of file
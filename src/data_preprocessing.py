@@ -1,13 +1,17 @@
 import pandas as pd
+import numpy as np
 from pathlib import Path
 import joblib
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, RobustScaler
-import category_encoders as ce
+from sklearn.preprocessing import OneHotEncoder, RobustScaler, FunctionTransformer
+import json
 import logging
 from sklearn import set_config
 import yaml
+from src.schema import load_dtypes, compact_frame, apply_schema, select_columns, selected_names, feature_columns
+from src.instrumentation import StageProfiler
+from src.target_encoder import TargetEncoder
 
 
 
@@ -18,6 +22,8 @@ set_config(transform_output='pandas')
 ohe_encode = ['transactiontype','region','propertytype','furnished','ageofcons']
 target_encode = ['locality']
 robust_scaling = ['bedrooms','bathrooms','balconies','superbuiltupareasqft', 'totalfloornumber']
+# columns LightGBM splits on natively in the native encoding
+native_categorical = ohe_encode + target_encode
 
 
 target_col = 'price'
@@ -31,8 +37,8 @@ logger.setLevel(logging.DEBUG)
 handler = logging.StreamHandler()
 handler.setLevel(logging.DEBUG)
 
-# file handler
-file_handler = logging.FileHandler('data_preprocessing.log')
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('data_preprocessing.log', delay=True)
 file_handler.setLevel(logging.DEBUG)
 
 
@@ -50,9 +56,9 @@ logger.addHandler(file_handler)
 
 
 # load data
-def load_data(data_path: Path) -> pd.DataFrame:
+def load_data(data_path: Path, dtypes: dict=None) -> pd.DataFrame:
     try:
-        df = pd.read_csv(data_path)
+        df = pd.read_csv(data_path, dtype=dtypes)
         
     except FileNotFoundError:
         logger.error("The file to load does not exist")
@@ -67,6 +73,17 @@ def read_params(file_path):
     return params_file
 
 
+def load_features(features_path: Path) -> list:
+    # model columns kept by the feature_selection stage
+    try:
+        with open(features_path, 'r') as f:
+            return json.load(f)["features"]
+    
+    except FileNotFoundError:
+        logger.error("Run the feature_selection stage first or set feature_selection to false")
+        raise
+
+
 def save_transformer(transformer, save_dir: Path, transformer_name: str) -> None:
    # form the save location
    save_location = save_dir / transformer_name
@@ -77,10 +94,10 @@ def save_transformer(transformer, save_dir: Path, transformer_name: str) -> None
    
 def train_preprocessor(preprocessor,X_train: pd.DataFrame, y_train: pd.DataFrame):
     
-    # fit the preprocessor
-    preprocessor.fit(X_train, y_train)
+    # fit the preprocessor and transform the train data, with out of fold target encodings when configured
+    transformed_data = preprocessor.fit_transform(X_train, y_train)
     
-    return preprocessor
+    return compact_frame(transformed_data)
 
 
 def perform_transformations(preprocessor, data: pd.DataFrame) -> None:
@@ -88,9 +105,96 @@ def perform_transformations(preprocessor, data: pd.DataFrame) -> None:
     # transform the data
     transformed_data = preprocessor.transform(data)
     
-    return transformed_data
+    return compact_frame(transformed_data)
+
+
+
+def used_inputs(columns: list, features: list = None) -> list:
+    # the columns with a model column among the features, one-hot columns are named <input>_<category>,
+    # all of them without a feature selection
+    if features is None:
+        return columns
+    return [column for column in columns
+            if any(feature == column or feature.startswith(column + "_") for feature in features)]
+
+
+def column_transformer(transformers: list, passthrough: list, features: list = None) -> ColumnTransformer:
+    # transformers over the columns the features come from, the rest passes through or is dropped
+    transformers = [(name, transformer, used_inputs(columns, features)) for name, transformer, columns in transformers]
+    if features is None:
+        remainder = "passthrough"
+    else:
+        transformers.append(("passthrough", "passthrough", used_inputs(passthrough, features)))
+        remainder = "drop"
+
+    return ColumnTransformer(transformers=transformers, remainder=remainder, n_jobs=-1,
+                             force_int_remainder_cols=False, verbose_feature_names_out=False)
+
+
+def select_step(features: list) -> tuple:
+    # the selected model columns in their order, one-hot categories without a feature are dropped here, the
+    # functions live in src.schema so the pickled preprocessor loads outside the stage that fitted it
+    return ('select', FunctionTransformer(select_columns, kw_args={"columns": list(features)},
+                                          feature_names_out=selected_names))
+
+
+def build_preprocessor(smoothing: float, min_samples_leaf: int, ohe_dtype=np.uint8,
+                       folds: int = None, random_state: int = None, features: list = None) -> Pipeline:
+    # features: model columns to keep, the inputs none of them come from are not encoded at all
+    passthrough = [column for column in feature_columns if column not in ohe_encode + robust_scaling]
+    #Columns Transformer
+    columns_transformer = column_transformer(
+                        transformers=[
+                            ("ohe", OneHotEncoder(drop="first", handle_unknown="ignore", sparse_output=False, dtype=ohe_dtype), ohe_encode),
+                            ("robust", RobustScaler(), robust_scaling)
+                        ], passthrough=passthrough, features=features
+                        )
+    
+    # Creating a pipeline 
+    steps = []
+    if used_inputs(target_encode, features):
+        steps.append(('target_encoder', TargetEncoder(cols=used_inputs(target_encode, features), smoothing=smoothing,
+                                                      min_samples_leaf=min_samples_leaf, folds=folds, random_state=random_state)))
+    steps.append(('preprocessor', columns_transformer))
+    if features is not None:
+        steps.append(select_step(features))
+    preprocessor = Pipeline(steps)
+    
+    return preprocessor
+
+
+def build_native_preprocessor(dtypes: dict, features: list = None) -> Pipeline:
+    # categoricals pass through with the fixed categories, unseen values become missing
+    passthrough = [column for column in feature_columns if column not in robust_scaling]
+    columns_transformer = column_transformer(
+                        transformers=[
+                            ("robust", RobustScaler(), robust_scaling)
+                        ], passthrough=passthrough, features=features
+                        )
+
+    steps = [
+        ('schema', FunctionTransformer(apply_schema, kw_args={"dtypes": dtypes}, feature_names_out="one-to-one")),
+        ('preprocessor', columns_transformer)
+    ]
+    if features is not None:
+        steps.append(select_step(features))
+    preprocessor = Pipeline(steps)
+
+    return preprocessor
 
 
+def make_preprocessor(params: dict, dtypes: dict, features: list = None) -> Pipeline:
+    # params['encoding']: "onehot" (one-hot + target encoding) or "native" (pandas categoricals), features:
+    # the model columns kept by the feature selection, all of them when None
+    encoding = params.get('encoding', 'onehot')
+    if encoding == 'onehot':
+        return build_preprocessor(smoothing=params['smoothing'], min_samples_leaf=params['min_samples_leaf'],
+                                  folds=params.get('target_encoding_folds'), random_state=params.get('random_state'),
+                                  features=features)
+    if encoding == 'native':
+        return build_native_preprocessor(dtypes, features=features)
+    raise ValueError(f"Unknown encoding {encoding}, expected 'onehot' or 'native'")
+
 
 def save_data(data: pd.DataFrame, save_path: Path) -> None:
     data.to_csv(save_path, index=False)
@@ -121,6 +225,9 @@ if __name__ == '__main__':
     # save data directory
     save_data_dir = root_path / "data" / "processed"
     
+    # time and memory of every step
+    profiler = StageProfiler("data_preprocessing", logger)
+    
     # make dir if not present
     save_data_dir.mkdir(exist_ok=True, parents=True)
     
@@ -136,29 +243,25 @@ if __name__ == '__main__':
     # read the params
     params = read_params(root_path / "params.yaml")['Data_Preprocessing']
     
-    # extract the params
-    smoothing = params['smoothing']
-    min_samples_leaf = params['min_samples_leaf']
+    # compact dtypes with the category order fixed by the metadata
+    dtypes = load_dtypes(root_path / "data" / "app" / "metadata.json")
     
-    #Columns Transformer
-    columns_transformer = ColumnTransformer(
-                        transformers=[
-                            ("ohe", OneHotEncoder(drop="first", handle_unknown="ignore", sparse_output=False), ohe_encode),
-                            ("robust", RobustScaler(), robust_scaling)
-                        ], remainder="passthrough", n_jobs=-1, force_int_remainder_cols=False,verbose_feature_names_out=False
-                        )
+    # model columns kept by the feature_selection stage
+    features = None
+    if params.get('feature_selection', False):
+        features = load_features(root_path / "models" / "selected_features.json")
+        logger.info(f"Encoding the {len(features)} selected model columns")
     
-    # Creating a pipeline 
-    preprocessor = Pipeline([
-                    ('target_encoder', ce.TargetEncoder(cols=target_encode, smoothing=smoothing, min_samples_leaf=min_samples_leaf)),
-                    ('preprocessor', columns_transformer)
-                    
-                    ])
+    # build the preprocessor for the configured encoding
+    preprocessor = make_preprocessor(params=params, dtypes=dtypes, features=features)
+    logger.info(f"Preprocessor built with {params.get('encoding', 'onehot')} encoding")
     
     # load the train and test data
-    train_df = load_data(data_path=train_data_path)
+    with profiler.step("load_data") as step:
+        train_df = load_data(data_path=train_data_path, dtypes=dtypes)
+        test_df = load_data(data_path=test_data_path, dtypes=dtypes)
+        step.rows = len(train_df) + len(test_df)
     logger.info("Train data loaded successfully")
-    test_df = load_data(data_path=test_data_path)
     logger.info("Test data loaded successfully")
     
     
@@ -169,15 +272,15 @@ if __name__ == '__main__':
     logger.info("Data splitting completed")
     
     # train the preprocessor
-    train_preprocessor(preprocessor=preprocessor, X_train=X_train, y_train=y_train)
+    with profiler.step("fit_preprocessor", rows=len(X_train)):
+        X_train_trans = train_preprocessor(preprocessor=preprocessor, X_train=X_train, y_train=y_train)
     logger.info("Preprocessor trained successfully")
-    
-    # transform the data
-    X_train_trans = perform_transformations(preprocessor=preprocessor, data=X_train)
     logger.info("Train data transformed successfully")
     
-    X_test_trans = perform_transformations(preprocessor=preprocessor, data=X_test)
-    logger.info("Test data transformed successfully")
+    # transform the data
+    with profiler.step("transform", rows=len(X_test)):
+        X_test_trans = perform_transformations(preprocessor=preprocessor, data=X_test)
+        logger.info("Test data transformed successfully")
     
     
     # join back X and y
@@ -191,7 +294,8 @@ if __name__ == '__main__':
     data_paths = [train_trans_save_path,test_trans_save_path]
     filename_list = [train_trans_filename, test_trans_filename]
     for filename , path, data in zip(filename_list, data_paths, data_subsets):
-        save_data(data=data, save_path=path)
+        with profiler.step(f"save_{filename.replace(".csv","")}", rows=len(data)):
+            save_data(data=data, save_path=path)
         logger.info(f"{filename.replace(".csv","")} data saved to location")
     
     
@@ -207,4 +311,7 @@ if __name__ == '__main__':
     save_transformer(transformer=preprocessor,
                      save_dir=transformer_save_dir,
                      transformer_name=transformer_filename)
-    logger.info("Preprocessor saved to location")
\ No newline at end of file
+    logger.info("Preprocessor saved to location")
+    
+    # save the stage metrics
+    profiler.save()
\ No newline at end of file
@@ -0,0 +1,272 @@
+import pandas as pd
+import numpy as np
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import yaml
+from datetime import datetime, timezone
+from pathlib import Path
+from src.schema import feature_columns, target_column, categorical_columns, audit_columns
+from src.instrumentation import StageProfiler
+
+# monitored audit column -> training column it is compared with, the predicted price against the price
+monitored_columns = {**{column: column for column in feature_columns}, 'predicted_price': target_column}
+
+# quantile buckets of the numeric features
+BINS = 10
+# proportions are floored so a bucket empty on one side keeps the PSI finite
+EPSILON = 1e-4
+# PSI from which a feature is reported as drifted
+PSI_ALERT = 0.25
+# records needed before a PSI is reported, fewer make it noise
+MIN_ROWS = 50
+
+
+# create logger
+logger = logging.getLogger("drift_monitor")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('drift_monitor.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def load_data(data_path: Path) -> pd.DataFrame:
+    try:
+        df = pd.read_csv(data_path, usecols=list(set(monitored_columns.values())))
+
+    except FileNotFoundError:
+        logger.error("The file to load does not exist")
+        raise
+
+    return df
+
+
+def read_params(file_path: Path) -> dict:
+    with open(file_path, "r") as yaml_file:
+        params_file = yaml.safe_load(yaml_file)
+
+    return params_file
+
+
+def read_json(path: Path) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_json(data: dict, save_path: Path) -> None:
+    # written next to the target and moved into place, a crash never leaves a partial file
+    save_path.parent.mkdir(exist_ok=True, parents=True)
+    temp_path = save_path.with_name(save_path.name + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, save_path)
+
+
+def bucket_counts(values: pd.Series, bucket: dict) -> np.ndarray:
+    # counts per bucket, the last bucket holds missing values and categories not seen in training
+    if "categories" in bucket:
+        codes = pd.Categorical(values.astype("string"), categories=bucket["categories"]).codes
+        codes = np.where(codes < 0, len(bucket["categories"]), codes)
+        return np.bincount(codes, minlength=len(bucket["categories"]) + 1)
+
+    numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+    buckets = np.searchsorted(bucket["edges"], numbers, side="right")
+    buckets[np.isnan(numbers)] = len(bucket["edges"]) + 1
+    return np.bincount(buckets, minlength=len(bucket["edges"]) + 2)
+
+
+def build_reference(df: pd.DataFrame, bins: int = BINS) -> dict:
+    # buckets and training proportions of every monitored column, numeric columns are cut at their training
+    # quantiles, categoricals are bucketed by value
+    features = {}
+    for column, source in monitored_columns.items():
+        values = df[source]
+        if source in categorical_columns:
+            bucket = {"categories": sorted(values.dropna().astype(str).unique().tolist())}
+        else:
+            cuts = np.quantile(values.dropna(), np.linspace(0, 1, bins + 1)[1:-1])
+            bucket = {"edges": np.unique(cuts).tolist()}
+        counts = bucket_counts(values, bucket)
+        features[column] = {**bucket, "proportions": (counts / counts.sum()).tolist()}
+
+    reference_id = hashlib.sha256(json.dumps(features, sort_keys=True).encode()).hexdigest()
+    return {"reference_id": reference_id, "rows": len(df), "features": features}
+
+
+def psi(proportions: list, counts: np.ndarray) -> float:
+    # population stability index of the counts against the reference proportions
+    total = np.sum(counts)
+    if total == 0:
+        return None
+    expected = np.maximum(np.asarray(proportions), EPSILON)
+    actual = np.maximum(np.asarray(counts) / total, EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def empty_state(reference: dict) -> dict:
+    return {
+        "reference_id": reference["reference_id"],
+        # bytes of the audit log read so far, and a digest of its first line to notice a rewritten log
+        "offset": 0,
+        "fingerprint": None,
+        "last_timestamp": None,
+        # records read stamped with the last timestamp, the timestamps only resolve seconds
+        "last_timestamp_rows": 0,
+        # records seen since the histograms were started
+        "rows": 0,
+        "counts": {column: [0] * len(feature["proportions"]) for column, feature in reference["features"].items()}
+    }
+
+
+def load_state(state_path: Path, reference: dict) -> dict:
+    if not state_path.exists():
+        return empty_state(reference)
+
+    state = read_json(state_path)
+    if state["reference_id"] != reference["reference_id"]:
+        # a new reference restarts the histograms, the records already read are not read again
+        logger.info("Drift reference changed, running histograms restarted")
+        kept = ["offset", "fingerprint", "last_timestamp", "last_timestamp_rows"]
+        return {**empty_state(reference), **{key: state[key] for key in kept if key in state}}
+    return state
+
+
+def read_new_records(audit_path: Path, state: dict) -> tuple:
+    # complete records appended since the saved offset, the offset after them and the log fingerprint
+    with open(audit_path, "rb") as f:
+        first_line = f.readline()
+        fingerprint = hashlib.sha256(first_line).hexdigest() if first_line.endswith(b"\n") else None
+        size = f.seek(0, os.SEEK_END)
+
+        offset = state["offset"]
+        rewritten = offset > size or (state["fingerprint"] is not None and fingerprint != state["fingerprint"])
+        if rewritten:
+            logger.warning(f"{audit_path} was rotated or rewritten, reading it from the start")
+            offset = 0
+        f.seek(offset)
+        data = f.read()
+
+    # a record still being written is left for the next run
+    end = data.rfind(b"\n") + 1
+    if end == 0:
+        return pd.DataFrame(columns=audit_columns), offset, fingerprint
+
+    records = pd.read_csv(io.BytesIO(data[:end]), header=None, names=audit_columns, dtype=str)
+    # header rows written by older app versions
+    records = records[records["timestamp"] != "timestamp"]
+    if rewritten and state["last_timestamp"] is not None:
+        # the records up to the last one read are skipped, of those stamped in its second only as many as were read
+        last = records["timestamp"] == state["last_timestamp"]
+        seen = last & (last.cumsum() <= state.get("last_timestamp_rows", 0))
+        records = records[(records["timestamp"] > state["last_timestamp"]) | (last & ~seen)]
+    return records, offset + end, fingerprint
+
+
+def update(reference: dict, state: dict, records: pd.DataFrame, min_rows: int = MIN_ROWS,
+           psi_alert: float = PSI_ALERT) -> dict:
+    # adds the records to the running histograms and returns the drift report of the run, with the PSI of
+    # all records monitored and of the run's own records
+    batch_psi = {}
+    for column, feature in reference["features"].items():
+        counts = bucket_counts(records[column], feature)
+        state["counts"][column] = (np.asarray(state["counts"][column]) + counts).tolist()
+        batch_psi[column] = psi(feature["proportions"], counts)
+    state["rows"] += len(records)
+    if len(records):
+        last_timestamp = max(records["timestamp"].max(), state["last_timestamp"] or "")
+        rows = int((records["timestamp"] == last_timestamp).sum())
+        if last_timestamp == state["last_timestamp"]:
+            rows += state.get("last_timestamp_rows", 0)
+        state.update(last_timestamp=last_timestamp, last_timestamp_rows=rows)
+
+    running_psi = {column: psi(feature["proportions"], state["counts"][column])
+                   for column, feature in reference["features"].items()} if state["rows"] >= min_rows else None
+    return {
+        "run_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "reference_id": reference["reference_id"][:12],
+        "new_rows": len(records),
+        "rows": state["rows"],
+        "last_timestamp": state["last_timestamp"],
+        "psi": {column: round(value, 4) for column, value in running_psi.items()} if running_psi else None,
+        "batch_psi": {column: round(value, 4) for column, value in batch_psi.items()}
+        if len(records) >= min_rows else None,
+        "drifted": sorted(column for column, value in (running_psi or {}).items() if value >= psi_alert)
+    }
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Monitor the prediction audit log for drift from the training data")
+    parser.add_argument("--build-reference", action="store_true",
+                        help="build the training reference from data/interim/train.csv instead of monitoring")
+    parser.add_argument("--audit", type=Path, default=root_path / "audit" / "predictions.csv",
+                        help="prediction audit log, appended to by the app")
+    parser.add_argument("--reference", type=Path, default=root_path / "data" / "app" / "drift_reference.json",
+                        help="training buckets and proportions")
+    parser.add_argument("--state", type=Path, default=root_path / "audit" / "drift" / "state.json",
+                        help="read offset and running histograms, kept between runs")
+    parser.add_argument("--reports", type=Path, default=root_path / "audit" / "drift" / "reports.jsonl",
+                        help="drift reports, one line per run")
+    parser.add_argument("--min-rows", type=int, default=MIN_ROWS, help="records needed before a PSI is reported")
+    parser.add_argument("--psi-alert", type=float, default=PSI_ALERT, help="PSI from which a feature has drifted")
+    args = parser.parse_args()
+
+    if args.build_reference:
+        # time and memory of every step
+        profiler = StageProfiler("drift_reference", logger)
+
+        # parameters
+        params = read_params(root_path / "params.yaml")['Drift_Monitor']
+
+        # load the training data
+        with profiler.step("load_data") as step:
+            df = load_data(root_path / "data" / "interim" / "train.csv")
+            step.rows = len(df)
+        logger.info("Training data read successfully")
+
+        # bucket the monitored columns and save their training proportions
+        with profiler.step("build_reference", rows=len(df)):
+            reference = build_reference(df, bins=params['bins'])
+            save_json(reference, args.reference)
+        logger.info(f"Drift reference {reference['reference_id'][:12]} saved to {args.reference}")
+
+        # save the stage metrics
+        profiler.save()
+
+    else:
+        reference = read_json(args.reference)
+        state = load_state(args.state, reference)
+
+        # only the records appended since the last run are read
+        records, offset, fingerprint = read_new_records(args.audit, state)
+        report = update(reference, state, records, min_rows=args.min_rows, psi_alert=args.psi_alert)
+        state.update(offset=offset, fingerprint=fingerprint)
+
+        # the report line goes first, a crash before the state is saved reads the records again
+        args.reports.parent.mkdir(exist_ok=True, parents=True)
+        with open(args.reports, "a") as f:
+            f.write(json.dumps(report) + "\n")
+        save_json(state, args.state)
+
+        logger.info(f"{report['new_rows']} new records, {report['rows']} monitored, drifted: {report['drifted'] or 'none'}")
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from src.bundle import ModelBundle
+from src.schema import feature_columns
+
+# predictions kept by the memo, oldest dropped first
+MEMO_ENTRIES = 4096
+
+
+def input_mapping(model_columns: list, inputs: list = feature_columns) -> np.ndarray:
+    # 0/1 matrix summing model columns into the input they were made from: one-hot columns are
+    # named <input>_<category>, scaled, target encoded and native columns keep the input name
+    mapping = np.zeros((len(model_columns), len(inputs)))
+    for row, column in enumerate(model_columns):
+        matches = [i for i, name in enumerate(inputs) if column == name or column.startswith(name + "_")]
+        if not matches:
+            raise ValueError(f"Model column {column} does not come from any of {inputs}")
+        # longest input name wins, in case one input name prefixes another
+        mapping[row, max(matches, key=lambda i: len(inputs[i]))] = 1.0
+    return mapping
+
+
+class Explainer:
+    """
+    Predictions of a model bundle with the TreeSHAP contribution of each of the 12 inputs, from a single
+    pred_contrib pass of the booster. Contributions are in the model's target space (log price for the
+    log1p transform) and sum with the base value to the raw prediction.
+    """
+
+    def __init__(self, bundle: ModelBundle):
+        self.bundle = bundle
+        self.mappings = {}
+
+    def mapping(self, model_columns) -> np.ndarray:
+        key = tuple(model_columns)
+        if key not in self.mappings:
+            self.mappings[key] = input_mapping(list(model_columns))
+        return self.mappings[key]
+
+    def explain(self, X: pd.DataFrame, X_trans: pd.DataFrame = None) -> tuple:
+        # predictions, per input contributions and the base value of every row, X_trans is the model
+        # matrix of X when it was already transformed
+        X_trans = self.bundle.transform(X) if X_trans is None else X_trans
+        contributions = self.bundle.booster.predict(X_trans, pred_contrib=True)
+
+        raw = contributions.sum(axis=1)
+        predictions = raw if self.bundle.inverse_func is None else self.bundle.inverse_func(raw)
+        by_input = pd.DataFrame(contributions[:, :-1] @ self.mapping(X_trans.columns),
+                                columns=feature_columns, index=X.index)
+        return predictions, by_input, contributions[:, -1]
+
+
+class PredictionMemo:
+    """
+    Memo of predictions with their explanations and intervals keyed on the raw inputs. Rows not seen
+    before are transformed once and explained and bounded together in one batch.
+    """
+
+    def __init__(self, bundle: ModelBundle, max_entries: int = MEMO_ENTRIES):
+        self.explainer = Explainer(bundle)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, X: pd.DataFrame) -> tuple:
+        # predictions, per input contributions and lower and upper interval bounds of every row, in the
+        # order of X, the bounds are nan for a bundle without quantile boosters
+        keys = list(X[feature_columns].itertuples(index=False, name=None))
+        missing = list(dict.fromkeys(key for key in keys if key not in self.entries))
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            batch = pd.DataFrame(missing, columns=feature_columns)
+            bundle = self.explainer.bundle
+            X_trans = bundle.transform(batch)
+            predictions, by_input, _ = self.explainer.explain(batch, X_trans)
+            if bundle.quantiles:
+                intervals = np.column_stack(bundle.interval_transformed(X_trans, predictions))
+            else:
+                intervals = np.full((len(batch), 2), np.nan)
+            for key, prediction, contributions, interval in zip(missing, predictions, by_input.to_numpy(), intervals):
+                self.entries[key] = (prediction, contributions, interval)
+
+        for key in keys:
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        predictions = np.array([self.entries[key][0] for key in keys])
+        contributions = pd.DataFrame([self.entries[key][1] for key in keys], columns=feature_columns, index=X.index)
+        intervals = np.array([self.entries[key][2] for key in keys]).reshape(len(keys), 2)
+        return predictions, contributions, intervals
+
+
+def price_effects(contributions: pd.Series, target_transform: str) -> pd.Series:
+    # effect of every input on the predicted price: percent for the log1p target, price units otherwise
+    if target_transform == "log1p":
+        return np.expm1(contributions) * 100
+    return contributions
@@ -0,0 +1,214 @@
+import pandas as pd
+import numpy as np
+import logging
+import yaml
+from functools import reduce
+from pathlib import Path
+
+
+# geohash alphabet
+BASE32 = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+
+OVERALL = "overall"
+
+# decimals kept for every value sent to the map
+DISPLAY_DECIMALS = {'latitude': 5, 'longitude': 5, 'price_per_sqft': 0, 'superbuiltupareasqft': 0, 'price': 2}
+
+# columns the map is drawn from
+geo_columns = ['region', 'locality', 'propertytype', 'latitude', 'longitude',
+               'price', 'price_per_sqft', 'superbuiltupareasqft']
+
+
+# create logger
+logger = logging.getLogger("geo_layers")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on first record since the app imports this module
+file_handler = logging.FileHandler('geo_layers.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def load_data(data_path: Path) -> pd.DataFrame:
+    try:
+        df = pd.read_csv(data_path, usecols=geo_columns)
+
+    except FileNotFoundError:
+        logger.error("The file to load does not exist")
+        raise
+
+    return df
+
+
+def read_params(file_path: Path) -> dict:
+    with open(file_path, "r") as yaml_file:
+        params_file = yaml.safe_load(yaml_file)
+
+    return params_file
+
+
+def geohash(latitude, longitude, precision: int) -> np.ndarray:
+    # vectorized geohash: interleave longitude and latitude bits, 5 bits per character
+    n_bits = 5 * precision
+    lon_bits = (n_bits + 1) // 2
+    lat_bits = n_bits // 2
+
+    lon_index = np.floor((np.asarray(longitude) + 180) / 360 * 2 ** lon_bits).astype(np.int64)
+    lat_index = np.floor((np.asarray(latitude) + 90) / 180 * 2 ** lat_bits).astype(np.int64)
+    lon_index = np.clip(lon_index, 0, 2 ** lon_bits - 1)
+    lat_index = np.clip(lat_index, 0, 2 ** lat_bits - 1)
+
+    code = np.zeros_like(lon_index)
+    for bit in range(n_bits):
+        # even bits come from longitude, odd bits from latitude, most significant first
+        if bit % 2 == 0:
+            value = (lon_index >> (lon_bits - 1 - bit // 2)) & 1
+        else:
+            value = (lat_index >> (lat_bits - 1 - bit // 2)) & 1
+        code = (code << 1) | value
+
+    chars = [BASE32[(code >> (5 * (precision - 1 - i))) & 31] for i in range(precision)]
+    return reduce(np.char.add, chars)
+
+
+def aggregate(df: pd.DataFrame, keys: list) -> pd.DataFrame:
+    return (
+        df
+        .groupby(keys, as_index=False, sort=True)
+        .agg(latitude=('latitude', 'mean'),
+             longitude=('longitude', 'mean'),
+             price_per_sqft=('price_per_sqft', 'mean'),
+             superbuiltupareasqft=('superbuiltupareasqft', 'mean'),
+             price=('price', 'mean'),
+             listings=('price', 'size'))
+    )
+
+
+def with_overall(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    # repeat the frame with every combination of the columns set to "overall"
+    frames = [df]
+    for column in columns:
+        frames = frames + [frame.assign(**{column: OVERALL}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_locality_layer(df: pd.DataFrame) -> pd.DataFrame:
+    # one point per locality for every (region, propertytype) filter
+    expanded = with_overall(df, ['region', 'propertytype'])
+    return aggregate(expanded, ['region', 'propertytype', 'locality'])
+
+
+def build_cell_layer(df: pd.DataFrame, precisions: list) -> pd.DataFrame:
+    # listings of a single locality binned into geohash cells at a few zoom levels
+    expanded = with_overall(df, ['propertytype'])
+    layers = []
+    for precision in precisions:
+        cells = expanded.assign(precision=precision,
+                                cell=geohash(expanded['latitude'], expanded['longitude'], precision))
+        layers.append(aggregate(cells, ['region', 'locality', 'propertytype', 'precision', 'cell']))
+    return pd.concat(layers, ignore_index=True)
+
+
+def build_geo_layers(df: pd.DataFrame, precisions: list) -> pd.DataFrame:
+    df = df.dropna(subset=['latitude', 'longitude'])
+    localities = build_locality_layer(df).assign(layer='locality', precision=0, cell="")
+    cells = build_cell_layer(df, precisions).assign(layer='cell')
+    layers = pd.concat([localities, cells], ignore_index=True)
+
+    # compact on disk: repeated filter keys as categories, stats in float32
+    for column in ['layer', 'region', 'propertytype', 'locality', 'cell']:
+        layers[column] = layers[column].astype('category')
+    for column in ['latitude', 'longitude', 'price_per_sqft', 'superbuiltupareasqft', 'price']:
+        layers[column] = layers[column].astype(np.float32)
+    layers['precision'] = layers['precision'].astype(np.int8)
+    layers['listings'] = layers['listings'].astype(np.int32)
+    return layers
+
+
+def save_geo_layers(layers: pd.DataFrame, save_path: Path) -> None:
+    layers.to_parquet(save_path, index=False, compression='zstd')
+
+
+class GeoLayers:
+    """
+    Precomputed map layers looked up by the analytics filters.
+    """
+
+    def __init__(self, layers: pd.DataFrame):
+        layers = layers.astype({'region': str, 'propertytype': str, 'locality': str, 'cell': str})
+        # float32 values serialize with noisy digits, round to what the map can show
+        layers = layers.astype({column: float for column in DISPLAY_DECIMALS}).round(DISPLAY_DECIMALS)
+        cells = layers[layers['layer'] == 'cell'].drop(columns='layer')
+
+        # sorted indexes so a filter is a single lookup
+        self.localities = (
+            layers[layers['layer'] == 'locality']
+            .drop(columns=['layer', 'precision', 'cell'])
+            .set_index(['region', 'propertytype'])
+            .sort_index()
+        )
+        self.cells = cells.set_index(['region', 'locality', 'propertytype', 'precision']).sort_index()
+        # an "overall" region with a named locality covers every region sharing that name
+        self.overall_cells = cells.set_index(['locality', 'propertytype', 'precision']).sort_index()
+        self.precisions = sorted(cells['precision'].unique().tolist())
+
+    @classmethod
+    def load(cls, load_path: Path):
+        return cls(pd.read_parquet(load_path))
+
+    @staticmethod
+    def lookup(index: pd.DataFrame, key: tuple) -> pd.DataFrame:
+        try:
+            return index.loc[key].reset_index(drop=True)
+        except KeyError:
+            return pd.DataFrame(columns=index.columns)
+
+    def locality_layer(self, region: str, propertytype: str) -> pd.DataFrame:
+        return self.lookup(self.localities, (region, propertytype))
+
+    def cell_layer(self, region: str, locality: str, propertytype: str, precision: int) -> pd.DataFrame:
+        if region == OVERALL:
+            return self.lookup(self.overall_cells, (locality, propertytype, precision))
+        return self.lookup(self.cells, (region, locality, propertytype, precision))
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent
+    # data load path
+    data_path = root_path / "data" / "raw" / "real_estate.csv"
+    # save directory for app artifacts
+    save_data_dir = root_path / "data" / "app"
+
+    # make dir if not present
+    save_data_dir.mkdir(exist_ok=True, parents=True)
+
+    # read the parameters
+    parameters = read_params(root_path / "params.yaml")['Geo_Layers']
+    logger.info("Parameters read Successfully")
+
+    # load the data
+    df = load_data(data_path)
+    logger.info("Data loaded Successfully")
+
+    # build the locality and cell layers
+    layers = build_geo_layers(df, precisions=parameters['precisions'])
+    logger.info(f"Geo layers built with {len(layers)} points")
+
+    # save the layers
+    save_geo_layers(layers, save_data_dir / "geo_layers.parquet")
+    logger.info("Geo layers saved to location")
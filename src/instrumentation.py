@@ -0,0 +1,126 @@
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+# resource is unix only, peak memory is left out elsewhere
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# where every stage writes its step metrics, tracked by dvc as metrics
+PROFILES_DIR = Path(__file__).parent.parent / "reports" / "profiles"
+
+
+def cpu_seconds() -> float:
+    # this process plus the worker processes it has waited for
+    seconds = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        seconds += children.ru_utime + children.ru_stime
+    return seconds
+
+
+def peak_rss_mb() -> float:
+    # high-water mark of the process so far, ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class Step:
+    """
+    Handle of a running step, set rows once they are known.
+    """
+
+    def __init__(self, rows: int = None):
+        self.rows = rows
+
+
+class StageProfiler:
+    """
+    Wall time, CPU time, peak RSS and rows processed for the named steps of a pipeline stage.
+    """
+
+    def __init__(self, stage: str, logger: logging.Logger = None):
+        self.stage = stage
+        self.logger = logger
+        self.steps = {}
+        self.start_wall = time.perf_counter()
+        self.start_cpu = cpu_seconds()
+
+    @contextmanager
+    def step(self, name: str, rows: int = None, category: str = None):
+        # category groups steps in the summary, e.g. tracking vs compute
+        handle = Step(rows)
+        start_wall, start_cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield handle
+        finally:
+            record = {
+                "wall_seconds": time.perf_counter() - start_wall,
+                "cpu_seconds": cpu_seconds() - start_cpu,
+                "peak_rss_mb": peak_rss_mb()
+            }
+            if handle.rows is not None:
+                record["rows"] = int(handle.rows)
+            if category is not None:
+                record["category"] = category
+            self.steps[name] = record
+
+            if self.logger is not None:
+                rows_text = f", {record['rows']} rows" if "rows" in record else ""
+                rss_text = f", peak rss {record['peak_rss_mb']:.0f} MB" if record['peak_rss_mb'] is not None else ""
+                self.logger.info(f"{name} took {record['wall_seconds']:.2f}s wall, {record['cpu_seconds']:.2f}s cpu"
+                                 f"{rows_text}{rss_text}")
+
+    def track(self, name: str = None, rows=None):
+        # decorator form of step, rows is a function of the result giving the rows processed
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.step(name or func.__name__) as handle:
+                    result = func(*args, **kwargs)
+                    if rows is not None:
+                        handle.rows = rows(result)
+                return result
+            return wrapper
+        return decorator
+
+    def categories(self) -> dict:
+        # wall and cpu seconds summed over the steps of every category
+        totals = {}
+        for record in self.steps.values():
+            if "category" in record:
+                total = totals.setdefault(record["category"], {"wall_seconds": 0.0, "cpu_seconds": 0.0})
+                total["wall_seconds"] += record["wall_seconds"]
+                total["cpu_seconds"] += record["cpu_seconds"]
+        return totals
+
+    def summary(self) -> dict:
+        summary = {
+            "stage": self.stage,
+            "total": {
+                "wall_seconds": time.perf_counter() - self.start_wall,
+                "cpu_seconds": cpu_seconds() - self.start_cpu,
+                "peak_rss_mb": peak_rss_mb()
+            },
+            "steps": self.steps
+        }
+        categories = self.categories()
+        if categories:
+            summary["categories"] = categories
+        return summary
+
+    def save(self, save_path: Path = None) -> Path:
+        save_path = Path(save_path or PROFILES_DIR / f"{self.stage}.json")
+        save_path.parent.mkdir(exist_ok=True, parents=True)
+        with open(save_path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+        return save_path
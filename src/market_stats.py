@@ -0,0 +1,264 @@
+import pandas as pd
+import numpy as np
+import joblib
+import logging
+import yaml
+from pathlib import Path
+
+
+# columns that define a market segment
+segment_columns = ['region', 'propertytype', 'bedrooms']
+area_col = 'superbuiltupareasqft'
+target_col = 'price'
+
+# ±20% area window used for the market comparison
+AREA_TOLERANCE = 0.2
+# bins of the histogram shown in the comparison panel
+HISTOGRAM_BINS = 30
+
+
+# create logger
+logger = logging.getLogger("market_stats")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on first record since the app imports this module
+file_handler = logging.FileHandler('market_stats.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def load_data(data_path: Path) -> pd.DataFrame:
+    try:
+        df = pd.read_csv(data_path, usecols=segment_columns + [area_col, target_col])
+
+    except FileNotFoundError:
+        logger.error("The file to load does not exist")
+        raise
+
+    return df
+
+
+def read_params(file_path: Path) -> dict:
+    with open(file_path, "r") as yaml_file:
+        params_file = yaml.safe_load(yaml_file)
+
+    return params_file
+
+
+def log_bucket(values, origin: float, ratio: float) -> np.ndarray:
+    # index of the geometric bucket [origin * ratio**i, origin * ratio**(i + 1))
+    values = np.maximum(np.asarray(values, dtype=float), origin)
+    return np.floor(np.log(values / origin) / np.log(ratio)).astype(np.int64)
+
+
+def summarize_prices(prices) -> dict:
+    # exact statistics, used for sparse segments
+    prices = np.asarray(prices, dtype=float)
+    counts, edges = np.histogram(prices, bins=HISTOGRAM_BINS)
+    return {
+        "count": int(prices.size),
+        "mean": float(prices.mean()),
+        "median": float(np.median(prices)),
+        "min": float(prices.min()),
+        "max": float(prices.max()),
+        "hist_counts": counts,
+        "hist_edges": edges
+    }
+
+
+def build_market_stats(df: pd.DataFrame, area_ratio: float, price_ratio: float,
+                       price_origin: float, min_count: int) -> dict:
+    df = df.dropna(subset=segment_columns + [area_col, target_col])
+
+    # bucket every listing by area and price on geometric grids
+    df = df.assign(area_bucket=log_bucket(df[area_col], 1.0, area_ratio),
+                   price_bin=log_bucket(df[target_col], price_origin, price_ratio))
+
+    group_columns = segment_columns + ['area_bucket']
+    groups = (
+        df
+        .groupby(group_columns, sort=True)[target_col]
+        .agg(['count', 'sum', 'min', 'max'])
+        .reset_index()
+    )
+
+    # sparse price histogram (the quantile sketch) of every group in csr layout
+    sketch = (
+        df
+        .groupby(group_columns + ['price_bin'], sort=True)
+        .size()
+        .rename('bin_count')
+        .reset_index()
+    )
+    # both tables are sorted by group, so group i owns sketch rows indptr[i]:indptr[i + 1]
+    indptr = np.concatenate([[0], sketch.groupby(group_columns, sort=True).size().to_numpy().cumsum()])
+
+    # listings of the groups below min_count in the same layout, a window too sparse for the sketch only
+    # covers such groups and is summarized exactly from them
+    sparse = df[df.groupby(group_columns)[target_col].transform('size') < min_count].sort_values(group_columns)
+    sparse_counts = (
+        sparse
+        .groupby(group_columns, sort=True)
+        .size()
+        .reindex(pd.MultiIndex.from_frame(groups[group_columns]), fill_value=0)
+    )
+    listing_indptr = np.concatenate([[0], sparse_counts.to_numpy().cumsum()])
+
+    return {
+        "groups": groups,
+        "indptr": indptr,
+        "bins": sketch['price_bin'].to_numpy(dtype=np.int32),
+        "bin_counts": sketch['bin_count'].to_numpy(dtype=np.uint32),
+        "listing_indptr": listing_indptr,
+        "listing_areas": sparse[area_col].to_numpy(dtype=float),
+        "listing_prices": sparse[target_col].to_numpy(dtype=float),
+        "area_ratio": area_ratio,
+        "price_ratio": price_ratio,
+        "price_origin": price_origin,
+        "min_count": min_count
+    }
+
+
+def save_market_stats(market_stats: dict, save_path: Path) -> None:
+    joblib.dump(value=market_stats, filename=save_path, compress=3)
+
+
+class MarketStats:
+    """
+    Merges the precomputed segment sketches that cover a ±20% area window. Windows with fewer listings than
+    min_count are summarized exactly from the listings kept for their groups.
+    """
+
+    def __init__(self, market_stats: dict):
+        self.area_ratio = market_stats["area_ratio"]
+        self.price_ratio = market_stats["price_ratio"]
+        self.price_origin = market_stats["price_origin"]
+        self.min_count = market_stats["min_count"]
+        self.indptr = market_stats["indptr"]
+        self.bins = market_stats["bins"]
+        self.bin_counts = market_stats["bin_counts"]
+        self.listing_indptr = market_stats["listing_indptr"]
+        self.listing_areas = market_stats["listing_areas"]
+        self.listing_prices = market_stats["listing_prices"]
+
+        groups = market_stats["groups"]
+        self.count = groups['count'].to_numpy()
+        self.sum = groups['sum'].to_numpy()
+        self.min = groups['min'].to_numpy()
+        self.max = groups['max'].to_numpy()
+
+        # (region, propertytype, bedrooms) -> sorted area buckets and their group rows
+        self.segments = {}
+        for key, segment in groups.groupby(segment_columns, sort=False):
+            self.segments[key] = (segment['area_bucket'].to_numpy(), segment.index.to_numpy())
+
+    @classmethod
+    def load(cls, load_path: Path):
+        return cls(joblib.load(load_path))
+
+    def window_rows(self, region, propertytype, bedrooms, superbuiltupareasqft) -> np.ndarray:
+        segment = self.segments.get((region, propertytype, bedrooms))
+        if segment is None:
+            return np.empty(0, dtype=np.int64)
+
+        buckets, rows = segment
+        lower, upper = log_bucket([superbuiltupareasqft * (1 - AREA_TOLERANCE),
+                                   superbuiltupareasqft * (1 + AREA_TOLERANCE)],
+                                  1.0, self.area_ratio)
+        start, stop = np.searchsorted(buckets, [lower, upper + 1])
+        return rows[start:stop]
+
+    def exact_window(self, rows: np.ndarray, superbuiltupareasqft) -> dict:
+        # statistics of the listings of the groups within ±20% of the area, None without any
+        areas = np.concatenate([self.listing_areas[self.listing_indptr[row]:self.listing_indptr[row + 1]]
+                                for row in rows] + [np.empty(0)])
+        prices = np.concatenate([self.listing_prices[self.listing_indptr[row]:self.listing_indptr[row + 1]]
+                                 for row in rows] + [np.empty(0)])
+        in_window = ((areas >= superbuiltupareasqft * (1 - AREA_TOLERANCE)) &
+                     (areas <= superbuiltupareasqft * (1 + AREA_TOLERANCE)))
+        if not in_window.any():
+            return None
+        return summarize_prices(prices[in_window])
+
+    def query(self, region, propertytype, bedrooms, superbuiltupareasqft):
+        rows = self.window_rows(region, propertytype, bedrooms, superbuiltupareasqft)
+        count = int(self.count[rows].sum())
+
+        # too few listings for the sketch to be meaningful, computed exactly
+        if count < self.min_count:
+            return self.exact_window(rows, superbuiltupareasqft)
+
+        # merge the sketches of the window
+        bins = np.concatenate([self.bins[self.indptr[row]:self.indptr[row + 1]] for row in rows])
+        bin_counts = np.concatenate([self.bin_counts[self.indptr[row]:self.indptr[row + 1]] for row in rows])
+        bins, inverse = np.unique(bins, return_inverse=True)
+        bin_counts = np.bincount(inverse, weights=bin_counts)
+
+        # geometric centre of every price bin
+        centres = self.price_origin * self.price_ratio ** (bins + 0.5)
+        low, high = float(self.min[rows].min()), float(self.max[rows].max())
+        centres = np.clip(centres, low, high)
+
+        cumulative = np.cumsum(bin_counts)
+        median = float(centres[np.searchsorted(cumulative, count / 2)])
+
+        # spread the sketch over the histogram shown in the panel
+        edges = np.linspace(low, high, HISTOGRAM_BINS + 1)
+        positions = np.clip(np.searchsorted(edges, centres, side='right') - 1, 0, HISTOGRAM_BINS - 1)
+        hist_counts = np.bincount(positions, weights=bin_counts, minlength=HISTOGRAM_BINS)
+
+        return {
+            "count": count,
+            "mean": float(self.sum[rows].sum() / count),
+            "median": median,
+            "min": low,
+            "max": high,
+            "hist_counts": hist_counts.astype(np.int64),
+            "hist_edges": edges
+        }
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent
+    # data load path
+    data_path = root_path / "data" / "raw" / "real_estate.csv"
+    # save directory for app artifacts
+    save_data_dir = root_path / "data" / "app"
+
+    # make dir if not present
+    save_data_dir.mkdir(exist_ok=True, parents=True)
+
+    # read the parameters
+    parameters = read_params(root_path / "params.yaml")['Market_Stats']
+    logger.info("Parameters read Successfully")
+
+    # load the data
+    df = load_data(data_path)
+    logger.info("Data loaded Successfully")
+
+    # build the segment table
+    market_stats = build_market_stats(df,
+                                      area_ratio=parameters['area_ratio'],
+                                      price_ratio=parameters['price_ratio'],
+                                      price_origin=parameters['price_origin'],
+                                      min_count=parameters['min_count'])
+    logger.info(f"Market statistics built for {len(market_stats['groups'])} segments")
+
+    # save the table
+    save_market_stats(market_stats, save_data_dir / "market_stats.joblib")
+    logger.info("Market statistics saved to location")
@@ -0,0 +1,138 @@
+import pandas as pd
+import numpy as np
+import lightgbm as lgb
+import logging
+import yaml
+from pathlib import Path
+from sklearn.model_selection import KFold
+from src.schema import read_processed, load_dtypes
+from src.instrumentation import StageProfiler
+
+TARGET = 'price'
+
+# binning of the constructed dataset, features are not pre filtered on min_data_in_leaf so trials can lower it
+DATASET_PARAMS = {"feature_pre_filter": False, "verbosity": -1}
+# folds of the cross validation, consecutive as with cross_val_score(cv=5)
+CV_FOLDS = 5
+
+
+# create logger
+logger = logging.getLogger("train_dataset")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('train_dataset.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def load_data(data_path: Path, dtypes: dict = None) -> pd.DataFrame:
+    try:
+        df = read_processed(data_path, dtypes=dtypes)
+
+    except FileNotFoundError:
+        logger.error("The file to load does not exist")
+        raise
+
+    return df
+
+
+def read_params(file_path):
+    with open(file_path, 'r') as f:
+        params_file = yaml.safe_load(f)
+
+    return params_file
+
+
+def build_dataset(X: pd.DataFrame, y) -> lgb.Dataset:
+    # features binned once on the log of the price, the target build_model fits on, pandas categoricals
+    # are split on natively
+    return lgb.Dataset(X, label=np.log1p(np.asarray(y, dtype=np.float64)), params=DATASET_PARAMS).construct()
+
+
+def load_dataset(dataset_path: Path) -> lgb.Dataset:
+    # a dataset saved with save_binary, loaded without binning the features again
+    try:
+        return lgb.Dataset(str(dataset_path), params=DATASET_PARAMS).construct()
+
+    except lgb.basic.LightGBMError:
+        logger.error(f"The dataset {dataset_path} does not exist or is not a LightGBM binary")
+        raise
+
+
+def booster_params(lgbm_params: dict) -> tuple:
+    # LGBMRegressor parameters as lgb.train parameters and boosting rounds, the other names are aliases
+    # lgb.train accepts
+    params = {"objective": "regression", "verbosity": -1, **lgbm_params}
+    return params, params.pop("n_estimators", 100)
+
+
+def price_mae(predictions: np.ndarray, data: lgb.Dataset) -> tuple:
+    # mean absolute error in the price scale, as the held out folds of cross_val_score are scored
+    return "price_mae", float(np.mean(np.abs(np.expm1(predictions) - np.expm1(data.get_label())))), False
+
+
+def cross_validate(dataset: lgb.Dataset, lgbm_params: dict, folds: int = CV_FOLDS) -> np.ndarray:
+    # mean absolute error of every held out fold, the folds are subsets of the constructed dataset and
+    # share its bins, nothing is binned again however many folds and trials are run
+    params, rounds = booster_params({**lgbm_params, "metric": "None"})
+    scores = []
+    for train_rows, held_out in KFold(folds).split(np.arange(dataset.num_data())):
+        booster = lgb.train(params, dataset.subset(train_rows), rounds,
+                            valid_sets=[dataset.subset(held_out)], valid_names=["held_out"],
+                            keep_training_booster=True)
+        scores.append(booster.eval_valid(price_mae)[0][2])
+    return np.array(scores)
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent.parent
+    # data path
+    train_transformed_path = root_path / "data" / "processed" / "train_trans.csv"
+    # binary dataset path
+    dataset_path = root_path / "data" / "processed" / "train.bin"
+
+    # time and memory of every step
+    profiler = StageProfiler("train_dataset", logger)
+
+    # parameters
+    params = read_params(root_path / "params.yaml")
+
+    # categorical dtypes kept by the native encoding, the one-hot output is all numeric
+    native = params['Data_Preprocessing'].get('encoding', 'onehot') == 'native'
+    dtypes = load_dtypes(root_path / "data" / "app" / "metadata.json") if native else None
+
+    # read the data
+    with profiler.step("load_data") as step:
+        train_transformed = load_data(train_transformed_path, dtypes=dtypes)
+        step.rows = len(train_transformed)
+    logger.info("Training data read successfully")
+
+    # bin the features once
+    with profiler.step("construct_dataset", rows=len(train_transformed)):
+        dataset = build_dataset(train_transformed.drop(columns=[TARGET]), train_transformed[TARGET])
+    logger.info(f"Dataset constructed with {dataset.num_feature()} features")
+
+    # save the binned dataset
+    with profiler.step("save_binary"):
+        dataset_path.unlink(missing_ok=True)
+        dataset.save_binary(str(dataset_path))
+    logger.info("Dataset saved to location")
+
+    # save the stage metrics
+    profiler.save()
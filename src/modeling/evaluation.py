@@ -1,28 +1,41 @@
 import pandas as pd
+import numpy as np
 import joblib
 import logging
 import mlflow
-import dagshub
+import io
+import time
+import yaml
+from importlib.metadata import version
 from pathlib import Path
-from sklearn.model_selection import cross_val_score
 from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.pipeline import Pipeline
 import json
-
-
-# initialize dagshub
-import dagshub
-dagshub.init(repo_owner='sourav664', repo_name='real-estate-hybrid-app', mlflow=True)
-
-
-# set the mlflow tracking server
-import mlflow
-mlflow.set_tracking_uri("https://dagshub.com/sourav664/real-estate-hybrid-app.mlflow")
-
-# set mlflow experment name
-mlflow.set_experiment("DVC Pipeline")
+from concurrent.futures import ThreadPoolExecutor
+from mlflow import MlflowClient
+from mlflow.data.dataset import Dataset as DataConfig
+from mlflow.entities import Metric, Param, RunTag, Dataset, DatasetInput, InputTag
+from mlflow.utils.mlflow_tags import MLFLOW_DATASET_CONTEXT
+from src.schema import read_processed, load_dtypes, compact_frame
+from src.data_preprocessing import make_preprocessor, load_data as load_interim
+from src.modeling.train import fit_early_stopped
+from src.modeling.dataset import load_dataset, cross_validate
+from src.instrumentation import StageProfiler
+from src.config import init_tracking
 
 TARGET = "price"
 
+# encodings compared side by side
+ENCODINGS = ["onehot", "native"]
+# test rows timed one at a time for the single prediction latency
+LATENCY_ROWS = 200
+# packages of the logged model, pinned from this environment instead of letting mlflow
+# load the model in a subprocess to infer them
+MODEL_REQUIREMENTS = ["mlflow", "cloudpickle", "lightgbm", "numpy", "pandas", "scikit-learn", "scipy"]
+# defaults of the Evaluation params
+DATASET_PROFILE_MAX_ROWS = 1_000_000
+UPLOAD_WORKERS = 4
+
 
 # create logger
 logger = logging.getLogger("data_evaluation")
@@ -32,8 +45,8 @@ logger.setLevel(logging.DEBUG)
 handler = logging.StreamHandler()
 handler.setLevel(logging.DEBUG)
 
-# file handler
-file_handler = logging.FileHandler('data_evaluation.log')
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('data_evaluation.log', delay=True)
 file_handler.setLevel(logging.DEBUG)
 
 
@@ -47,9 +60,9 @@ file_handler.setFormatter(formatter)
 logger.addHandler(handler)
 logger.addHandler(file_handler)
 
-def load_data(data_path: Path) -> pd.DataFrame:
+def load_data(data_path: Path, dtypes: dict = None) -> pd.DataFrame:
     try:
-        df = pd.read_csv(data_path)
+        df = read_processed(data_path, dtypes=dtypes)
     
     except FileNotFoundError:
         logger.error("The file to load does not exist")
@@ -67,6 +80,93 @@ def load_model(model_path: Path):
     return model
 
 
+def read_params(file_path: Path) -> dict:
+    with open(file_path, "r") as f:
+        params_file = yaml.safe_load(f)
+
+    return params_file
+
+
+def compare_encoding(encoding: str, params: dict, dtypes: dict,
+                     train_df: pd.DataFrame, test_df: pd.DataFrame) -> dict:
+    # preprocess, train and score one encoding from the interim data
+    X_train, y_train = make_X_and_y(train_df, TARGET)
+    X_test, y_test = make_X_and_y(test_df, TARGET)
+
+    preprocessor = make_preprocessor(params={**params['Data_Preprocessing'], 'encoding': encoding}, dtypes=dtypes)
+    start = time.perf_counter()
+    X_train_trans = compact_frame(preprocessor.fit_transform(X_train, y_train))
+    preprocess_seconds = time.perf_counter() - start
+
+    # trained as the train stage trains the served model, with early stopping
+    start = time.perf_counter()
+    model, best_iteration = fit_early_stopped(params['Train']['LightGBM'], X_train_trans, y_train,
+                                              params['Train']['Early_Stopping'])
+    train_seconds = time.perf_counter() - start
+
+    # model size on disk: the booster alone and the fitted preprocessor + model
+    pipeline = Pipeline([("preprocess", preprocessor), ("regressor", model)])
+    buffer = io.BytesIO()
+    joblib.dump(pipeline, buffer)
+
+    # latency of one row through the full pipeline, as the app predicts
+    single = []
+    for row in range(min(LATENCY_ROWS, len(X_test))):
+        start = time.perf_counter()
+        pipeline.predict(X_test.iloc[[row]])
+        single.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    y_test_pred = pipeline.predict(X_test)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "n_features": X_train_trans.shape[1],
+        "best_iteration": best_iteration,
+        "preprocess_seconds": preprocess_seconds,
+        "train_seconds": train_seconds,
+        "booster_bytes": len(model.regressor_.booster_.model_to_string()),
+        "pipeline_bytes": buffer.getbuffer().nbytes,
+        "single_latency_ms_median": float(np.median(single) * 1e3),
+        "single_latency_ms_p95": float(np.percentile(single, 95) * 1e3),
+        "batch_rows_per_second": len(X_test) / batch_seconds,
+        "test_mae": mean_absolute_error(y_test, y_test_pred),
+        "test_r2": r2_score(y_test, y_test_pred)
+    }
+
+
+def pinned_requirements(packages: list) -> list:
+    return [f"{package}=={version(package)}" for package in packages]
+
+
+def log_run_batch(client: MlflowClient, run_id: str, params: dict, metrics: dict, tags: dict):
+    # params, metrics and tags of the run in one asynchronous batch, wait() on the result
+    timestamp = int(time.time() * 1000)
+    return client.log_batch(run_id,
+                            metrics=[Metric(key, float(value), timestamp, 0) for key, value in metrics.items()],
+                            params=[Param(key, str(value)) for key, value in params.items()],
+                            tags=[RunTag(key, str(value)) for key, value in tags.items()],
+                            synchronous=False)
+
+
+def dataset_entity(df: pd.DataFrame, profile: bool) -> Dataset:
+    # name, digest and source of the frame, with the inferred schema and the profile only when profile is set
+    dataset = mlflow.data.from_pandas(df, targets=TARGET)
+    config = dataset.to_dict() if profile else DataConfig.to_dict(dataset)
+    return Dataset(name=config["name"], digest=config["digest"], source_type=config["source_type"],
+                   source=config["source"], schema=config.get("schema"), profile=config.get("profile"))
+
+
+def log_dataset_inputs(client: MlflowClient, run_id: str, datasets: dict, max_rows: int) -> list:
+    # context -> frame logged as run inputs in one call, frames over max_rows are logged without
+    # inferring their schema and profile, their contexts are returned
+    inputs = [DatasetInput(dataset=dataset_entity(df, profile=len(df) <= max_rows),
+                           tags=[InputTag(key=MLFLOW_DATASET_CONTEXT, value=context)])
+              for context, df in datasets.items()]
+    client.log_inputs(run_id, datasets=inputs)
+    return [context for context, df in datasets.items() if len(df) > max_rows]
+
+
 def save_model_info(save_json_path,run_id, artifact_path, model_name):
     info_dict = {
         "run_id": run_id,
@@ -83,16 +183,38 @@ if __name__ == "__main__":
     # train data load path
     train_data_path = root_path / "data" / "processed" / "train_trans.csv"
     test_data_path = root_path / "data" / "processed" / "test_trans.csv"
+    # binned train data of the cross validation
+    train_dataset_path = root_path / "data" / "processed" / "train.bin"
     # model path
     model_path = root_path / "models" / "model.joblib"
+    # lower and upper quantile models of the prediction intervals
+    quantile_models_path = root_path / "models" / "quantile_models.joblib"
+    # encoding comparison report
+    comparison_path = root_path / "reports" / "encoding_comparison.json"
+    # boosting rounds of the served model, found with early stopping by the train stage
+    training_report_path = root_path / "reports" / "training.json"
+    
+    # read the parameters
+    params = read_params(root_path / "params.yaml")
+    
+    # time and memory of every step
+    profiler = StageProfiler("evaluation", logger)
     
+    # categorical dtypes kept by the native encoding
+    dtypes = load_dtypes(root_path / "data" / "app" / "metadata.json")
     
-    # load the training data
-    train_data = load_data(train_data_path)
-    logger.info("Train data loaded successfully")
-    # load the test data
-    test_data = load_data(test_data_path)
-    logger.info("Test data loaded successfully")
+    # the one-hot output is all numeric, its locality column is target encoded
+    native = params['Data_Preprocessing'].get('encoding', 'onehot') == 'native'
+    processed_dtypes = dtypes if native else None
+    
+    with profiler.step("load_data", category="compute") as step:
+        # load the training data
+        train_data = load_data(train_data_path, dtypes=processed_dtypes)
+        logger.info("Train data loaded successfully")
+        # load the test data
+        test_data = load_data(test_data_path, dtypes=processed_dtypes)
+        logger.info("Test data loaded successfully")
+        step.rows = len(train_data) + len(test_data)
     
     # split the train and test data
     X_train, y_train = make_X_and_y(train_data,TARGET)
@@ -101,12 +223,14 @@ if __name__ == "__main__":
     
     # load the model
     model = load_model(model_path)
+    quantile_models = load_model(quantile_models_path)
     logger.info("Model Loaded successfully")
     
     
     # get the predictions
-    y_train_pred = model.predict(X_train)
-    y_test_pred = model.predict(X_test)
+    with profiler.step("predict", rows=len(X_train) + len(X_test), category="compute"):
+        y_train_pred = model.predict(X_train)
+        y_test_pred = model.predict(X_test)
     logger.info("prediction on data complete")
     
     
@@ -120,65 +244,117 @@ if __name__ == "__main__":
     test_r2 = r2_score(y_test,y_test_pred)
     logger.info("r2 score calculated")
     
+    # share of test prices inside their interval and the median interval width relative to the prediction
+    with profiler.step("intervals", rows=len(X_test), category="compute"):
+        lower, upper = (quantile_model.predict(X_test) for quantile_model in quantile_models)
+        lower, upper = np.minimum(lower, y_test_pred), np.maximum(upper, y_test_pred)
+        test_interval_coverage = float(((y_test >= lower) & (y_test <= upper)).mean())
+        test_interval_width = float(np.median((upper - lower) / y_test_pred))
+    logger.info(f"Intervals hold {test_interval_coverage:.1%} of test prices")
+    
     
-     # calculate cross val scores
-    cv_scores = cross_val_score(model,
-                                X_train,
-                                y_train,
-                                cv=5,
-                                scoring="neg_mean_absolute_error",
-                                n_jobs=-1)
+     # calculate cross val scores, the folds are subsets of the dataset binned by the train_dataset stage
+     # and train as many rounds as the served model
+    with open(training_report_path) as f:
+        best_iteration = json.load(f)["best_iteration"]
+    with profiler.step("cross_validation", rows=len(X_train), category="compute"):
+        train_dataset = load_dataset(train_dataset_path)
+        cv_scores = cross_validate(train_dataset, {**params['Train']['LightGBM'], "n_estimators": best_iteration})
     logger.info("cross validation complete")
     
     # mean cross val score
-    mean_cv_score = -(cv_scores.mean())
+    mean_cv_score = cv_scores.mean()
+    
+    # compare one-hot and native categorical encodings on the interim data
+    interim_train = load_interim(root_path / "data" / "interim" / "train.csv", dtypes=dtypes)
+    interim_test = load_interim(root_path / "data" / "interim" / "test.csv", dtypes=dtypes)
+    with profiler.step("encoding_comparison", rows=len(interim_train) + len(interim_test),
+                       category="compute"):
+        comparison = {encoding: compare_encoding(encoding, params, dtypes, interim_train, interim_test)
+                      for encoding in ENCODINGS}
+    comparison_path.parent.mkdir(exist_ok=True, parents=True)
+    with open(comparison_path, "w") as f:
+        json.dump(comparison, f, indent=4)
+    logger.info("Encoding comparison complete")
+    
+    # tracking options
+    evaluation_params = params.get('Evaluation', {})
+    dataset_profile_max_rows = evaluation_params.get('dataset_profile_max_rows', DATASET_PROFILE_MAX_ROWS)
+    upload_workers = evaluation_params.get('upload_workers', UPLOAD_WORKERS)
+    
+    # everything logged to the run, collected up front
+    run_metrics = {
+        "train_mae": train_mae,
+        "test_mae": test_mae,
+        "train_r2": train_r2,
+        "test_r2": test_r2,
+        "mean_cv_score": mean_cv_score,
+        "test_interval_coverage": test_interval_coverage,
+        "test_interval_width": test_interval_width,
+        # individual cv scores
+        **{f"CV {num}": score for num, score in enumerate(cv_scores)},
+        # the encoding comparison
+        **{f"{encoding}_{name}": value for encoding, metrics in comparison.items()
+           for name, value in metrics.items()}
+    }
+    run_tags = {
+        "model": "Real Estate Price Regressor",
+        "encoding": params['Data_Preprocessing'].get('encoding', 'onehot')
+    }
+    # the bundle holds the preprocessor, booster and target transform the app serves
+    artifact_paths = [
+        comparison_path,
+        root_path / "models" / "model.bundle"
+    ]
+    
+    # model signature
+    with profiler.step("model_signature", category="compute"):
+        signature_input = X_train.sample(20,random_state=42)
+        model_signature = mlflow.models.infer_signature(model_input=signature_input,
+                                                        model_output=model.predict(signature_input))
+    
+    # connect to the tracking store of src/config.py, set mlflow experment name
+    with profiler.step("tracking_init", category="tracking"):
+        init_tracking(experiment="DVC Pipeline")
     
      # log with mlflow
-    with mlflow.start_run() as run:
-        # set tags
-        mlflow.set_tag("model","Real Estate Price Regressor")
-
-        # log parameters
-        mlflow.log_params(model.get_params())
-
-        # log metrics
-        mlflow.log_metric("train_mae",train_mae)
-        mlflow.log_metric("test_mae",test_mae)
-        mlflow.log_metric("train_r2",train_r2)
-        mlflow.log_metric("test_r2",test_r2)
-        mlflow.log_metric("mean_cv_score",-(cv_scores.mean()))
-
-        # log individual cv scores
-        mlflow.log_metrics({f"CV {num}": score for num, score in enumerate(-cv_scores)})
-        
-        # mlflow dataset input datatype
-        train_data_input = mlflow.data.from_pandas(train_data,targets=TARGET)
-        test_data_input = mlflow.data.from_pandas(test_data,targets=TARGET)
+    client = MlflowClient()
+    with mlflow.start_run() as run, ThreadPoolExecutor(max_workers=upload_workers) as uploads:
+        with profiler.step("log_batch", category="tracking"):
+            # params, metrics and tags in one asynchronous batch
+            batch = log_run_batch(client, run.info.run_id, params=model.get_params(),
+                                  metrics=run_metrics, tags=run_tags)
         
-        # log input
-        mlflow.log_input(dataset=train_data_input,context="training")
-        mlflow.log_input(dataset=test_data_input,context="validation")
+        with profiler.step("log_artifacts_and_model", category="tracking"):
+            # the artifacts upload in parallel while the model is logged
+            artifact_uploads = [uploads.submit(client.log_artifact, run.info.run_id, str(path))
+                                for path in artifact_paths]
+            
+            # log the final model
+            mlflow.sklearn.log_model(model,"price_prediction_pred_model",signature=model_signature,
+                                     pip_requirements=pinned_requirements(MODEL_REQUIREMENTS))
+            
+            for upload in artifact_uploads:
+                upload.result()
         
-        # model signature
-        model_signature = mlflow.models.infer_signature(model_input=X_train.sample(20,random_state=42),
-                                    model_output=model.predict(X_train.sample(20,random_state=42)))
-        
-        # log the final model
-        mlflow.sklearn.log_model(model,"price_prediction_pred_model",signature=model_signature)
-
-        # log stacking regressor
-        mlflow.log_artifact(root_path / "models" / "model.joblib")
-        
-        # log the power transformer
-        mlflow.log_artifact(root_path / "models" / "log_transformer.joblib")
-        
-        # log the preprocessor
-        mlflow.log_artifact(root_path / "models" / "preprocesser.joblib")
+        with profiler.step("log_inputs", rows=len(train_data) + len(test_data), category="tracking"):
+            # the training and validation datasets, large frames skip the schema and profile
+            unprofiled = log_dataset_inputs(client, run.info.run_id,
+                                            datasets={"training": train_data, "validation": test_data},
+                                            max_rows=dataset_profile_max_rows)
+            if unprofiled:
+                logger.info(f"Dataset inputs {unprofiled} logged without a profile, "
+                            f"over {dataset_profile_max_rows} rows")
+            batch.wait()
         
         # get the current run artifact uri
         artifact_uri = mlflow.get_artifact_uri()
         
         logger.info("Mlflow logging complete and model logged")
+    
+    categories = profiler.categories()
+    logger.info(f"Time in tracking {categories['tracking']['wall_seconds']:.2f}s, "
+                f"in compute {categories['compute']['wall_seconds']:.2f}s")
         
     # get the run id 
     run_id = run.info.run_id
@@ -192,4 +368,5 @@ if __name__ == "__main__":
                     model_name=model_name)
     logger.info("Model Information saved")
     
-
+    # save the stage metrics
+    profiler.save()
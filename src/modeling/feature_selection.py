@@ -0,0 +1,188 @@
+import pandas as pd
+import numpy as np
+import io
+import joblib
+import json
+import logging
+import time
+import tracemalloc
+import yaml
+from pathlib import Path
+from sklearn import set_config
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.pipeline import Pipeline
+from src.schema import load_dtypes, compact_frame
+from src.data_preprocessing import make_preprocessor, load_data
+from src.modeling.train import fit_early_stopped
+from src.instrumentation import StageProfiler
+
+TARGET = "price"
+
+# test rows timed one at a time through the preprocessor and the model, as the app predicts
+LATENCY_ROWS = 200
+# batch predictions of the whole test set timed
+BATCH_RUNS = 5
+
+
+# set the transformer outputs to pandas
+set_config(transform_output='pandas')
+
+# create logger
+logger = logging.getLogger("feature_selection")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('feature_selection.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def read_params(file_path):
+    with open(file_path, 'r') as f:
+        params_file = yaml.safe_load(f)
+
+    return params_file
+
+
+def fit_pipeline(preprocessor, lgbm_params: dict, stopping_params: dict, X_train: pd.DataFrame,
+                 y_train: pd.Series) -> Pipeline:
+    # the preprocessor and the model fitted as the train stage fits the model that ships, early stopped
+    X_train_trans = compact_frame(preprocessor.fit_transform(X_train, y_train))
+    model, best_iteration = fit_early_stopped(lgbm_params, X_train_trans, y_train, stopping_params)
+    logger.info(f"Validation score stopped improving after {best_iteration} rounds")
+    return Pipeline([("preprocess", preprocessor), ("regressor", model)])
+
+
+def gain_shares(pipeline: Pipeline) -> pd.Series:
+    # share of the total split gain of every model column, the booster renames columns with whitespace so
+    # the gains are matched to the preprocessor output by position
+    booster = pipeline.named_steps["regressor"].regressor_.booster_
+    gains = booster.feature_importance(importance_type="gain")
+    columns = pipeline.named_steps["preprocess"].get_feature_names_out()
+    return pd.Series(gains / gains.sum(), index=columns).sort_values(ascending=False)
+
+
+def select_features(pipeline: Pipeline, shares: pd.Series, min_gain_share: float) -> list:
+    # model columns with more than min_gain_share of the gain, in the order the preprocessor outputs them
+    return [column for column in pipeline.named_steps["preprocess"].get_feature_names_out()
+            if shares[column] > min_gain_share]
+
+
+def pipeline_report(pipeline: Pipeline, X_test: pd.DataFrame, y_test: pd.Series) -> dict:
+    # width, size, latency, memory and accuracy of a fitted preprocessor + model
+    buffer = io.BytesIO()
+    joblib.dump(pipeline, buffer)
+
+    single = []
+    for row in range(min(LATENCY_ROWS, len(X_test))):
+        start = time.perf_counter()
+        pipeline.predict(X_test.iloc[[row]])
+        single.append(time.perf_counter() - start)
+
+    batch = []
+    for _ in range(BATCH_RUNS):
+        start = time.perf_counter()
+        pipeline.predict(X_test)
+        batch.append(time.perf_counter() - start)
+
+    # python and numpy allocations of transforming and predicting the test set
+    tracemalloc.start()
+    X_test_trans = compact_frame(pipeline.named_steps["preprocess"].transform(X_test))
+    y_test_pred = pipeline.named_steps["regressor"].predict(X_test_trans)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "n_features": X_test_trans.shape[1],
+        "pipeline_bytes": buffer.getbuffer().nbytes,
+        "single_latency_ms_median": float(np.median(single) * 1e3),
+        "single_latency_ms_p95": float(np.percentile(single, 95) * 1e3),
+        "batch_seconds": float(np.median(batch)),
+        "test_matrix_mb": float(X_test_trans.memory_usage(deep=True).sum() / 2 ** 20),
+        "transform_predict_peak_mb": peak / 2 ** 20,
+        "test_mae": mean_absolute_error(y_test, y_test_pred),
+        "test_r2": r2_score(y_test, y_test_pred)
+    }
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent.parent
+    # interim data paths
+    train_data_path = root_path / "data" / "interim" / "train.csv"
+    test_data_path = root_path / "data" / "interim" / "test.csv"
+    # selected model columns, read by the data_preprocessing stage
+    features_path = root_path / "models" / "selected_features.json"
+    # full and narrow model report
+    report_path = root_path / "reports" / "feature_selection.json"
+
+    # time and memory of every step
+    profiler = StageProfiler("feature_selection", logger)
+
+    # parameters
+    params = read_params(root_path / "params.yaml")
+    min_gain_share = params['Feature_Selection']['min_gain_share']
+    lgbm_params = params['Train']['LightGBM']
+    stopping_params = params['Train']['Early_Stopping']
+
+    # compact dtypes with the category order fixed by the metadata
+    dtypes = load_dtypes(root_path / "data" / "app" / "metadata.json")
+
+    # load the train and test data
+    with profiler.step("load_data") as step:
+        train_df = load_data(train_data_path, dtypes=dtypes)
+        test_df = load_data(test_data_path, dtypes=dtypes)
+        step.rows = len(train_df) + len(test_df)
+    X_train, y_train = train_df.drop(columns=[TARGET]), train_df[TARGET]
+    X_test, y_test = test_df.drop(columns=[TARGET]), test_df[TARGET]
+    logger.info("Train and test data loaded successfully")
+
+    # the model on every column the preprocessor outputs
+    with profiler.step("fit_full", rows=len(X_train)):
+        full = fit_pipeline(make_preprocessor(params['Data_Preprocessing'], dtypes), lgbm_params, stopping_params,
+                            X_train, y_train)
+    shares = gain_shares(full)
+    features = select_features(full, shares, min_gain_share)
+    dropped = [column for column in shares.index if column not in features]
+    logger.info(f"{len(features)} of {len(shares)} model columns hold more than {min_gain_share:g} of the gain, "
+                f"dropping {dropped}")
+
+    # a narrower preprocessor, only encoding the inputs the kept columns come from, and the model retrained on it
+    with profiler.step("fit_narrow", rows=len(X_train)):
+        narrow = fit_pipeline(make_preprocessor(params['Data_Preprocessing'], dtypes, features=features),
+                              lgbm_params, stopping_params, X_train, y_train)
+    logger.info("Narrow model retrained")
+
+    # latency, memory and accuracy side by side
+    with profiler.step("compare", rows=len(X_test)):
+        report = {"full": pipeline_report(full, X_test, y_test), "narrow": pipeline_report(narrow, X_test, y_test)}
+    for name, metrics in report.items():
+        logger.info(f"{name}: {metrics['n_features']} features, {metrics['single_latency_ms_median']:.2f} ms per row, "
+                    f"{metrics['transform_predict_peak_mb']:.1f} MB peak, test mae {metrics['test_mae']:.5f}")
+
+    # save the selection and the report
+    features_path.parent.mkdir(exist_ok=True)
+    with open(features_path, "w") as f:
+        json.dump({"min_gain_share": min_gain_share, "features": features, "dropped": dropped,
+                   "gain_share": shares.to_dict()}, f, indent=4)
+    report_path.parent.mkdir(exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+    logger.info("Selected features and report saved")
+
+    # save the stage metrics
+    profiler.save()
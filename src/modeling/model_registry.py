@@ -1,9 +1,10 @@
 import mlflow
-import dagshub
 import json
 from pathlib import Path
 from mlflow import MlflowClient
 import logging
+from src.instrumentation import StageProfiler
+from src.config import init_tracking
 
 
 # create logger
@@ -14,8 +15,8 @@ logger.setLevel(logging.DEBUG)
 handler = logging.StreamHandler()
 handler.setLevel(logging.DEBUG)
 
-# file handler
-file_handler = logging.FileHandler('model_registry.log')
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('model_registry.log', delay=True)
 file_handler.setLevel(logging.DEBUG)
 
 
@@ -29,24 +30,29 @@ file_handler.setFormatter(formatter)
 logger.addHandler(handler)
 logger.addHandler(file_handler)
 
-# initialize dagshub
-import dagshub
-dagshub.init(repo_owner='sourav664', repo_name='real-estate-hybrid-app', mlflow=True)
-
-
-# set the mlflow tracking server
-import mlflow
-mlflow.set_tracking_uri("https://dagshub.com/sourav664/real-estate-hybrid-app.mlflow")
-
-
 def load_model_information(file_path):
     with open(file_path, 'r') as f:
         run_info = json.load(f)
     return run_info
 
 
+def register_model(run_id: str, model_name: str, stage: str = "Staging", client: MlflowClient = None):
+    # register the model logged in the run and move the new version to the stage
+    model_version = mlflow.register_model(model_uri=f"runs:/{run_id}/{model_name}", name=model_name)
+
+    client = client or MlflowClient()
+    client.transition_model_version_stage(
+        name = model_version.name,
+        version = model_version.version,
+        stage = stage
+    )
+    return model_version
+
+
 
 if __name__ == "__main__":
+    # connect to the tracking store of src/config.py
+    init_tracking()
     
     #root path
     root_path = Path(__file__).parent.parent.parent
@@ -54,6 +60,9 @@ if __name__ == "__main__":
     # run information file path
     run_info_path = root_path / "run_information.json"
     
+    # time of every step
+    profiler = StageProfiler("model_registry", logger)
+    
     
     # register the model
     run_info = load_model_information(run_info_path)
@@ -64,28 +73,13 @@ if __name__ == "__main__":
     model_name = run_info['model_name']
     
     
-    # model to register path
-    model_registry_path = f"runs:/{run_id}/{model_name}"
-    
-    
-    # register the model
-    model_version = mlflow.register_model(model_uri=model_registry_path,
-                                          name=model_name)
-    
-    
-    # get the model version
-    registered_model_version = model_version.version
-    registered_model_name = model_version.name
-    logger.info(f"The latest model version in model registry is {registered_model_version}")
-    
-    
-    # update the stage of the model to staging
-    client = MlflowClient()
-    client.transition_model_version_stage(
-        name = registered_model_name,
-        version = registered_model_version,
-        stage = "Staging"
-    )
+    # register the model and update its stage to staging
+    with profiler.step("register_model"):
+        model_version = register_model(run_id=run_id, model_name=model_name, stage="Staging")
     
+    logger.info(f"The latest model version in model registry is {model_version.version}")
     logger.info("Model pushed to Staging stage")
+    
+    # save the stage metrics
+    profiler.save()
 
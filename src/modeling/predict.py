@@ -0,0 +1,121 @@
+import pandas as pd
+import logging
+import argparse
+from pathlib import Path
+from src.bundle import ModelBundle, BUNDLE_PATH
+from src.explain import Explainer
+from src.schema import feature_columns
+from src.instrumentation import StageProfiler
+
+# rows read and scored at a time
+CHUNK_SIZE = 50_000
+# column the predictions are written to
+PREDICTION_COLUMN = "predicted_price"
+# prefix of the per input contribution columns
+CONTRIBUTION_PREFIX = "contribution_"
+# columns the interval bounds are written to
+LOWER_COLUMN = "predicted_price_lower"
+UPPER_COLUMN = "predicted_price_upper"
+
+
+# create logger
+logger = logging.getLogger("predict")
+logger.setLevel(logging.DEBUG)
+
+# console handler
+handler = logging.StreamHandler()
+handler.setLevel(logging.DEBUG)
+
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('predict.log', delay=True)
+file_handler.setLevel(logging.DEBUG)
+
+
+# create a fomratter
+formatter = logging.Formatter(fmt='[%(asctime)s] (line %(lineno)d) - %(name)s - %(levelname)s in %(module)s: %(message)s')
+# add formatter to handler
+handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# ADD BOTH HANDLERS
+logger.addHandler(handler)
+logger.addHandler(file_handler)
+
+
+def read_chunks(input_path: Path, dtypes: dict, chunk_size: int):
+    # csv is streamed in chunks, parquet is read at once, columns other than the features are kept as read
+    try:
+        if input_path.suffix == ".parquet":
+            yield pd.read_parquet(input_path)
+        else:
+            yield from pd.read_csv(input_path, dtype=dtypes, chunksize=chunk_size)
+
+    except FileNotFoundError:
+        logger.error("The file to load does not exist")
+        raise
+
+
+def score(bundle: ModelBundle, input_path: Path, output_path: Path, chunk_size: int = CHUNK_SIZE,
+          explain: bool = False, intervals: bool = True) -> int:
+    # append the predicted price, its interval when the bundle has quantile boosters, and the contribution
+    # of every input when explaining, to every input row, returns the rows scored
+    explainer = Explainer(bundle) if explain else None
+    intervals = intervals and bool(bundle.quantiles)
+    missing = None
+    rows = 0
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    for chunk in read_chunks(input_path, bundle.dtypes, chunk_size):
+        missing = missing if missing is not None else [column for column in feature_columns if column not in chunk]
+        if missing:
+            raise ValueError(f"{input_path} is missing the model inputs {missing}")
+
+        # one preprocessing pass feeds every booster
+        X_trans = bundle.transform(chunk)
+        if explainer is None:
+            predictions = bundle.predict_transformed(X_trans)
+        else:
+            predictions, contributions, _ = explainer.explain(chunk, X_trans)
+        chunk[PREDICTION_COLUMN] = predictions
+        if intervals:
+            chunk[LOWER_COLUMN], chunk[UPPER_COLUMN] = bundle.interval_transformed(X_trans, predictions)
+        if explainer is not None:
+            chunk = chunk.join(contributions.add_prefix(CONTRIBUTION_PREFIX))
+        chunk.to_csv(output_path, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+        rows += len(chunk)
+
+    return rows
+
+
+if __name__ == "__main__":
+    # root path
+    root_path = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description="Score listings with the packaged model bundle")
+    parser.add_argument("--input", type=Path, default=root_path / "data" / "interim" / "test.csv",
+                        help="csv or parquet file with the model inputs")
+    parser.add_argument("--output", type=Path, default=root_path / "data" / "predictions" / "predictions.csv",
+                        help="csv the inputs and their predicted price are written to")
+    parser.add_argument("--bundle", type=Path, default=BUNDLE_PATH, help="model bundle to score with")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="csv rows scored at a time")
+    parser.add_argument("--explain", action="store_true",
+                        help="add the TreeSHAP contribution of every input, in the model's target space")
+    parser.add_argument("--no-intervals", action="store_true",
+                        help="leave out the lower and upper bounds of the predictions")
+    args = parser.parse_args()
+
+    # time and memory of every step
+    profiler = StageProfiler("predict", logger)
+
+    # load the bundle
+    with profiler.step("load_bundle"):
+        bundle = ModelBundle.load(args.bundle)
+    logger.info(f"Model bundle {bundle.bundle_id[:12]} loaded")
+
+    # score the input file
+    with profiler.step("score") as step:
+        step.rows = score(bundle, args.input, args.output, chunk_size=args.chunk_size, explain=args.explain,
+                          intervals=not args.no_intervals)
+    logger.info(f"{step.rows} rows scored and saved to {args.output}")
+
+    # save the stage metrics
+    profiler.save()
@@ -1,15 +1,26 @@
 import pandas as pd
 import numpy as np
+import io
 import joblib
 import logging
+import time
 import yaml
+import json
 from pathlib import Path
 from sklearn.preprocessing import FunctionTransformer
 from sklearn.compose import TransformedTargetRegressor
-from lightgbm import LGBMRegressor
+from sklearn.model_selection import train_test_split
+from lightgbm import LGBMRegressor, early_stopping
+from src.schema import read_processed, load_dtypes
+from src.instrumentation import StageProfiler
+from src.bundle import ModelBundle
 
 TARGET = 'price'
 
+# predictions timed per model in the training report, of one row and of a batch of train rows
+LATENCY_RUNS = 100
+BATCH_ROWS = 1000
+
 #create logger
 logger = logging.getLogger("train_model")
 logger.setLevel(logging.DEBUG)
@@ -18,8 +29,8 @@ logger.setLevel(logging.DEBUG)
 handler = logging.StreamHandler()
 handler.setLevel(logging.DEBUG)
 
-# file handler
-file_handler = logging.FileHandler('train_model.log')
+# file handler, opened on the first record so importing the module leaves no log file
+file_handler = logging.FileHandler('train_model.log', delay=True)
 file_handler.setLevel(logging.DEBUG)
 
 
@@ -34,9 +45,9 @@ logger.addHandler(handler)
 logger.addHandler(file_handler)
 
 
-def load_data(data_path: Path) -> pd.DataFrame:
+def load_data(data_path: Path, dtypes: dict = None) -> pd.DataFrame:
     try:
-        df = pd.read_csv(data_path)
+        df = read_processed(data_path, dtypes=dtypes)
         
     except FileNotFoundError:
         logger.error("The file to load does not exist")
@@ -59,20 +70,65 @@ def save_model(model, save_dir: Path, model_name: str) -> None:
     joblib.dump(value=model, filename=save_location)
 
 
-def save_transformer(transformer, save_dir: Path, transformer_name: str) -> None:
-    # form the save location
-    save_location = save_dir / transformer_name
-    
-    # save the transformer
-    joblib.dump(value=transformer, filename=save_location)
-    
-    
 def train_model(model, X_train: pd.DataFrame, y_train):
     # fit the model
     model.fit(X_train, y_train)
     
     return model
 
+def build_model(lgbm_params: dict) -> TransformedTargetRegressor:
+    # LightGBM on the log of the price, pandas categoricals are split on natively
+    lgbm = LGBMRegressor(**lgbm_params)
+    log_transformer = FunctionTransformer(func=np.log1p, inverse_func=np.expm1, validate=True)
+
+    return TransformedTargetRegressor(regressor=lgbm, transformer=log_transformer)
+
+
+def build_quantile_models(lgbm_params: dict, interval_params: dict) -> list:
+    # one model per alpha with the quantile objective, on the same log target as the point model, the
+    # quantiles of the log price are the log of the price quantiles
+    quantile_params = {**lgbm_params, **interval_params.get("LightGBM", {}), "objective": "quantile"}
+    return [build_model({**quantile_params, "alpha": alpha}) for alpha in interval_params["alphas"]]
+
+
+def find_best_iteration(lgbm_params: dict, X_train: pd.DataFrame, y_train, stopping_params: dict) -> tuple:
+    # boosting rounds before the score on a held out validation split stopped improving for patience
+    # rounds, with the validation score at that round
+    X_fit, X_valid, y_fit, y_valid = train_test_split(X_train, y_train, test_size=stopping_params["validation_size"],
+                                                      random_state=stopping_params["random_state"])
+    model = build_model(lgbm_params)
+    # the validation target is transformed as the regressor sees the fit target
+    y_valid_trans = model.transformer.func(np.asarray(y_valid))
+    model.fit(X_fit, y_fit, eval_set=[(X_valid, y_valid_trans)],
+              callbacks=[early_stopping(stopping_params["patience"], verbose=False)])
+
+    regressor = model.regressor_
+    best_iteration = regressor.best_iteration_ or regressor.booster_.current_iteration()
+    return best_iteration, dict(regressor.best_score_["valid_0"])
+
+
+def fit_early_stopped(lgbm_params: dict, X_train: pd.DataFrame, y_train, stopping_params: dict) -> tuple:
+    # the model as the train stage fits it: the rounds found by find_best_iteration, on all the train data
+    best_iteration, _ = find_best_iteration(lgbm_params, X_train, y_train, stopping_params)
+    model = build_model({**lgbm_params, "n_estimators": best_iteration}).fit(X_train, y_train)
+    return model, best_iteration
+
+
+def model_footprint(model, X: pd.DataFrame) -> dict:
+    # trees, pickled size and median latency of single row and batch predictions of a fitted model
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    footprint = {"trees": model.regressor_.booster_.num_trees(), "model_bytes": buffer.getbuffer().nbytes}
+    for name, rows in [("single_row_ms", X.iloc[[0]]), (f"batch_{BATCH_ROWS}_ms", X.iloc[:BATCH_ROWS])]:
+        seconds = []
+        for _ in range(LATENCY_RUNS):
+            start = time.perf_counter()
+            model.predict(rows)
+            seconds.append(time.perf_counter() - start)
+        footprint[name] = float(np.median(seconds) * 1e3)
+    return footprint
+
+
 def make_X_and_y(data: pd.DataFrame, target: str) -> tuple:
     X = data.drop(columns=[target])
     y = data[target]
@@ -90,9 +146,20 @@ if __name__ == "__main__":
     # data path
     train_transformed_path = root_path / "data" / "processed" / "train_trans.csv"
    
+    # time and memory of every step
+    profiler = StageProfiler("train", logger)
+    
+    # parameters
+    params = read_params(params_file_path)
+    
+    # categorical dtypes kept by the native encoding, the one-hot output is all numeric
+    native = params['Data_Preprocessing'].get('encoding', 'onehot') == 'native'
+    dtypes = load_dtypes(root_path / "data" / "app" / "metadata.json") if native else None
     
     # read the data
-    train_transformed = load_data(train_transformed_path)
+    with profiler.step("load_data") as step:
+        train_transformed = load_data(train_transformed_path, dtypes=dtypes)
+        step.rows = len(train_transformed)
     logger.info("Training data read successfully")
     
     
@@ -102,27 +169,38 @@ if __name__ == "__main__":
     
     
     # model parameters
-    model_params = read_params(params_file_path)['Train']
+    model_params = params['Train']
     
     # light gbm params
     lgbm_params = model_params["LightGBM"]
     logger.info("Light GBM parameters read")
-    lgbm = LGBMRegressor(**lgbm_params)
-    logger.info("built Light GBM model")
     
-
-    # log transformer
-    log_transformer = FunctionTransformer(func=np.log1p, inverse_func=np.expm1, validate=True)
-    logger.info("Target Transformer built")
+    # rounds to train for, found with early stopping on a validation split of the train data
+    stopping_params = model_params["Early_Stopping"]
+    with profiler.step("early_stopping", rows=len(X_train)):
+        best_iteration, validation_scores = find_best_iteration(lgbm_params, X_train, y_train, stopping_params)
+    logger.info(f"Validation score stopped improving after {best_iteration} of {lgbm_params['n_estimators']} rounds")
     
-    # make the model wrapper
-    model = TransformedTargetRegressor(regressor=lgbm,
-                                       transformer=log_transformer)
+    # make the model wrapper with the log target transformer, truncated to the best iteration
+    model = build_model({**lgbm_params, "n_estimators": best_iteration})
     logger.info("Model wrapper built")
     
-    # fit the model on training data
-    train_model(model, X_train, y_train)
-    logger.info("Model trained on training data")
+    # fit the model on all the training data
+    with profiler.step("train_model", rows=len(X_train)):
+        train_model(model, X_train, y_train)
+    logger.info(f"Model trained on training data with {model.regressor_.booster_.num_trees()} trees")
+    
+    # the model with all n_estimators rounds, only fitted for the size and latency comparison of the report
+    with profiler.step("train_fixed_model", rows=len(X_train)):
+        fixed_model = train_model(build_model(lgbm_params), X_train, y_train)
+    logger.info(f"Fixed size model trained with {fixed_model.regressor_.booster_.num_trees()} trees")
+    
+    # lower and upper quantile models bounding the prediction intervals
+    quantile_models = build_quantile_models(lgbm_params, model_params["Intervals"])
+    with profiler.step("train_quantile_models", rows=len(X_train) * len(quantile_models)):
+        for quantile_model in quantile_models:
+            train_model(quantile_model, X_train, y_train)
+    logger.info(f"Quantile models trained for alphas {model_params['Intervals']['alphas']}")
     
     # model filename
     model_filename = "model.joblib"
@@ -132,21 +210,43 @@ if __name__ == "__main__":
     model_save_dir.mkdir(exist_ok=True)
     
     
-    # extract the model from wrapper
-    transformer = model.transformer_
-    
     # save the model
-    save_model(model=model,
-            save_dir=model_save_dir,
-            model_name=model_filename)
+    with profiler.step("save_model"):
+        save_model(model=model,
+                save_dir=model_save_dir,
+                model_name=model_filename)
+        save_model(model=quantile_models,
+                save_dir=model_save_dir,
+                model_name="quantile_models.joblib")
     logger.info("Trained model saved to location")
     
     
-    # save the transformer
-    transformer_filename = "log_transformer.joblib"
-    transformer_save_dir = model_save_dir
-    save_transformer(transformer=transformer,
-                    save_dir=transformer_save_dir,
-                    transformer_name=transformer_filename)
-    logger.info("Target transformer saved to location")
-    
\ No newline at end of file
+    # package the preprocessor, booster, target transform and option metadata as one bundle
+    with profiler.step("save_bundle"):
+        preprocessor = joblib.load(model_save_dir / "preprocesser.joblib")
+        with open(root_path / "data" / "app" / "metadata.json") as f:
+            metadata = json.load(f)
+        bundle = ModelBundle.from_model(preprocessor, model, metadata, quantile_models=quantile_models)
+        bundle.save(model_save_dir / "model.bundle")
+    logger.info(f"Model bundle {bundle.bundle_id[:12]} saved to location")
+    
+    # size and latency of the model the early stopping settled on, against the fixed size model
+    with profiler.step("compare_models", rows=2 * LATENCY_RUNS * (1 + min(BATCH_ROWS, len(X_train)))):
+        training_report = {
+            "n_estimators": lgbm_params["n_estimators"],
+            "best_iteration": best_iteration,
+            **model_footprint(model, X_train),
+            "bundle_bytes": (model_save_dir / "model.bundle").stat().st_size,
+            **{f"validation_{metric}": score for metric, score in validation_scores.items()},
+            "fixed": model_footprint(fixed_model, X_train)
+        }
+    logger.info(f"{training_report['trees']} trees predict a row in {training_report['single_row_ms']:.2f} ms, "
+                f"{training_report['fixed']['trees']} in {training_report['fixed']['single_row_ms']:.2f} ms")
+    report_path = root_path / "reports" / "training.json"
+    report_path.parent.mkdir(exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(training_report, f, indent=4)
+    logger.info("Training report saved")
+    
+    # save the stage metrics
+    profiler.save()
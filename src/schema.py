@@ -0,0 +1,92 @@
+import pandas as pd
+import numpy as np
+import json
+from collections import defaultdict
+from pathlib import Path
+from pandas.api.types import CategoricalDtype
+
+
+# metadata built by the build_metadata stage, its option lists fix the category order
+METADATA_PATH = Path(__file__).parent.parent / "data" / "app" / "metadata.json"
+
+# model inputs in the order the preprocessor is fitted on
+feature_columns = ['propertytype', 'region', 'locality', 'bedrooms', 'bathrooms', 'balconies',
+                   'superbuiltupareasqft', 'transactiontype', 'ageofcons', 'furnished',
+                   'additionalRooms', 'totalfloornumber']
+target_column = 'price'
+
+# columns of the prediction audit log, in the order the app appends them, the log has no header row
+audit_columns = ['propertytype', 'bedrooms', 'bathrooms', 'balconies', 'furnished', 'transactiontype',
+                 'ageofcons', 'additionalRooms', 'region', 'locality', 'superbuiltupareasqft',
+                 'totalfloornumber', 'predicted_price', 'timestamp']
+
+# categorical column -> option list in the metadata
+categorical_columns = {
+    'region': ('options', 'region'),
+    'locality': ('localities', 'overall'),
+    'propertytype': ('options', 'propertytype'),
+    'furnished': ('options', 'furnished'),
+    'transactiontype': ('options', 'transactiontype'),
+    'ageofcons': ('options', 'ageofcons'),
+}
+
+# smallest dtypes that hold the cleaned data
+numeric_dtypes = {
+    'bedrooms': np.int8,
+    'bathrooms': np.int8,
+    'balconies': np.int8,
+    'additionalRooms': np.int8,
+    'totalfloornumber': np.int16,
+    'superbuiltupareasqft': np.float32,
+    'price': np.float32,
+    'price_per_sqft': np.float32,
+    'latitude': np.float32,
+    'longitude': np.float32,
+    'predicted_price': np.float32,
+}
+
+
+def metadata_categories(metadata: dict) -> dict:
+    return {column: metadata[section][key] for column, (section, key) in categorical_columns.items()}
+
+
+def load_categories(metadata_path: Path = METADATA_PATH) -> dict:
+    with open(metadata_path, "r") as f:
+        metadata = json.load(f)
+
+    return metadata_categories(metadata)
+
+
+def build_dtypes(categories: dict) -> dict:
+    # values outside the fixed categories become missing, like an unseen category
+    dtypes = {column: CategoricalDtype(categories=values, ordered=False)
+              for column, values in categories.items()}
+    dtypes.update(numeric_dtypes)
+    return dtypes
+
+
+def load_dtypes(metadata_path: Path = METADATA_PATH) -> dict:
+    return build_dtypes(load_categories(metadata_path))
+
+
+def apply_schema(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    return df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+
+
+def select_columns(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    return df[columns]
+
+
+def selected_names(transformer, input_features) -> np.ndarray:
+    return np.asarray(transformer.kw_args["columns"], dtype=object)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # model matrices: float64 -> float32, other dtypes are already compact
+    return df.astype({column: np.float32 for column in df.columns if df[column].dtype == np.float64})
+
+
+def read_processed(data_path: Path, dtypes: dict = None) -> pd.DataFrame:
+    # the transformed datasets are numeric, apart from the categoricals kept by the native encoding
+    categoricals = {column: dtype for column, dtype in (dtypes or {}).items() if isinstance(dtype, CategoricalDtype)}
+    return pd.read_csv(data_path, dtype=defaultdict(lambda: np.float32, categoricals))
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from src.bundle import ModelBundle
+from src.schema import feature_columns
+
+# area values of a sweep
+AREA_POINTS = 50
+# area range of a sweep as a multiple of the base area, kept within the trained bounds
+AREA_RANGE = (0.5, 2.0)
+# response curves kept, oldest dropped first
+CURVE_ENTRIES = 256
+# column the predictions are written to
+PREDICTION_COLUMN = "predicted_price"
+
+
+def area_values(base_area: float, bounds: dict, points: int = AREA_POINTS) -> np.ndarray:
+    # evenly spaced areas around the base area, in whole square feet
+    low = max(bounds["min"], base_area * AREA_RANGE[0])
+    high = min(bounds["max"], base_area * AREA_RANGE[1])
+    return np.unique(np.round(np.linspace(low, high, points)))
+
+
+def build_grid(base: dict, sweeps: dict) -> pd.DataFrame:
+    # every combination of the swept input values, the other inputs fixed at the base input
+    grid = pd.MultiIndex.from_product(list(sweeps.values()), names=list(sweeps)).to_frame(index=False)
+    fixed = {column: base[column] for column in feature_columns if column not in sweeps}
+    return grid.assign(**fixed)[feature_columns]
+
+
+class SensitivityCurves:
+    """
+    Predicted price over a grid of variants of one input, scored in one batch and cached per base input
+    and sweep.
+    """
+
+    def __init__(self, bundle: ModelBundle, max_entries: int = CURVE_ENTRIES):
+        self.bundle = bundle
+        self.max_entries = max_entries
+        self.curves = OrderedDict()
+
+    def sweep(self, base: dict, sweeps: dict) -> pd.DataFrame:
+        # the grid with a predicted price for every variant
+        key = (tuple(base[column] for column in feature_columns),
+               tuple((column, tuple(values)) for column, values in sweeps.items()))
+        if key in self.curves:
+            self.curves.move_to_end(key)
+            return self.curves[key]
+
+        grid = build_grid(base, sweeps)
+        grid[PREDICTION_COLUMN] = self.bundle.predict(grid)
+
+        self.curves[key] = grid
+        while len(self.curves) > self.max_entries:
+            self.curves.popitem(last=False)
+        return grid
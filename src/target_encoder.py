@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.model_selection import KFold
+
+
+def group_codes(values: pd.Series) -> tuple:
+    # integer code of every value and the distinct values the codes index, -1 for missing values,
+    # categoricals already carry their codes
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    codes, uniques = pd.factorize(values)
+    return codes, pd.Index(uniques)
+
+
+def encoding_table(values: pd.Series, y: np.ndarray, smoothing: float, min_samples_leaf: int) -> tuple:
+    # the seen values, their smoothed target means followed by the prior for unknown values, and the
+    # encoding of missing values: missing values seen in fit are a group of their own, as in
+    # category_encoders, otherwise they get the prior
+    prior = y.mean()
+    codes, uniques = group_codes(values)
+    n_groups = len(uniques)
+    codes = np.where(codes < 0, n_groups, codes)
+
+    counts = np.bincount(codes, minlength=n_groups + 1)
+    sums = np.bincount(codes, weights=y, minlength=n_groups + 1)
+    weight = expit((counts - min_samples_leaf) / smoothing)
+    encodings = prior * (1 - weight) + sums / np.maximum(counts, 1) * weight
+
+    seen = counts[:n_groups] > 0
+    missing = encodings[n_groups] if counts[n_groups] else prior
+    return uniques[seen], np.append(encodings[:n_groups][seen], prior), missing
+
+
+def lookup(table: tuple, values: pd.Series) -> np.ndarray:
+    # encoding of every value by array indexing, unknown values land on the prior at the end of the table
+    categories, encodings, missing = table
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        positions = np.append(categories.get_indexer(values.cat.categories), -1)[values.cat.codes.to_numpy()]
+    else:
+        positions = categories.get_indexer(values)
+    encoded = encodings[positions]
+    encoded[values.isna().to_numpy()] = missing
+    return encoded
+
+
+class TargetEncoder(TransformerMixin, BaseEstimator):
+    """
+    Target encoding with the smoothing of category_encoders.TargetEncoder: a value seen n times gets
+    prior * (1 - w) + mean * w with w = expit((n - min_samples_leaf) / smoothing), unknown values get the
+    prior. Group statistics come from bincount over the value codes and transform is an array lookup.
+
+    With folds set, fit_transform encodes every training row from the statistics of the other folds, so
+    the model never sees a row's own target in its encoding. The fitted tables always use all the rows.
+    """
+
+    def __init__(self, cols: list, smoothing: float = 10.0, min_samples_leaf: int = 20,
+                 folds: int = None, random_state: int = None):
+        self.cols = cols
+        self.smoothing = smoothing
+        self.min_samples_leaf = min_samples_leaf
+        self.folds = folds
+        self.random_state = random_state
+
+    def fit_tables(self, X: pd.DataFrame, y: np.ndarray) -> dict:
+        return {col: encoding_table(X[col], y, self.smoothing, self.min_samples_leaf) for col in self.cols}
+
+    def fit(self, X: pd.DataFrame, y):
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = X.shape[1]
+        y = np.asarray(y, dtype=np.float64)
+        self.tables_ = self.fit_tables(X, y)
+        self.prior_ = y.mean()
+        return self
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        X = X.copy()
+        for col in self.cols:
+            X[col] = lookup(self.tables_[col], X[col])
+        return X
+
+    def fit_transform(self, X: pd.DataFrame, y=None, **fit_params) -> pd.DataFrame:
+        self.fit(X, y)
+        if not self.folds:
+            return self.transform(X)
+
+        y = np.asarray(y, dtype=np.float64)
+        encoded = {col: np.empty(len(X)) for col in self.cols}
+        for train_rows, held_out in KFold(self.folds, shuffle=True, random_state=self.random_state).split(X):
+            tables = self.fit_tables(X.iloc[train_rows], y[train_rows])
+            for col in self.cols:
+                encoded[col][held_out] = lookup(tables[col], X[col].iloc[held_out])
+
+        X = X.copy()
+        for col in self.cols:
+            X[col] = encoded[col]
+        return X
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return self.feature_names_in_
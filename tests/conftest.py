@@ -0,0 +1,157 @@
+import pytest
+import json
+import pandas as pd
+from pathlib import Path
+from src.data_preprocessing import build_preprocessor
+from src.modeling.train import build_model, build_quantile_models
+from src.schema import feature_columns, target_column, apply_schema, build_dtypes, metadata_categories
+from helpers import make_listings
+
+# mlflow, the registry and the bundle are imported by the fixtures that use them, the unit tests run without them
+
+
+root_path = Path(__file__).parent.parent
+
+MODEL_NAME = "price_prediction_pred_model"
+
+# small model trained for the offline tests
+TEST_LGBM_PARAMS = {"n_estimators": 60, "learning_rate": 0.1, "num_leaves": 15, "n_jobs": 1, "verbose": -1}
+
+def pytest_addoption(parser):
+    parser.addoption("--remote-registry", action="store_true", default=False,
+                     help="test the model of run_information.json on the tracking server of src/config.py "
+                          "instead of a small model registered in a local store")
+
+
+@pytest.fixture(scope="session")
+def small_lgbm_params() -> dict:
+    return dict(TEST_LGBM_PARAMS)
+
+
+@pytest.fixture(scope="session")
+def stopping_params() -> dict:
+    # early stopping of the small model, on a larger validation split than the train stage holds out
+    return {"validation_size": 0.2, "patience": 5, "random_state": 0}
+
+
+@pytest.fixture(scope="session")
+def remote_registry(request) -> bool:
+    return request.config.getoption("--remote-registry")
+
+
+@pytest.fixture(scope="session")
+def tracking_store(tmp_path_factory, remote_registry):
+    # local file store for tracking and registry, nothing leaves the machine
+    import mlflow
+    from src import config
+
+    if remote_registry:
+        yield config.init_tracking()
+        return
+
+    store = tmp_path_factory.mktemp("mlruns")
+    previous_uri = mlflow.get_tracking_uri()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("TRACKING_BACKEND", "local")
+        mp.setenv("MLFLOW_TRACKING_URI", store.as_uri())
+        mp.setattr(config, "_tracking_uri", None)
+        yield config.init_tracking(experiment="offline tests")
+    mlflow.set_tracking_uri(previous_uri)
+
+
+@pytest.fixture(scope="session")
+def train_data() -> pd.DataFrame:
+    return make_listings(1500, seed=0)
+
+
+@pytest.fixture(scope="session")
+def test_data(remote_registry) -> pd.DataFrame:
+    if remote_registry:
+        return pd.read_csv(root_path / "data" / "interim" / "test.csv")
+    return make_listings(400, seed=1)
+
+
+@pytest.fixture(scope="session")
+def train_X(train_data, metadata) -> pd.DataFrame:
+    # model inputs with the schema dtypes, as the data_preprocessing stage reads them
+    return apply_schema(train_data[feature_columns], build_dtypes(metadata_categories(metadata)))
+
+
+@pytest.fixture(scope="session")
+def preprocessor(train_X, train_data):
+    return build_preprocessor(smoothing=0.24, min_samples_leaf=11).fit(train_X, train_data[target_column])
+
+
+@pytest.fixture(scope="session")
+def metadata(train_data) -> dict:
+    # option metadata of the synthetic listings, as the build_metadata stage writes it
+    options = ["propertytype", "region", "transactiontype", "furnished", "ageofcons", "additionalRooms"]
+    return {
+        "options": {column: sorted(train_data[column].unique().tolist()) for column in options},
+        "localities": {"overall": sorted(train_data["locality"].unique().tolist()),
+                       **{region: sorted(group["locality"].unique().tolist())
+                          for region, group in train_data.groupby("region")}},
+        "bounds": {column: {"min": float(train_data[column].min()), "max": float(train_data[column].max())}
+                   for column in ["bedrooms", "bathrooms", "balconies", "superbuiltupareasqft", "totalfloornumber"]}
+    }
+
+
+@pytest.fixture(scope="session")
+def trained_model(train_X, train_data, preprocessor):
+    # small model trained on the synthetic listings
+    return build_model(TEST_LGBM_PARAMS).fit(preprocessor.transform(train_X), train_data[target_column])
+
+
+@pytest.fixture(scope="session")
+def quantile_models(train_X, train_data, preprocessor) -> list:
+    # lower and upper quantile models of the intervals
+    X = preprocessor.transform(train_X)
+    return [model.fit(X, train_data[target_column])
+            for model in build_quantile_models(TEST_LGBM_PARAMS, {"alphas": [0.05, 0.95]})]
+
+
+@pytest.fixture(scope="session")
+def bundle(trained_model, quantile_models, preprocessor, metadata):
+    # packaged as the train stage does
+    from src.bundle import ModelBundle
+
+    return ModelBundle.from_model(preprocessor, trained_model, metadata, quantile_models=quantile_models)
+
+
+@pytest.fixture(scope="session")
+def logged_run(tracking_store, tmp_path_factory, trained_model, bundle, remote_registry) -> dict:
+    # run holding the model and its bundle, like the evaluation stage logs them
+    import mlflow
+    from src.bundle import BUNDLE_ARTIFACT
+
+    if remote_registry:
+        run_info_path = root_path / "run_information.json"
+        if not run_info_path.exists():
+            pytest.fail("run_information.json is written by the evaluate stage, run dvc pull or dvc repro evaluate")
+        with open(run_info_path) as f:
+            return json.load(f)
+
+    bundle_path = bundle.save(tmp_path_factory.mktemp("bundle") / BUNDLE_ARTIFACT)
+    with mlflow.start_run() as run:
+        mlflow.sklearn.log_model(trained_model, MODEL_NAME)
+        mlflow.log_artifact(bundle_path)
+    return {"run_id": run.info.run_id, "model_name": MODEL_NAME}
+
+
+@pytest.fixture
+def registered_model(logged_run, remote_registry) -> dict:
+    # a new version of the logged model in Staging, the remote registry is only read
+    from src.modeling.model_registry import register_model
+
+    if remote_registry:
+        return {"model_name": logged_run["model_name"], "stage": "Staging"}
+
+    model_version = register_model(run_id=logged_run["run_id"], model_name=logged_run["model_name"], stage="Staging")
+    return {"model_name": model_version.name, "version": model_version.version, "stage": "Staging"}
+
+
+@pytest.fixture
+def client(tracking_store):
+    from mlflow import MlflowClient
+
+    return MlflowClient()
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from src.schema import feature_columns, target_column
+
+# synthetic listings: region -> (localities, price per sqft in lakhs)
+REGIONS = {"gurgaon": (["sector 45", "sector 56", "dlf phase 2"], 0.09),
+           "noida": (["sector 62", "sector 137"], 0.06),
+           "mumbai": (["andheri west", "powai", "thane west"], 0.2)}
+
+
+def make_listings(n: int, seed: int) -> pd.DataFrame:
+    # listings with the pipeline columns, price in crores follows area, locality and a few extras
+    rng = np.random.default_rng(seed)
+    region = rng.choice(list(REGIONS), n)
+    locality = np.array([rng.choice(REGIONS[r][0]) for r in region])
+    rate = np.array([REGIONS[r][1] for r in region]) * (1 + 0.2 * (locality == np.array([REGIONS[r][0][0] for r in region])))
+    bedrooms = rng.integers(1, 6, n)
+    area = bedrooms * rng.normal(550, 80, n).clip(300)
+    furnished = rng.choice(["unfurnished", "semi-furnished", "furnished"], n)
+
+    price = area * rate / 100 * (1 + 0.1 * (furnished == "furnished")) * rng.lognormal(0, 0.05, n)
+    return pd.DataFrame({
+        "propertytype": rng.choice(["apartment", "builder floor apartment", "independent house"], n),
+        "region": region,
+        "locality": locality,
+        "bedrooms": bedrooms,
+        "bathrooms": np.minimum(bedrooms + rng.integers(0, 2, n), 6),
+        "balconies": rng.integers(0, 4, n),
+        "superbuiltupareasqft": area.round(0),
+        "transactiontype": rng.choice(["new booking", "resale"], n),
+        "ageofcons": rng.choice(["new construction", "less than 5 years", "5 to 10 years"], n),
+        "furnished": furnished,
+        "additionalRooms": rng.integers(0, 2, n),
+        "totalfloornumber": rng.integers(1, 30, n),
+        target_column: price.round(4)
+    })[feature_columns + [target_column]]
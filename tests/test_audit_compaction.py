@@ -0,0 +1,85 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow.parquet as pq
+from src.audit import append_records, AuditHistory
+from src.audit_compaction import compact
+from src.schema import audit_columns, target_column
+from helpers import make_listings
+
+
+def audit_records(listings: pd.DataFrame, day: str) -> pd.DataFrame:
+    records = listings.rename(columns={target_column: "predicted_price"})
+    records["timestamp"] = [f"{day} {i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}" for i in range(len(records))]
+    return records[audit_columns]
+
+
+def test_closed_days_move_into_partitions(tmp_path):
+    audit_path = tmp_path / "predictions.csv"
+    history_dir = tmp_path / "history"
+    for seed, day in enumerate(["2025-01-01", "2025-01-02", "2025-01-03"]):
+        append_records(audit_path, audit_records(make_listings(200, seed=seed), day))
+    today_lines = audit_path.read_text().splitlines()[400:]
+
+    summary = compact(audit_path, history_dir, today="2025-01-03")
+
+    assert summary["compacted_rows"] == 400 and summary["active_rows"] == 200
+    assert audit_path.read_text().splitlines() == today_lines
+
+    manifest = json.loads((history_dir / "_manifest.json").read_text())["files"]
+    assert sorted(entry["path"].split("/")[0] for entry in manifest.values()) == ["date=2025-01-01", "date=2025-01-02"]
+    for entry in manifest.values():
+        assert entry["rows"] == 200
+        assert entry["min_timestamp"].endswith("00:00:00") and entry["max_timestamp"].endswith("00:03:19")
+        # the footer keeps the same range for readers that skip the manifest
+        statistics = pq.ParquetFile(history_dir / entry["path"]).metadata.row_group(0).column(
+            audit_columns.index("timestamp")).statistics
+        assert statistics.has_min_max
+
+    history = pd.read_parquet(history_dir)
+    assert len(history) == 400
+    assert history["bedrooms"].dtype == "Int8" and history["timestamp"].dtype.kind == "M"
+
+    # nothing closed is left, a rerun changes nothing
+    assert compact(audit_path, history_dir, today="2025-01-03")["compacted_rows"] == 0
+    assert len(json.loads((history_dir / "_manifest.json").read_text())["files"]) == 2
+
+
+def test_history_aggregates_follow_appends_and_compaction(tmp_path):
+    audit_path = tmp_path / "predictions.csv"
+    for seed, day in enumerate(["2025-01-01", "2025-01-02"]):
+        append_records(audit_path, audit_records(make_listings(200, seed=seed), day))
+    history = AuditHistory(audit_path)
+    assert history.refresh()["count"].sum() == 400
+
+    # appended records are read from where the last refresh stopped
+    append_records(audit_path, audit_records(make_listings(50, seed=5), "2025-01-02"))
+    offset = history.active_offset
+    aggregates = history.refresh()
+    assert aggregates["count"].sum() == 450 and history.active_offset > offset
+
+    # the closed day moves into the history, nothing is counted twice or lost
+    compact(audit_path, tmp_path / "history", today="2025-01-02")
+    aggregates = history.refresh()
+    assert aggregates["count"].sum() == 450
+    assert aggregates.groupby(aggregates["hour"].dt.date)["count"].sum().tolist() == [200, 250]
+
+    # only the partitions overlapping the range are read
+    start, end = pd.Timestamp("2025-01-01 00:01:00"), pd.Timestamp("2025-01-01 00:01:59")
+    assert [path.parent.name for path in history.files_between(start, end)] == ["date=2025-01-01"]
+    records = history.read(start, end)
+    assert len(records) == 60 and records["timestamp"].between(start, end).all()
+    assert len(history.read(pd.Timestamp("2025-01-02"), pd.Timestamp("2025-01-02 23:59:59"))) == 250
+
+
+def test_concurrent_refreshes_count_every_record_once(tmp_path):
+    audit_path = tmp_path / "predictions.csv"
+    append_records(audit_path, audit_records(make_listings(200, seed=0), "2025-01-01"))
+    history = AuditHistory(audit_path)
+
+    # sessions of the app refresh the shared history while records are appended
+    with ThreadPoolExecutor(max_workers=16) as sessions:
+        for seed in range(1, 10):
+            append_records(audit_path, audit_records(make_listings(20, seed=seed), "2025-01-01"))
+            refreshes = [sessions.submit(history.refresh) for _ in range(16)]
+            assert all(refresh.result()["count"].sum() == 200 + 20 * seed for refresh in refreshes)
@@ -0,0 +1,30 @@
+from benchmarks.__main__ import compare
+
+
+def suite(results: dict) -> dict:
+    return {"environment": {}, "results": results}
+
+
+def test_compare_flags_the_direction_of_every_metric():
+    baseline = suite({"inference": {
+        "single_row": {"p50_ms": 1.0},
+        "batch": {"rows_per_second": 1000.0},
+        "explain": {"single_row_overhead": 2.0},
+        "intervals": {"single_row_overhead": 1.5, "batch_1000_overhead": 3.0}
+    }})
+    current = suite({"inference": {
+        "single_row": {"p50_ms": 0.5},
+        "batch": {"rows_per_second": 500.0},
+        "explain": {"single_row_overhead": 4.0},
+        "intervals": {"single_row_overhead": 1.0, "batch_1000_overhead": 3.0}
+    }})
+    regressions = {name: regression for name, _, _, _, regression in compare(baseline, current)}
+
+    # faster latency and a smaller overhead improve, fewer rows per second and a doubled overhead regress
+    assert regressions == {
+        "inference.single_row.p50_ms": False,
+        "inference.batch.rows_per_second": True,
+        "inference.explain.single_row_overhead": True,
+        "inference.intervals.single_row_overhead": False,
+        "inference.intervals.batch_1000_overhead": False
+    }
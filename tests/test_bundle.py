@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+from sklearn.pipeline import Pipeline
+from src.bundle import ModelBundle, BundleError, PREAMBLE
+from src.schema import apply_schema
+
+
+def test_bundle_round_trip(bundle, trained_model, preprocessor, test_data, tmp_path):
+    bundle_path = bundle.save(tmp_path / "model.bundle")
+    loaded = ModelBundle.load(bundle_path)
+
+    X = test_data.drop(columns=["price"])
+    pipeline = Pipeline([("preprocess", preprocessor), ("regressor", trained_model)])
+    np.testing.assert_allclose(loaded.predict(X), pipeline.predict(apply_schema(X, bundle.dtypes)))
+    assert loaded.bundle_id == bundle.bundle_id
+    assert loaded.metadata == bundle.metadata
+
+
+def test_bundle_detects_corruption(bundle, tmp_path):
+    bundle_path = bundle.save(tmp_path / "model.bundle")
+    data = bytearray(bundle_path.read_bytes())
+    data[-10] ^= 0xFF
+    bundle_path.write_bytes(bytes(data))
+
+    with pytest.raises(BundleError, match="corrupted"):
+        ModelBundle.load(bundle_path)
+
+
+def test_bundle_rejects_other_files(tmp_path):
+    other_path = tmp_path / "model.joblib"
+    other_path.write_bytes(b"\0" * PREAMBLE.size)
+
+    with pytest.raises(BundleError, match="not a model bundle"):
+        ModelBundle.load(other_path)
+
+
+def test_bundle_intervals(bundle, quantile_models, preprocessor, test_data, tmp_path):
+    loaded = ModelBundle.load(bundle.save(tmp_path / "model.bundle"))
+    assert list(loaded.quantiles) == [0.05, 0.95]
+    assert loaded.coverage == pytest.approx(0.9)
+
+    X = test_data.drop(columns=["price"])
+    predictions, lower, upper = loaded.predict_interval(X)
+    X_trans = preprocessor.transform(apply_schema(X, bundle.dtypes))
+    np.testing.assert_allclose(predictions, loaded.predict(X))
+    np.testing.assert_allclose(lower, np.minimum(quantile_models[0].predict(X_trans), predictions))
+    np.testing.assert_allclose(upper, np.maximum(quantile_models[1].predict(X_trans), predictions))
+    assert (lower <= predictions).all() and (predictions <= upper).all()
@@ -0,0 +1,27 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from src.data_preparation import load_data
+from src.schema import build_dtypes, metadata_categories
+from helpers import make_listings
+
+
+def test_city_partitions_load_as_the_rows_of_the_csv(tmp_path, metadata):
+    listings = make_listings(300, seed=2)
+    dtypes = build_dtypes(metadata_categories(metadata))
+    csv_path = tmp_path / "real_estate.csv"
+    listings.to_csv(csv_path, index=False)
+
+    # cleaned listings partitioned by city, stored as text like the extracted dataset
+    table = pa.Table.from_pandas(listings.astype(str).assign(city=listings["region"]), preserve_index=False)
+    dataset_path = tmp_path / "listings"
+    ds.write_dataset(table, dataset_path, format="parquet", partitioning=["city"], partitioning_flavor="hive")
+
+    expected = load_data(csv_path, dtypes=dtypes, cities=["noida", "mumbai"])
+    loaded = load_data(dataset_path, dtypes=dtypes, cities=["noida", "mumbai"])
+
+    assert set(expected["region"]) == {"noida", "mumbai"}
+    # the partitions are read in city order, not in the order of the csv
+    pd.testing.assert_frame_equal(loaded.sort_values(list(loaded.columns), ignore_index=True),
+                                  expected.sort_values(list(expected.columns), ignore_index=True))
+    assert len(load_data(dataset_path, dtypes=dtypes)) == len(load_data(csv_path, dtypes=dtypes))
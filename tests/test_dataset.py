@@ -0,0 +1,23 @@
+import numpy as np
+from sklearn.model_selection import cross_val_score
+from src.modeling.dataset import build_dataset, load_dataset, cross_validate
+from src.modeling.train import build_model
+from src.schema import target_column
+
+
+def test_folds_of_the_saved_dataset_score_as_cross_val_score(tmp_path, train_X, train_data, preprocessor,
+                                                             small_lgbm_params):
+    X, y = preprocessor.transform(train_X), train_data[target_column]
+    dataset_path = tmp_path / "train.bin"
+    build_dataset(X, y).save_binary(str(dataset_path))
+
+    dataset = load_dataset(dataset_path)
+    scores = cross_validate(dataset, small_lgbm_params)
+
+    assert dataset.num_data() == len(X) and len(scores) == 5
+    # the folds share the bins of all the rows instead of binning their own, the scores stay close
+    expected = -cross_val_score(build_model(small_lgbm_params), X, y, cv=5, scoring="neg_mean_absolute_error")
+    np.testing.assert_allclose(scores, expected, rtol=0.1)
+
+    # a trial lowering min_data_in_leaf trains on the same dataset
+    assert np.isfinite(cross_validate(dataset, {**small_lgbm_params, "min_child_samples": 5})).all()
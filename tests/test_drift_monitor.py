@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from src.drift_monitor import build_reference, empty_state, read_new_records, update, psi, bucket_counts
+from src.schema import audit_columns, target_column
+from helpers import make_listings
+
+
+def audit_records(listings):
+    # listings as the app appends them to the audit log
+    records = listings.rename(columns={target_column: "predicted_price"})
+    records["timestamp"] = [f"2025-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}" for i in range(len(records))]
+    return records[audit_columns]
+
+
+def append(audit_path, records, partial: str = ""):
+    with open(audit_path, "a") as f:
+        records.to_csv(f, header=False, index=False)
+        f.write(partial)
+
+
+def test_bucket_counts_keep_unseen_and_missing_apart():
+    categories = bucket_counts(pd.Series(["a", "b", "z", None]), {"categories": ["a", "b"]})
+    numbers = bucket_counts(pd.Series(["1", "5", "9", None]), {"edges": [2.0, 6.0]})
+
+    np.testing.assert_array_equal(categories, [1, 1, 2])
+    np.testing.assert_array_equal(numbers, [1, 1, 1, 1])
+
+
+def test_monitor_reads_only_new_records(train_data, tmp_path):
+    reference = build_reference(train_data)
+    state = empty_state(reference)
+    audit_path = tmp_path / "predictions.csv"
+
+    # same distribution as training, the last record is still being written
+    append(audit_path, audit_records(make_listings(300, seed=5)), partial="villa,3,3")
+    records, offset, fingerprint = read_new_records(audit_path, state)
+    report = update(reference, state, records)
+    state.update(offset=offset, fingerprint=fingerprint)
+
+    assert report["new_rows"] == 300 and report["drifted"] == []
+    assert max(report["psi"].values()) < 0.1
+
+    # only the shifted records appended after the offset are read
+    shifted = make_listings(300, seed=6)
+    shifted["superbuiltupareasqft"] *= 3
+    with open(audit_path, "rb+") as f:
+        f.truncate(offset)
+    append(audit_path, audit_records(shifted))
+    records, offset, _ = read_new_records(audit_path, state)
+    report = update(reference, state, records)
+
+    assert len(records) == 300 and report["rows"] == 600
+    assert report["batch_psi"]["superbuiltupareasqft"] > report["psi"]["superbuiltupareasqft"] > 0.25
+    assert "superbuiltupareasqft" in report["drifted"]
+    assert offset == audit_path.stat().st_size
+
+
+def test_monitor_rereads_a_rewritten_log_after_the_last_timestamp(train_data, tmp_path):
+    reference = build_reference(train_data)
+    state = empty_state(reference)
+    audit_path = tmp_path / "predictions.csv"
+    records = audit_records(make_listings(100, seed=7))
+
+    append(audit_path, records)
+    read, offset, fingerprint = read_new_records(audit_path, state)
+    update(reference, state, read)
+    state.update(offset=offset, fingerprint=fingerprint)
+
+    # older records moved out, newer ones appended
+    audit_path.unlink()
+    append(audit_path, records.iloc[80:])
+    append(audit_path, audit_records(make_listings(120, seed=8)).iloc[100:])
+    read, _, _ = read_new_records(audit_path, state)
+
+    assert len(read) == 20
+
+
+def test_monitor_keeps_records_stamped_in_the_second_of_the_last_one_read(train_data, tmp_path):
+    reference = build_reference(train_data)
+    state = empty_state(reference)
+    audit_path = tmp_path / "predictions.csv"
+    records = audit_records(make_listings(100, seed=7))
+    records.loc[90:, "timestamp"] = records.loc[90, "timestamp"]
+
+    append(audit_path, records)
+    read, offset, fingerprint = read_new_records(audit_path, state)
+    update(reference, state, read)
+    state.update(offset=offset, fingerprint=fingerprint)
+    assert state["last_timestamp_rows"] == 10
+
+    # rewritten log, 5 records appended later in the same second as the last one read and 10 after it
+    later = audit_records(make_listings(115, seed=8)).iloc[100:]
+    later.iloc[:5, later.columns.get_loc("timestamp")] = records.loc[90, "timestamp"]
+    audit_path.unlink()
+    append(audit_path, records.iloc[80:])
+    append(audit_path, later)
+    read, _, _ = read_new_records(audit_path, state)
+    update(reference, state, read)
+
+    assert len(read) == 15
+    assert state["last_timestamp"] == later["timestamp"].iloc[-1] and state["last_timestamp_rows"] == 1
+
+
+def test_psi_is_zero_for_the_reference_itself():
+    assert psi([0.5, 0.5, 0.0], np.array([50, 50, 0])) == 0
+    assert psi([0.5, 0.5, 0.0], np.array([0, 0, 0])) is None
@@ -0,0 +1,39 @@
+import pytest
+import mlflow
+import sklearn
+from src.modeling.evaluation import log_run_batch, log_dataset_inputs, pinned_requirements
+
+
+@pytest.fixture
+def run_id(tracking_store, remote_registry):
+    # logging writes a run, it never runs against the remote tracking server
+    if remote_registry:
+        pytest.skip("run logging is only tested against the local store")
+    with mlflow.start_run() as run:
+        yield run.info.run_id
+
+
+def test_log_run_batch(run_id, client):
+    log_run_batch(client, run_id, params={"n_estimators": 60}, metrics={"test_mae": 0.5, "CV 0": 0.4},
+                  tags={"encoding": "onehot"}).wait()
+
+    data = client.get_run(run_id).data
+    assert data.params == {"n_estimators": "60"}
+    assert data.metrics == {"test_mae": 0.5, "CV 0": 0.4}
+    assert data.tags["encoding"] == "onehot"
+
+
+def test_log_dataset_inputs_skips_the_profile_of_large_frames(run_id, client, train_data, test_data):
+    unprofiled = log_dataset_inputs(client, run_id, datasets={"training": train_data, "validation": test_data},
+                                    max_rows=len(test_data))
+
+    assert unprofiled == ["training"]
+    inputs = {dataset_input.tags[0].value: dataset_input.dataset
+              for dataset_input in client.get_run(run_id).inputs.dataset_inputs}
+    assert sorted(inputs) == ["training", "validation"]
+    assert inputs["training"].digest and inputs["training"].schema is None and inputs["training"].profile is None
+    assert "num_rows" in inputs["validation"].profile and "price" in inputs["validation"].schema
+
+
+def test_pinned_requirements():
+    assert pinned_requirements(["scikit-learn"]) == [f"scikit-learn=={sklearn.__version__}"]
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from src.explain import Explainer, PredictionMemo, input_mapping
+from src.schema import feature_columns
+
+
+def test_contributions_add_up_to_the_prediction(bundle, test_data):
+    X = test_data.drop(columns=["price"])
+    predictions, contributions, base_value = Explainer(bundle).explain(X)
+
+    np.testing.assert_allclose(predictions, bundle.predict(X))
+    np.testing.assert_allclose(contributions.sum(axis=1) + base_value, np.log1p(predictions))
+    assert list(contributions.columns) == feature_columns
+
+
+def test_input_mapping():
+    mapping = input_mapping(["region_gurgaon", "region_noida", "locality", "bedrooms"],
+                            inputs=["region", "locality", "bedrooms"])
+
+    np.testing.assert_array_equal(mapping, [[1, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]])
+    with pytest.raises(ValueError):
+        input_mapping(["latitude"], inputs=["region"])
+
+
+def test_memo_explains_new_rows_in_one_batch(bundle, test_data):
+    X = test_data.drop(columns=["price"])
+    memo = PredictionMemo(bundle, max_entries=50)
+
+    predictions, contributions, intervals = memo.lookup(X.iloc[:20])
+    assert (memo.hits, memo.misses) == (0, 20)
+
+    # cached rows are answered from the memo, in the order asked
+    again, _, again_intervals = memo.lookup(X.iloc[10:30])
+    assert (memo.hits, memo.misses) == (10, 30)
+    np.testing.assert_allclose(again[:10], predictions[10:])
+    np.testing.assert_allclose(again, bundle.predict(X.iloc[10:30]))
+    np.testing.assert_allclose(again_intervals[:10], intervals[10:])
+
+    memo.lookup(X.iloc[30:80])
+    assert len(memo.entries) == 50
@@ -0,0 +1,48 @@
+import json
+import random
+import pandas as pd
+from notebooks.scraping_realestate_data.extraction import COLUMNS, list_files, process_files_in_batches
+
+# values a scraped column holds across listings, mixing ones pandas promotes to a common dtype
+VALUES = {
+    "price": [12500000, 9800000.5, None],
+    "bedrooms": [3, None],
+    "floorNumber": [True, 4],
+    "totalFloorNumber": [True, 2.5, 7],
+    "isVerified": [True, False, None],
+    "longitude": [77.0266, float("nan")],
+    "latitude": [28.45, None],
+    "propertyId": [2 ** 63 + 5, 71234567, 2 ** 64 + 5],
+    "propertyAmenities": [["Lift", "Park"], "Lift", None],
+    "facilitiesDesc": [{"gym": 1}, None]
+}
+
+
+def pandas_extraction(file_names) -> pd.DataFrame:
+    # the original extraction: one frame per file, concatenated
+    frames = []
+    for file_path in file_names:
+        with open(file_path, encoding="utf-8") as f:
+            detail = json.load(f)["propertyDetailInfoBeanData"]["propertyDetail"]["detailBean"]
+        frames.append(pd.DataFrame({column: [detail.get(column)] for column in COLUMNS}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_extraction_writes_the_csv_of_the_pandas_extraction(tmp_path):
+    rng = random.Random(0)
+    input_directory = tmp_path / "propertyDetailsgurgaon"
+    input_directory.mkdir()
+    for run, columns in enumerate([list(VALUES), ["price", "bedrooms", "latitude", "propertyId"]]):
+        for listing in range(60):
+            detail = {column: rng.choice(VALUES.get(column, [f"text {listing}", None])) for column in COLUMNS
+                      if column not in VALUES or column in columns}
+            with open(input_directory / f"{run}-{listing}.json", "w", encoding="utf-8") as f:
+                json.dump({"propertyDetailInfoBeanData": {"propertyDetail": {"detailBean": detail}}}, f)
+
+    for name in ["0-", "1-"]:
+        file_names = [path for path in list_files(input_directory) if f"{name}" in path]
+        expected, output = tmp_path / f"{name}expected.csv", tmp_path / f"{name}output.csv"
+        pandas_extraction(file_names).to_csv(expected, index=False)
+        process_files_in_batches(file_names, output, chunk_size=7, batch_rows=16, num_workers=2)
+
+        assert output.read_bytes() == expected.read_bytes()
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from src.data_preprocessing import build_preprocessor
+from src.modeling.feature_selection import fit_pipeline, gain_shares, select_features
+from src.schema import target_column
+
+
+def test_narrow_preprocessor_outputs_the_selected_columns(train_X, train_data, small_lgbm_params, stopping_params):
+    y = train_data[target_column]
+    full = fit_pipeline(build_preprocessor(smoothing=0.24, min_samples_leaf=11), small_lgbm_params, stopping_params,
+                        train_X, y)
+    shares = gain_shares(full)
+    features = select_features(full, shares, 0.0)
+
+    assert np.isclose(shares.sum(), 1) and set(shares.index) == set(full[:-1].get_feature_names_out())
+    assert 0 < len(features) <= len(shares) and all(shares[features] > 0)
+
+    # the kept columns hold the same values as in the full output
+    narrow = build_preprocessor(smoothing=0.24, min_samples_leaf=11, features=features).fit(train_X, y)
+    assert list(narrow.get_feature_names_out()) == features
+    pd.testing.assert_frame_equal(narrow.transform(train_X), full[:-1].transform(train_X)[features])
+
+
+def test_inputs_without_a_selected_column_are_not_encoded(train_X, train_data):
+    features = ["superbuiltupareasqft", "bedrooms", "propertytype_independent house"]
+    narrow = build_preprocessor(smoothing=0.24, min_samples_leaf=11, features=features)
+    narrow.fit(train_X, train_data[target_column])
+
+    assert "target_encoder" not in narrow.named_steps
+    encoder = narrow.named_steps["preprocessor"].named_transformers_["ohe"]
+    assert list(encoder.feature_names_in_) == ["propertytype"]
+    assert list(narrow.transform(train_X.iloc[[0]]).columns) == features
@@ -0,0 +1,34 @@
+import numpy as np
+from src.market_stats import build_market_stats, MarketStats
+from helpers import make_listings
+
+
+def similar_prices(listings, region, propertytype, bedrooms, area):
+    # the ±20% similar properties slice the panel summarizes
+    similar = listings[(listings["region"] == region) & (listings["propertytype"] == propertytype) &
+                       (listings["bedrooms"] == bedrooms)]
+    return similar.loc[similar["superbuiltupareasqft"].between(area * 0.8, area * 1.2), "price"]
+
+
+def test_sparse_windows_are_summarized_exactly():
+    listings = make_listings(3000, seed=3)
+    market_stats = MarketStats(build_market_stats(listings, area_ratio=1.02, price_ratio=1.02, price_origin=0.01,
+                                                  min_count=20))
+
+    sparse = dense = 0
+    for listing in listings.head(200).itertuples():
+        key = (listing.region, listing.propertytype, listing.bedrooms)
+        prices = similar_prices(listings, *key, listing.superbuiltupareasqft)
+        market = market_stats.query(*key, listing.superbuiltupareasqft)
+        if market_stats.count[market_stats.window_rows(*key, listing.superbuiltupareasqft)].sum() < 20:
+            sparse += 1
+            assert market["count"] == len(prices)
+            assert np.isclose(market["mean"], prices.mean()) and np.isclose(market["median"], prices.median())
+            assert market["min"] == prices.min() and market["max"] == prices.max()
+        else:
+            dense += 1
+            assert market["min"] <= market["median"] <= market["max"]
+    assert sparse and dense
+
+    # no listing of the segment near the area
+    assert market_stats.query("gurgaon", "apartment", 1, 10.0) is None
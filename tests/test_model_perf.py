@@ -1,74 +1,21 @@
 import pytest
-import mlflow
-import dagshub
-import json
-from pathlib import Path
-from sklearn.pipeline import Pipeline
-import joblib
-import pandas as pd
 from sklearn.metrics import mean_absolute_error
+from src.bundle import load_registered_bundle
 
 
-# initialize dagshub
-dagshub.init(repo_owner='sourav664', repo_name='real-estate-hybrid-app', mlflow=True)
+@pytest.mark.parametrize(argnames="threshold_error", argvalues=[0.75])
+def test_model_performance(registered_model, test_data, threshold_error):
+    model_name = registered_model["model_name"]
 
-
-# set the mlflow tracking server
-mlflow.set_tracking_uri("https://dagshub.com/sourav664/real-estate-hybrid-app.mlflow")
-
-
-
-def load_model_informations(file_path):
-    with open(file_path) as f:
-        run_info = json.load(f)
-        
-    return run_info
-
-def load_transformer(transformer_path):
-    transformer = joblib.load(transformer_path)
-    return transformer
-
-# set model name
-model_name = load_model_informations('run_information.json')['model_name']
-stage = "Staging"
-
-# load the model
-model_path = f"models:/{model_name}/{stage}"
-
-# load the latest model from model registry
-model = mlflow.sklearn.load_model(model_path)
-
-# set the root path
-root_path = Path(__file__).parent.parent
-
-# load the preprocessor
-preprocessor_path = root_path / "models" / "preprocesser.joblib"
-preprocessor = load_transformer(preprocessor_path)
-
-# build the model pipeline
-model_pipe = Pipeline(steps=[
-    ('preprocess',preprocessor),
-    ("regressor",model)
-])
-
-test_data_path = root_path / "data" / "interim" / "test.csv"
-
-
-@pytest.mark.parametrize(argnames="model_pipe, test_data_path, threshold_error",
-                         argvalues=[(model_pipe, test_data_path, 0.75)])
-def test_model_performance(model_pipe,test_data_path, threshold_error):
-    # load the data
-    df = pd.read_csv(test_data_path)
-    
-    # drop the missing values
-    # df.dropna(inplace=True)
+    # load the bundle of the latest model in the registry, preprocessor and model come from the same run
+    bundle = load_registered_bundle(model_name, stage=registered_model["stage"])
     
     # make X and y
-    X = df.drop(columns=["price"])
-    y = df['price']
+    X = test_data.drop(columns=["price"])
+    y = test_data['price']
     
     # get the predictions
-    y_pred = model_pipe.predict(X)
+    y_pred = bundle.predict(X)
     
     # calculate the mean error
     mean_error = mean_absolute_error(y,y_pred)
@@ -76,4 +23,4 @@ def test_model_performance(model_pipe,test_data_path, threshold_error):
     assert mean_error <= threshold_error, f"The model does not pass the performance threshold of {threshold_error} lakhs"
     print("The avg error is", mean_error)
     
-    print(f"The {model_name} model passed the performance test")
\ No newline at end of file
+    print(f"The {model_name} model passed the performance test")
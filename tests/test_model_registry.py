@@ -1,30 +1,10 @@
 import pytest
 import mlflow
-from mlflow import MlflowClient
-import dagshub
-import json
 
-# initialize dagshub
-dagshub.init(repo_owner='sourav664', repo_name='real-estate-hybrid-app', mlflow=True)
 
-
-# set the mlflow tracking server
-mlflow.set_tracking_uri("https://dagshub.com/sourav664/real-estate-hybrid-app.mlflow")
-
-def load_model_information(file_path):
-    with open(file_path) as f:
-        run_info = json.load(f)
-        
-    return run_info
-
-# set model name
-model_name = load_model_information("run_information.json")["model_name"]
-
-
-@pytest.mark.parametrize(argnames="model_name, stage",
-                         argvalues=[(model_name, "Staging")])
-def test_load_model_from_registry(model_name,stage):
-    client = MlflowClient()
+@pytest.mark.parametrize(argnames="stage", argvalues=["Staging"])
+def test_load_model_from_registry(registered_model, client, stage):
+    model_name = registered_model["model_name"]
     latest_versions = client.get_latest_versions(name=model_name, stages=[stage])
     latest_version  = latest_versions[0].version if latest_versions else None
     
@@ -37,4 +17,4 @@ def test_load_model_from_registry(model_name,stage):
     model = mlflow.sklearn.load_model(model_path)
     
     assert model is not None, "Failed to load model from registry"
-    print(f"The {model_name} model with version {latest_version} was loaded successfully")
\ No newline at end of file
+    print(f"The {model_name} model with version {latest_version} was loaded successfully")
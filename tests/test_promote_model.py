@@ -0,0 +1,32 @@
+import pytest
+from promote_model import promote_model
+
+
+@pytest.fixture
+def local_registry(remote_registry):
+    # promotion changes stages, it never runs against the remote registry
+    if remote_registry:
+        pytest.skip("promotion is only tested against the local store")
+
+
+def test_promote_staging_to_production(local_registry, registered_model, client):
+    model_name = registered_model["model_name"]
+
+    promoted = promote_model(model_name, stage="Staging", promotion_stage="Production", client=client)
+
+    assert promoted == registered_model["version"]
+    production = client.get_latest_versions(name=model_name, stages=["Production"])
+    assert [version.version for version in production] == [promoted]
+
+
+def test_promotion_archives_previous_production(local_registry, logged_run, client):
+    from src.modeling.model_registry import register_model
+
+    model_name = logged_run["model_name"]
+    first = register_model(logged_run["run_id"], model_name, stage="Staging", client=client)
+    promote_model(model_name, client=client)
+    second = register_model(logged_run["run_id"], model_name, stage="Staging", client=client)
+    promote_model(model_name, client=client)
+
+    assert client.get_model_version(model_name, first.version).current_stage == "Archived"
+    assert client.get_model_version(model_name, second.version).current_stage == "Production"
@@ -0,0 +1,38 @@
+import numpy as np
+from src.sensitivity import SensitivityCurves, area_values, build_grid, PREDICTION_COLUMN
+from src.schema import feature_columns
+
+
+def test_grid_crosses_the_sweeps_over_the_base_input(test_data):
+    base = test_data.drop(columns=["price"]).iloc[0].to_dict()
+    grid = build_grid(base, {"superbuiltupareasqft": [800.0, 1200.0, 1600.0], "bedrooms": [1, 2]})
+
+    assert list(grid.columns) == feature_columns
+    assert len(grid) == 6
+    assert set(zip(grid["superbuiltupareasqft"], grid["bedrooms"])) == {
+        (area, bedrooms) for area in [800.0, 1200.0, 1600.0] for bedrooms in [1, 2]}
+    assert (grid["locality"] == base["locality"]).all()
+
+
+def test_area_values_stay_in_bounds():
+    values = area_values(1000, {"min": 700, "max": 1500}, points=20)
+
+    assert values.min() == 700 and values.max() == 1500
+    assert len(values) == 20
+
+
+def test_curves_are_scored_in_one_batch_and_cached(bundle, test_data):
+    base = test_data.drop(columns=["price"]).iloc[0].to_dict()
+    sweeps = {"superbuiltupareasqft": area_values(base["superbuiltupareasqft"], bundle.metadata["bounds"]["superbuiltupareasqft"]),
+              "bedrooms": [1, 2, 3]}
+    curves = SensitivityCurves(bundle, max_entries=1)
+
+    grid = curves.sweep(base, sweeps)
+    rows = [bundle.predict(grid.iloc[[row]])[0] for row in range(0, len(grid), 17)]
+    np.testing.assert_allclose(grid[PREDICTION_COLUMN].iloc[::17], rows)
+
+    # the same base input and sweep is answered from the cache, a new one replaces it
+    assert curves.sweep(base, sweeps) is grid
+    curves.sweep({**base, "balconies": base["balconies"] + 1}, sweeps)
+    assert len(curves.curves) == 1
+    assert curves.sweep(base, sweeps) is not grid
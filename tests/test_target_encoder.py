@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import category_encoders as ce
+from sklearn.model_selection import KFold
+from src.target_encoder import TargetEncoder
+from src.schema import target_column
+
+SETTINGS = {"cols": ["locality"], "smoothing": 0.24, "min_samples_leaf": 11}
+
+
+def test_encodings_match_category_encoders(train_data, test_data):
+    X, y = train_data.drop(columns=[target_column]), train_data[target_column]
+    X_test = test_data.drop(columns=[target_column])
+    # a locality missing from the first rows of the train data, and unknown and missing test values
+    X.loc[X.index[:20], "locality"] = np.nan
+    X_test.loc[X_test.index[:3], "locality"] = "unknown locality"
+    X_test.loc[X_test.index[3:6], "locality"] = np.nan
+
+    for frame in [X_test, X_test.astype({"locality": "category"})]:
+        expected = ce.TargetEncoder(**SETTINGS).fit(X, y).transform(frame)
+        encoded = TargetEncoder(**SETTINGS).fit(X, y).transform(frame)
+
+        pd.testing.assert_frame_equal(encoded, expected, check_dtype=False)
+        assert encoded["locality"].iloc[0] == y.mean()
+
+
+def test_out_of_fold_rows_are_encoded_without_their_fold(train_data):
+    X, y = train_data.drop(columns=[target_column]), train_data[target_column]
+    encoder = TargetEncoder(**SETTINGS, folds=4, random_state=0)
+
+    encoded = encoder.fit_transform(X, y)
+
+    for train_rows, held_out in KFold(4, shuffle=True, random_state=0).split(X):
+        fold = TargetEncoder(**SETTINGS).fit(X.iloc[train_rows], y.iloc[train_rows])
+        np.testing.assert_allclose(encoded["locality"].iloc[held_out],
+                                   fold.transform(X.iloc[held_out])["locality"])
+    # the fitted encoder still encodes new rows from all the train data
+    pd.testing.assert_frame_equal(encoder.transform(X), TargetEncoder(**SETTINGS).fit(X, y).transform(X))
@@ -0,0 +1,16 @@
+from src.modeling.train import find_best_iteration, fit_early_stopped
+from src.schema import target_column
+
+
+def test_boosting_stops_when_the_validation_score_does(train_X, train_data, preprocessor, small_lgbm_params,
+                                                       stopping_params):
+    X, y = preprocessor.transform(train_X), train_data[target_column]
+    # far more rounds than the synthetic listings need at this learning rate
+    lgbm_params = {**small_lgbm_params, "n_estimators": 2000, "learning_rate": 0.3}
+
+    best_iteration, scores = find_best_iteration(lgbm_params, X, y, stopping_params)
+
+    assert 0 < best_iteration < 2000 and scores["l2"] > 0
+    # refitted on all the rows for the rounds found on the split, as the train stage and the evaluation do
+    model, rounds = fit_early_stopped(lgbm_params, X, y, stopping_params)
+    assert rounds == best_iteration and model.regressor_.booster_.num_trees() <= best_iteration